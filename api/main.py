@@ -1,13 +1,18 @@
-from pg_module import put_user_preferences, Charity, CharityCategory, UserCategory, get_db, UserPreferences, create_user_preferences, get_charities_for_category, get_users_for_category, get_user_preferences, Counter, get_names_of_charities, CharityAddress, get_charity
+from .pg_module import UserPreferences, get_async_db, async_crud as crud
 
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+import json
+import os
 from typing import Optional
 
 from pydantic import BaseModel
 
+from .recommendation_service import RecommendationService
+
 
 class UserPrefModel(BaseModel):
     userId: str
@@ -29,80 +34,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global matcher instance for storing recommendations
-_global_matcher = None
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def get_global_matcher(db):
-    global _global_matcher
-    if _global_matcher is None:
-        from news_charity_matcher import NewsCharityMatcher
-        _global_matcher = NewsCharityMatcher(db)
-    return _global_matcher
+# Recommendations written by the matcher, read through a per-worker cache. A
+# relative fallback path is resolved from the repo root, like the matcher does.
+recommendation_service = RecommendationService(
+    fallback_path=os.path.join(ROOT, os.getenv("RECOMMENDATION_STORE_FALLBACK", "recommendations.sqlite3")),
+    ttl=float(os.getenv("RECOMMENDATION_CACHE_TTL", "60")),
+    probe_interval=float(os.getenv("RECOMMENDATION_PROBE_INTERVAL", "1")),
+)
 
 
 @app.get("/charities/{category}")
-async def get_chars(category: str, db: Session = Depends(get_db)):
-    return get_charities_for_category(db, category)
+async def get_chars(category: str, db: AsyncSession = Depends(get_async_db)):
+    return await crud.get_charities_for_category(db, category)
 
 @app.get("/users/{category}")
-async def get_user(category: str, db: Session = Depends(get_db)):
-    return get_users_for_category(db, category)
+async def get_user(category: str, db: AsyncSession = Depends(get_async_db)):
+    return await crud.get_users_for_category(db, category)
 
 @app.get("/charity/{id}")
-async def get_charity(id: str, db: Session = Depends(get_db)):
-    return get_charity(db, id)
+async def get_charity(id: str, db: AsyncSession = Depends(get_async_db)):
+    return await crud.get_charity(db, id)
 
 @app.put("/userpreferences")
-async def update_user_preferences(userId: str, preferences: UserPrefModel, db: Session = Depends(get_db)):
-    return put_user_preferences(db, userId, UserPreferences(**preferences.model_dump()))
+async def update_user_preferences(userId: str, preferences: UserPrefModel, db: AsyncSession = Depends(get_async_db)):
+    return await crud.put_user_preferences(db, userId, UserPreferences(**preferences.model_dump()))
 
 @app.get("/userpreferences/{userId}")
-async def get_prefs(userId: str, db: Session = Depends(get_db)):
-    return get_user_preferences(db, userId)
+async def get_prefs(userId: str, db: AsyncSession = Depends(get_async_db)):
+    return await crud.get_user_preferences(db, userId)
 
 
 @app.post("/userpreferences")
-async def create_prefs(userId: str, preferences: UserPrefModel, db: Session = Depends(get_db)):
-    return create_user_preferences(db, userId, UserPreferences(**preferences.model_dump()))
+async def create_prefs(userId: str, preferences: UserPrefModel, db: AsyncSession = Depends(get_async_db)):
+    return await crud.create_user_preferences(db, userId, UserPreferences(**preferences.model_dump()))
 
 @app.post("/counter")
-async def setCounter(userId: str, count: int, db: Session = Depends(get_db)):
-    matches = db.query(Counter).filter(Counter.userid == userId)
-    if matches.count() > 0:
-        match = matches.first()
-        match.countvalue = count
-        db.commit()
-        return {"count": count}
-    else:
-        db.add(Counter(userid=userId, countvalue=count))
-        db.commit()
-        return {"count": count}
+async def setCounter(userId: str, count: int, db: AsyncSession = Depends(get_async_db)):
+    await crud.set_counter(db, userId, count)
+    return {"count": count}
 
 @app.get("/counter/{userId}")
-async def getCounter(userId: str, db: Session = Depends(get_db)):
-    match = db.query(Counter).filter(Counter.userid == userId).first()
+async def getCounter(userId: str, db: AsyncSession = Depends(get_async_db)):
+    match = await crud.get_counter(db, userId)
     if match:
         return {"count": match.countvalue}
     
     return {"count": 0}
 
 @app.get("/charityaddress")
-async def getCharityNames(addresses: list[str], db: Session = Depends(get_db)):
-    res = get_names_of_charities(db, addresses)
+async def getCharityNames(addresses: list[str], db: AsyncSession = Depends(get_async_db)):
+    res = await crud.get_names_of_charities(db, addresses)
 
     return [PydanticCharityAddress(name=charity.name, address=charity.address) for charity in res]
 
+# On-chain state, served from the tables kept by the event indexer (run_indexer.py)
+@app.get("/chainuser/{userId}")
+async def get_indexed_user(userId: str, db: AsyncSession = Depends(get_async_db)):
+    user = await crud.get_chain_user(db, userId)
+    if user is None:
+        return {"error": "User not indexed"}
+    return {
+        "userId": user.userid,
+        "topics": json.loads(user.topics),
+        "charities": json.loads(user.charities),
+        "percentages": json.loads(user.percentages),
+        "balance": str(user.balance),  # wei, as a string to keep precision
+        "lastBlock": user.last_block,
+    }
+
+@app.get("/donations/{userId}")
+async def get_donations(userId: str, limit: int = 50, before_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """Donations, withdrawals and splits of a user, newest first; page with before_id"""
+    events = await crud.get_donation_history(db, userId, min(limit, 200), before_id)
+    return [
+        {
+            "id": event.id,
+            "event": event.event,
+            "amount": str(event.amount),
+            "blockNumber": event.block_number,
+            "txHash": event.tx_hash,
+        }
+        for event in events
+    ]
+
 # AI Recommendation endpoints
 @app.get("/ai/recommendations/{userId}")
-async def get_ai_recommendations(userId: str, db: Session = Depends(get_db)):
+async def get_ai_recommendations(userId: str, limit: int = 50, before_id: Optional[int] = None):
     """Get AI-powered charity recommendations for a user"""
     try:
-        # Try to get real AI recommendations from the matcher
+        # Try to get real AI recommendations from the matcher's store
         try:
-            matcher = get_global_matcher(db)
-            real_recommendations = matcher.get_user_recommendations(userId)
+            # The store is read with a sync session; keep cache misses off the event loop
+            real_recommendations = await run_in_threadpool(recommendation_service.for_user, userId, min(limit, 200), before_id)
             if real_recommendations:
-                print(f"Found {len(real_recommendations)} real recommendations for {userId}")
                 return real_recommendations
         except Exception as e:
             print(f"Failed to get real AI recommendations: {e}")
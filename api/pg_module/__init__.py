@@ -1,3 +1,4 @@
-from .crud import get_charities_for_category, get_users_for_category, create_user_preferences, get_charity, put_user_preferences, get_user_preferences, CharityAddress, get_names_of_charities
-from .models import CharityCategory, UserCategory, Charity, UserPreferences, Counter
-from .database import get_db, SessionLocal
\ No newline at end of file
+from .crud import get_charities_for_category, get_users_for_category, create_user_preferences, get_charity, put_user_preferences, get_user_preferences, CharityAddress, get_names_of_charities, get_recommendations_for_user, get_chain_user, get_donation_history
+from .models import CharityCategory, UserCategory, Charity, UserPreferences, Counter, Recommendation, ChainUser, ChainEvent
+from .database import get_db, SessionLocal, get_async_db, AsyncSessionLocal
+from . import async_crud
@@ -0,0 +1,70 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+from .models import UserCategory, CharityCategory, Charity, UserPreferences, CharityAddress, Recommendation, ChainUser, ChainEvent, Counter
+
+# Async variants of crud.py for the FastAPI handlers (see database.get_async_db)
+
+async def get_users_for_category(db: AsyncSession, category: str) -> Optional[List[UserCategory]]:
+    result = await db.scalars(select(UserCategory).where(UserCategory.category == category))
+    return result.all()
+
+async def get_charities_for_category(db: AsyncSession, category: str) -> Optional[List[Charity]]:
+    result = await db.scalars(
+        select(Charity).join(CharityCategory, Charity.name == CharityCategory.charityname).where(CharityCategory.category == category)
+    )
+    return result.all()
+
+async def get_charity(db: AsyncSession, id: str) -> Optional[Charity]:
+    return await db.scalar(select(Charity).where(Charity.name == id).limit(1))
+
+async def put_user_preferences(db: AsyncSession, userId: str, preferences: UserPreferences) -> None:
+    values = {column.key: getattr(preferences, column.key) for column in UserPreferences.__table__.columns if column.key != "userid"}
+    await db.execute(update(UserPreferences).where(UserPreferences.userid == userId).values(**values))
+    await db.commit()
+
+async def get_user_preferences(db: AsyncSession, userId: str) -> Optional[UserPreferences]:
+    return await db.scalar(select(UserPreferences).where(UserPreferences.userid == userId).limit(1))
+
+async def create_user_preferences(db: AsyncSession, userId: str, preferences: UserPreferences) -> None:
+    db.add(preferences)
+    await db.commit()
+    await db.refresh(preferences)
+
+async def get_names_of_charities(db: AsyncSession, addresses: list[str]) -> Optional[List[CharityAddress]]:
+    result = await db.scalars(select(CharityAddress).where(CharityAddress.address.in_(addresses)))
+    return result.all()
+
+async def get_recommendations_for_user(db: AsyncSession, userId: str, limit: int = 50, before_id: Optional[int] = None) -> List[Recommendation]:
+    """Newest recommendations first; pass the last id seen as before_id for the next page"""
+    query = select(Recommendation).where(Recommendation.userid == userId)
+    if before_id is not None:
+        query = query.where(Recommendation.id < before_id)
+    result = await db.scalars(query.order_by(Recommendation.id.desc()).limit(limit))
+    return result.all()
+
+async def get_chain_user(db: AsyncSession, userId: str) -> Optional[ChainUser]:
+    """Indexed on-chain state of one user (see web3_utils/event_indexer.py)"""
+    return await db.scalar(select(ChainUser).where(ChainUser.userid == userId.lower()).limit(1))
+
+async def get_donation_history(db: AsyncSession, userId: str, limit: int = 50, before_id: Optional[int] = None) -> List[ChainEvent]:
+    """Donated / Withdrawn / SplitAmongCharities events of a user, newest first"""
+    query = select(ChainEvent).where(
+        ChainEvent.userid == userId.lower(),
+        ChainEvent.event.in_(["Donated", "Withdrawn", "SplitAmongCharities"]),
+    )
+    if before_id is not None:
+        query = query.where(ChainEvent.id < before_id)
+    result = await db.scalars(query.order_by(ChainEvent.id.desc()).limit(limit))
+    return result.all()
+
+async def get_counter(db: AsyncSession, userId: str) -> Optional[Counter]:
+    return await db.scalar(select(Counter).where(Counter.userid == userId).limit(1))
+
+async def set_counter(db: AsyncSession, userId: str, count: int) -> None:
+    counter = await get_counter(db, userId)
+    if counter is None:
+        db.add(Counter(userid=userId, countvalue=count))
+    else:
+        counter.countvalue = count
+    await db.commit()
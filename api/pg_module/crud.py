@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from typing import Optional, List
-from .models import UserCategory, CharityCategory, Charity, UserPreferences, CharityAddress
+from .models import UserCategory, CharityCategory, Charity, UserPreferences, CharityAddress, Recommendation, ChainUser, ChainEvent
 
 def get_users_for_category(db: Session, category: str) -> Optional[List[UserCategory]]:
     return db.query(UserCategory).filter(UserCategory.category == category).all()
@@ -27,4 +27,25 @@ def create_user_preferences(db: Session, userId: str, preferences: UserPreferenc
     db.refresh(preferences)
 
 def get_names_of_charities(db: Session, addresses: list[str]) -> Optional[List[CharityAddress]]:
-    return db.query(CharityAddress).filter(CharityAddress.address.in_(addresses)).all()
\ No newline at end of file
+    return db.query(CharityAddress).filter(CharityAddress.address.in_(addresses)).all()
+
+def get_recommendations_for_user(db: Session, userId: str, limit: int = 50, before_id: Optional[int] = None) -> List[Recommendation]:
+    """Newest recommendations first; pass the last id seen as before_id for the next page"""
+    query = db.query(Recommendation).filter(Recommendation.userid == userId)
+    if before_id is not None:
+        query = query.filter(Recommendation.id < before_id)
+    return query.order_by(Recommendation.id.desc()).limit(limit).all()
+
+def get_chain_user(db: Session, userId: str) -> Optional[ChainUser]:
+    """Indexed on-chain state of one user (see web3_utils/event_indexer.py)"""
+    return db.query(ChainUser).filter(ChainUser.userid == userId.lower()).first()
+
+def get_donation_history(db: Session, userId: str, limit: int = 50, before_id: Optional[int] = None) -> List[ChainEvent]:
+    """Donated / Withdrawn / SplitAmongCharities events of a user, newest first"""
+    query = db.query(ChainEvent).filter(
+        ChainEvent.userid == userId.lower(),
+        ChainEvent.event.in_(["Donated", "Withdrawn", "SplitAmongCharities"]),
+    )
+    if before_id is not None:
+        query = query.filter(ChainEvent.id < before_id)
+    return query.order_by(ChainEvent.id.desc()).limit(limit).all()
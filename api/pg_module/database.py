@@ -1,19 +1,53 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import AsyncGenerator, Generator
 import dotenv
 
 import os
 dotenv.load_dotenv()
 
-engine = create_engine(
-    f"postgresql://{os.getenv('PG_USER')}:{os.getenv('PG_PASSWORD')}@{os.getenv('PG_HOST')}:{os.getenv('PG_PORT')}/{os.getenv('PG_DATABASE_NAME')}"
-)
+DATABASE = f"{os.getenv('PG_USER')}:{os.getenv('PG_PASSWORD')}@{os.getenv('PG_HOST')}:{os.getenv('PG_PORT')}/{os.getenv('PG_DATABASE_NAME')}"
+
+# Connection pool per worker process. Checked-out connections are tested with a
+# cheap ping first (PG_POOL_PRE_PING=0 to skip) and replaced after
+# PG_POOL_RECYCLE seconds, so connections dropped by Postgres or a proxy don't
+# surface as request errors.
+#
+# PG_POOL_SIZE + PG_MAX_OVERFLOW is the budget for both engines together: the
+# sync engine only backs the cached recommendation reads (run in a thread pool)
+# and keeps PG_SYNC_POOL_SIZE connections of it, the async engine the rest.
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("PG_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("PG_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("PG_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("PG_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("PG_POOL_PRE_PING", "1") == "1",
+}
+
+# Prepared statements cached per asyncpg connection; set to 0 behind pgbouncer
+# in transaction mode, which can't keep them across transactions.
+STATEMENT_CACHE_SIZE = int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100"))
+
+SYNC_POOL_SIZE = max(1, min(int(os.getenv("PG_SYNC_POOL_SIZE", "2")), POOL_OPTIONS["pool_size"] - 1))
+
+engine = create_engine(f"postgresql://{DATABASE}", **{**POOL_OPTIONS, "pool_size": SYNC_POOL_SIZE, "max_overflow": 0})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    f"postgresql+asyncpg://{DATABASE}?prepared_statement_cache_size={STATEMENT_CACHE_SIZE}",
+    connect_args={"statement_cache_size": STATEMENT_CACHE_SIZE},
+    **{**POOL_OPTIONS, "pool_size": max(1, POOL_OPTIONS["pool_size"] - SYNC_POOL_SIZE)},
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from .pg_module.crud import get_recommendations_for_user
+from .pg_module.models import Recommendation
+
+
+def connect_engine(fallback_path):
+    """The Postgres engine if it is reachable, otherwise the matcher's SQLite fallback store."""
+    from .pg_module.database import engine
+
+    try:
+        with engine.connect():
+            return engine
+    except Exception as e:
+        print(f"Postgres unavailable ({e}), reading recommendations from {fallback_path}")
+        return create_engine(f"sqlite:///{fallback_path}")
+
+
+class RecommendationService:
+    """Read-only view of the recommendation store the matcher writes to.
+
+    Each user's first page is cached in-process for `ttl` seconds. At most
+    every `probe_interval` seconds a request checks the table's max id; rows
+    added since the last probe evict their users' entries, so new writes show
+    up in every worker within about a second. Other pages go to the database.
+    """
+
+    def __init__(self, engine=None, fallback_path="recommendations.sqlite3", ttl=60.0, probe_interval=1.0,
+                 page_size=50, max_users=10000):
+        self.engine = engine
+        self.fallback_path = fallback_path
+        self.ttl = ttl
+        self.probe_interval = probe_interval
+        self.page_size = page_size
+        self.max_users = max_users
+        self.lock = threading.Lock()
+        self.Session = None
+        self.cache = OrderedDict()  # user_id -> (fetched_at, recommendations)
+        self.max_id = None
+        self.probed_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def session(self):
+        # Connect on first use, not at import
+        with self.lock:
+            if self.Session is None:
+                self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine or connect_engine(self.fallback_path))
+        return self.Session()
+
+    def probe(self, db):
+        """Evict users with recommendations newer than the last probe."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.probed_at < self.probe_interval:
+                return
+            self.probed_at = now
+            last_max_id = self.max_id
+
+        max_id = db.query(func.max(Recommendation.id)).scalar() or 0
+        if last_max_id is not None and max_id > last_max_id:
+            user_ids = [row[0] for row in db.query(Recommendation.userid).filter(Recommendation.id > last_max_id).distinct()]
+        else:
+            user_ids = []
+
+        with self.lock:
+            if last_max_id is None or max_id < last_max_id:
+                # First probe, or the table was reset
+                self.cache.clear()
+            for user_id in user_ids:
+                if self.cache.pop(user_id, None) is not None:
+                    self.stats["invalidations"] += 1
+            self.max_id = max_id
+
+    def for_user(self, user_id, limit=50, before_id=None):
+        """Newest first, as RecommendationStore.for_user returns them."""
+        with self.session() as db:
+            if before_id is not None or limit > self.page_size:
+                return self.read(db, user_id, limit, before_id)
+
+            self.probe(db)
+            with self.lock:
+                entry = self.cache.get(user_id)
+                if entry and time.monotonic() - entry[0] < self.ttl:
+                    self.cache.move_to_end(user_id)
+                    self.stats["hits"] += 1
+                    return entry[1][:limit]
+                self.stats["misses"] += 1
+                max_id = self.max_id
+
+            fetched_at = time.monotonic()
+            recommendations = self.read(db, user_id, self.page_size, None)
+            with self.lock:
+                # A probe in the meantime may have evicted newer rows than we read
+                if self.max_id == max_id:
+                    self.cache[user_id] = (fetched_at, recommendations)
+                    self.cache.move_to_end(user_id)
+                    while len(self.cache) > self.max_users:
+                        self.cache.popitem(last=False)
+            return recommendations[:limit]
+
+    def read(self, db, user_id, limit, before_id):
+        rows = get_recommendations_for_user(db, user_id, limit, before_id)
+        return [{**json.loads(row.payload), "id": row.id} for row in rows]
@@ -1,13 +1,19 @@
-from web3 import Web3
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from web3.exceptions import TransactionNotFound
+from web3.logs import DISCARD
 
 from eth_account import Account
+from eth_account.messages import encode_typed_data
+import aiohttp
+import asyncio
 import dotenv
-import requests
-from web3.middleware import SignAndSendRawMiddlewareBuilder
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 import json
 import fastapi
 import os
+import time
 
 dotenv.load_dotenv()
 
@@ -18,40 +24,320 @@ class User:
     percentages: list[int]
     balance: int
 
-abi_text = open("contract_wrapper_api/abi.json", "r").read()
+# The deployed Donater, as written by contracts/scripts/deploy.js. Version 1 is
+# the original contract, without the deposits and donateBatch the relay needs.
+DEPLOYMENT_FILE = os.getenv("DEPLOYMENT_FILE", os.path.join(os.path.dirname(__file__), "..", "contracts", "deployed-contract.json"))
+deployment = json.load(open(DEPLOYMENT_FILE, "r"))
+CONTRACT_ADDRESS = deployment["address"]
+CONTRACT_VERSION = deployment.get("version", 1)
 
-CONTRACT_ADDRESS = "0xa338A6819C7f19B0cD55401df54bE54BbE34CC25"
+# Built once per worker: the provider keeps a pooled aiohttp session to the RPC
+# (and caches eth_chainId, otherwise re-checked on every call) and the ABI is
+# parsed a single time.
+abi = json.load(open(os.path.join(os.path.dirname(__file__), "abi.json" if CONTRACT_VERSION >= 2 else "abi_v1.json"), "r"))
+w3 = AsyncWeb3(AsyncHTTPProvider(os.getenv('INFURA_URL'), request_kwargs={"timeout": float(os.getenv("RPC_TIMEOUT", "30"))}, cache_allowed_requests=True))
+contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=abi)
 
-app = fastapi.FastAPI()
+FEE_CACHE_SECONDS = float(os.getenv("FEE_CACHE_SECONDS", "3"))
+
+@asynccontextmanager
+async def lifespan(app):
+    connector = aiohttp.TCPConnector(limit=int(os.getenv("RPC_POOL_SIZE", "100")), keepalive_timeout=60)
+    session = await w3.provider.cache_async_session(aiohttp.ClientSession(connector=connector))
+    settler = None
+    if os.getenv("RELAYER_PRIVATE_KEY"):
+        global relay
+        relay = await start_relay(os.getenv("RELAYER_PRIVATE_KEY"))
+        if relay:
+            settler = asyncio.create_task(relay.run())
+    yield
+    if settler:
+        settler.cancel()
+    await session.close()
+
+app = fastapi.FastAPI(lifespan=lifespan)
+
+
+class Signer:
+    # One per sending account. Transactions are signed locally (instead of with
+    # signing middleware, which would apply to every account on the shared
+    # provider) and nonces are handed out locally, so concurrent donations from
+    # the same account don't collide.
+
+    def __init__(self, account):
+        self.account = account
+        self.lock = asyncio.Lock()
+        self.nonce = None
+
+    async def send(self, function, value):
+        tx = await function.build_transaction({'from': self.account.address, 'value': value, **await fees()})
+        async with self.lock:
+            if self.nonce is None:
+                self.nonce = await w3.eth.get_transaction_count(self.account.address, 'pending')
+            signed = self.account.sign_transaction({**tx, 'nonce': self.nonce})
+            try:
+                tx_hash = await w3.eth.send_raw_transaction(signed.raw_transaction)
+            except Exception as e:
+                if 'nonce' in str(e).lower():
+                    # Sent from elsewhere in the meantime; re-read it next time
+                    self.nonce = None
+                raise
+            self.nonce += 1
+        return tx_hash
+
+SIGNER_CACHE_SIZE = int(os.getenv("SIGNER_CACHE_SIZE", "1024"))
+_signers = OrderedDict()  # address -> Signer, least recently used first
+
+def get_signer(private_key: str) -> Signer:
+    # Keyed by address, so raw keys aren't kept around as cache keys
+    account = Account.from_key(private_key)
+    signer = _signers.get(account.address)
+    if signer is None:
+        signer = _signers[account.address] = Signer(account)
+        while len(_signers) > SIGNER_CACHE_SIZE:
+            _signers.popitem(last=False)
+    _signers.move_to_end(account.address)
+    return signer
+
+_fees = {"value": None, "expires": 0.0}
+_fees_lock = asyncio.Lock()
+
+async def fees():
+    # EIP-1559 fees (and the chain id) shared by all requests for a few seconds
+    async with _fees_lock:
+        if _fees["value"] is None or time.monotonic() > _fees["expires"]:
+            block, tip, chain_id = await asyncio.gather(w3.eth.get_block('latest'), w3.eth.max_priority_fee, w3.eth.chain_id)
+            _fees["value"] = {'maxPriorityFeePerGas': tip, 'maxFeePerGas': 2 * block['baseFeePerGas'] + tip, 'chainId': chain_id}
+            _fees["expires"] = time.monotonic() + FEE_CACHE_SECONDS
+        return _fees["value"]
 
 @app.post("/donate")
 async def donate(request: fastapi.Request):
+    # Returns as soon as the transaction is sent; poll /tx/{tx_hash} for the outcome
     try:
         # Parse JSON body
         data = await request.json()
-        
+
         private_key = data.get("private_key")
         amount = data.get("amount")
-        
+
         if not private_key or not amount:
             return {"status": "error", "message": "Missing private_key or amount"}
-        
-        
-        # Connect to Web3
-        w3 = Web3(Web3.HTTPProvider(os.getenv('INFURA_URL')))
-        
-        # Load the smart contract
-        contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=abi_text)
-        
-        # Get the account from the private key
-        account = Account.from_key(private_key)
-        
-        # Inject middleware for signing and sending transactions
-        w3.middleware_onion.inject(SignAndSendRawMiddlewareBuilder.build(account), layer=0)
-        
-        # Execute the donate function from the smart contract
-        contract.functions.donate().transact({'from': account.address, 'value': amount})
- 
-        return {"status": "success"}
+
+        tx_hash = await get_signer(private_key).send(contract.functions.donate(), int(amount))
+
+        return {"status": "success", "tx_hash": w3.to_hex(tx_hash)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/tx/{tx_hash}")
+async def tx_status(tx_hash: str):
+    # pending, success or reverted; unknown if the node has never seen the hash
+    try:
+        receipt = await w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        try:
+            await w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return {"status": "unknown", "tx_hash": tx_hash}
+        return {"status": "pending", "tx_hash": tx_hash}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    return {
+        "status": "success" if receipt["status"] == 1 else "reverted",
+        "tx_hash": tx_hash,
+        "block_number": receipt["blockNumber"],
+        "gas_used": receipt["gasUsed"],
+    }
+
+
+# Relay mode (RELAYER_PRIVATE_KEY set to an account the owner authorized with
+# Donater.setRelayer): users fund a deposit with Donater.deposit() once and then
+# sign EIP-712 DonationIntents, which are queued here and settled many at a time
+# with donateBatch. The relayer is never the owner: the matcher and the split
+# scheduler hand out nonces for their own keys, and sharing one would collide.
+RELAY_BATCH_SIZE = int(os.getenv("RELAY_BATCH_SIZE", "50"))
+RELAY_INTERVAL = float(os.getenv("RELAY_INTERVAL", "30"))
+RECEIPT_TIMEOUT = 120
+INTENT_REJECT_REASONS = {1: "expired", 2: "already settled", 3: "deposit too low", 4: "bad signature"}
+
+relay = None
+
+def intent_typed_data(intent: dict, chain_id: int) -> dict:
+    return {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "DonationIntent": [
+                {"name": "user", "type": "address"},
+                {"name": "amount", "type": "uint256"},
+                {"name": "nonce", "type": "uint256"},
+                {"name": "deadline", "type": "uint256"},
+            ],
+        },
+        "primaryType": "DonationIntent",
+        "domain": {"name": "Donater", "version": "1", "chainId": chain_id, "verifyingContract": CONTRACT_ADDRESS},
+        "message": intent,
+    }
+
+async def start_relay(private_key):
+    signer = get_signer(private_key)
+    address = signer.account.address
+    if CONTRACT_VERSION < 2:
+        print("Relay mode needs Donater version 2 (donateBatch); redeploy the contract first")
+        return None
+    if os.getenv("PRIVATE_KEY") and address == Account.from_key(os.getenv("PRIVATE_KEY")).address:
+        print("RELAYER_PRIVATE_KEY must not be the owner's PRIVATE_KEY; relay mode is off")
+        return None
+    try:
+        authorized = await contract.functions.relayers(address).call()
     except Exception as e:
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        print(f"Could not check relayer {address} ({e}); relay mode is off")
+        return None
+    if not authorized:
+        print(f"{address} is not an authorized relayer (Donater.setRelayer); relay mode is off")
+        return None
+    print(f"Relaying donation intents as {address}")
+    return DonationRelay(signer, RELAY_BATCH_SIZE, RELAY_INTERVAL)
+
+class DonationRelay:
+    # Queues signed intents and sends them as one donateBatch transaction when
+    # batch_size are waiting, or interval seconds after the first one arrived.
+    # Each intent is followed from queued to submitted (tx hash) to settled,
+    # rejected (the contract skipped it) or failed (the transaction didn't go through).
+
+    def __init__(self, signer, batch_size, interval, history=100000):
+        self.signer = signer
+        self.batch_size = batch_size
+        self.interval = interval
+        self.history = history
+        self.queue = []
+        self.intents = OrderedDict()  # intent id -> record
+        self.pending = asyncio.Event()
+        self.full = asyncio.Event()
+        self.receipts = set()  # receipt-waiting tasks
+
+    async def add(self, intent: dict, signature: str) -> dict:
+        intent = {
+            "user": w3.to_checksum_address(intent["user"]),
+            "amount": int(intent["amount"]),
+            "nonce": int(intent["nonce"]),
+            "deadline": int(intent["deadline"]),
+        }
+        intent_id = f"{intent['user'].lower()}-{intent['nonce']}"
+        if intent_id in self.intents:
+            return self.status(intent_id)
+        if intent["amount"] <= 0 or intent["deadline"] <= time.time():
+            raise ValueError("Intent must have a positive amount and a deadline in the future")
+
+        signable = encode_typed_data(full_message=intent_typed_data(intent, await w3.eth.chain_id))
+        if Account.recover_message(signable, signature=signature) != intent["user"]:
+            raise ValueError("Signature does not match the intent's user")
+
+        # Queued intents of the same user draw on the same deposit
+        queued = sum(record["intent"]["amount"] for record in self.queue if record["intent"]["user"] == intent["user"])
+        if await contract.functions.deposits(intent["user"]).call() < queued + intent["amount"]:
+            raise ValueError("Deposit too low for this intent")
+
+        record = {"id": intent_id, "status": "queued", "intent": intent, "signature": signature}
+        self.intents[intent_id] = record
+        self.queue.append(record)
+        self.pending.set()
+        if len(self.queue) >= self.batch_size:
+            self.full.set()
+        while len(self.intents) > self.history:
+            self.intents.popitem(last=False)
+        return self.status(intent_id)
+
+    def status(self, intent_id):
+        record = self.intents.get(intent_id)
+        if record is None:
+            return None
+        return {key: value for key, value in record.items() if key != "signature"}
+
+    async def run(self):
+        while True:
+            await self.pending.wait()
+            try:
+                await asyncio.wait_for(self.full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            batch, self.queue = self.queue[:self.batch_size], self.queue[self.batch_size:]
+            if not self.queue:
+                self.pending.clear()
+            if len(self.queue) < self.batch_size:
+                self.full.clear()
+            try:
+                await self.submit(batch)
+            except Exception as e:
+                print(f"Error settling {len(batch)} donation intents: {e}")
+                for record in batch:
+                    record.update(status="failed", error=str(e))
+
+    async def submit(self, batch):
+        function = contract.functions.donateBatch(
+            [tuple(record["intent"][key] for key in ("user", "amount", "nonce", "deadline")) for record in batch],
+            [record["signature"] for record in batch],
+        )
+        tx_hash = w3.to_hex(await self.signer.send(function, 0))
+        for record in batch:
+            record.update(status="submitted", tx_hash=tx_hash)
+        print(f"Settling {len(batch)} donation intents in {tx_hash}")
+        # The next batch can go out while this one is being mined
+        task = asyncio.create_task(self.settle(batch, tx_hash))
+        self.receipts.add(task)
+        task.add_done_callback(self.receipts.discard)
+
+    async def settle(self, batch, tx_hash):
+        try:
+            receipt = await w3.eth.wait_for_transaction_receipt(tx_hash, timeout=RECEIPT_TIMEOUT)
+        except Exception as e:
+            for record in batch:
+                record.update(status="failed", error=str(e))
+            return
+        if receipt["status"] != 1:
+            for record in batch:
+                record.update(status="failed", error="transaction reverted")
+            return
+
+        rejected = {
+            (log["args"]["_user"], log["args"]["_nonce"]): INTENT_REJECT_REASONS.get(log["args"]["_reason"], "rejected")
+            for log in contract.events.IntentRejected().process_receipt(receipt, errors=DISCARD)
+        }
+        for record in batch:
+            reason = rejected.get((record["intent"]["user"], record["intent"]["nonce"]))
+            if reason:
+                record.update(status="rejected", error=reason)
+            else:
+                record.update(status="settled", block_number=receipt["blockNumber"])
+
+@app.get("/intents/domain")
+async def intent_domain():
+    # EIP-712 types and domain for clients to sign DonationIntents with
+    if relay is None:
+        return {"status": "error", "message": "Relay mode is off"}
+    typed_data = intent_typed_data({}, await w3.eth.chain_id)
+    return {key: typed_data[key] for key in ("types", "primaryType", "domain")}
+
+@app.post("/intents")
+async def submit_intent(request: fastapi.Request):
+    # Body: {"intent": {"user", "amount", "nonce", "deadline"}, "signature": "0x..."}
+    if relay is None:
+        return {"status": "error", "message": "Relay mode is off"}
+    try:
+        data = await request.json()
+        return await relay.add(data["intent"], data["signature"])
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/intents/{intent_id}")
+async def intent_status(intent_id: str):
+    record = relay.status(intent_id) if relay else None
+    if record is None:
+        return {"status": "unknown", "id": intent_id}
+    return record
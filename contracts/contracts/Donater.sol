@@ -2,18 +2,25 @@
 pragma solidity ^0.8.28;
 
 import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/utils/cryptography/ECDSA.sol";
+import "@openzeppelin/contracts/utils/cryptography/EIP712.sol";
 
-contract Donater is Ownable {
+contract Donater is Ownable, EIP712 {
 
-    constructor() Ownable(msg.sender) {}
+    constructor() Ownable(msg.sender) EIP712("Donater", "1") {}
 
+    // Topics are bytes32 ids (UTF-8, zero-padded) mapped to names off-chain,
+    // and percentages are packed one byte each: charityPercents byte i is
+    // the share of charities[i]. A portfolio's percentages take one slot.
     struct UserTopics {
-        string[] ttopics;
+        bytes32[3] ttopics;
         address[] charities;
-        uint256[] charityPercents;
+        uint256 charityPercents;
         uint256 balance;
     }
 
+    uint256 constant MAX_CHARITIES = 32;
+
     modifier onlyUserOrOwner(address user) {
         require(msg.sender == user || msg.sender == owner(), "Not authorized");
         _;
@@ -21,34 +28,67 @@ contract Donater is Ownable {
 
     mapping(address => UserTopics) public topics;
 
+    // Accounts besides the owner allowed to pay out balances in batches (the
+    // split scheduler), so they send with their own keys and nonces
+    mapping(address => bool) public splitters;
+
+    modifier onlyOwnerOrSplitter() {
+        require(msg.sender == owner() || splitters[msg.sender], "Not authorized");
+        _;
+    }
+
+    // Relayed donations: a user funds a deposit once, then signs EIP-712
+    // DonationIntents off-chain; an authorized relayer (not the owner, so the
+    // relay runs with its own key) settles many of them per transaction with
+    // donateBatch, moving each amount from the deposit to the user's balance.
+    struct DonationIntent {
+        address user;
+        uint256 amount;
+        uint256 nonce;
+        uint256 deadline;
+    }
+
+    bytes32 constant DONATION_INTENT_TYPEHASH = keccak256("DonationIntent(address user,uint256 amount,uint256 nonce,uint256 deadline)");
+
+    // Reasons an intent in a batch is skipped
+    uint8 constant INTENT_EXPIRED = 1;
+    uint8 constant INTENT_USED = 2;
+    uint8 constant INTENT_UNFUNDED = 3;
+    uint8 constant INTENT_BAD_SIGNATURE = 4;
+
+    mapping(address => uint256) public deposits;
+    mapping(address => bool) public relayers;
+    // Used intent nonces as a bitmap, 256 per slot, so a user's intents in a
+    // batch mostly write the same slot
+    mapping(address => mapping(uint256 => uint256)) intentNonces;
+
     event Donated(address indexed _user, uint256 _amount);
     event SplitAmongCharities(address indexed _user, uint256 _amount);
-    event CharitiesUpdated(address indexed _user, address[] _charities, uint256[] _charityPercents);
-    event Enrolled(address indexed _user, string[] _topics, address[] _charities, uint256[] _charityPercents);
+    event CharitiesUpdated(address indexed _user, address[] _charities, uint8[] _charityPercents);
+    event Enrolled(address indexed _user, bytes32[] _topics, address[] _charities, uint8[] _charityPercents);
+    event TopicsUpdated(address indexed _user, bytes32[] _topics);
     event Withdrawn(address indexed _user, uint256 _amount);
+    event Deposited(address indexed _user, uint256 _amount);
+    event DepositWithdrawn(address indexed _user, uint256 _amount);
+    event IntentRejected(address indexed _user, uint256 _nonce, uint8 _reason);
+    event SplitterUpdated(address indexed _splitter, bool _allowed);
+    event RelayerUpdated(address indexed _relayer, bool _allowed);
 
-    function enroll(string[] memory _topics, address[] memory _charities, uint256[] memory _charityPercents) public {
+    function enroll(bytes32[] memory _topics, address[] memory _charities, uint8[] memory _charityPercents) public {
         require(_topics.length == 3, "Topics must be 3");
-        
-        // console.log("Enrolling user: %s", msg.sender);
-        // console.log("Topics: %s, %s, %s", _topics[0], _topics[1], _topics[2]);
-        // console.log("Charity address: %s", _charity);
-        
-        topics[msg.sender] = UserTopics({
-            ttopics: _topics,
-            charities: _charities,
-            charityPercents: _charityPercents,
-            balance: 0
-        });
+
+        UserTopics storage userTopic = topics[msg.sender];
+        userTopic.ttopics = [_topics[0], _topics[1], _topics[2]];
+        _storeCharities(userTopic, _charities, _charityPercents);
+        userTopic.balance = 0;
         emit Enrolled(msg.sender, _topics, _charities, _charityPercents);
-        // console.log("Enrollment complete. First charity: %s, Percentage: %d", userTopic.charities[0], userTopic.charityPercents[0]);
     }
 
-    function setTopics(address user, string[] memory _topics) public onlyUserOrOwner(user) {
+    function setTopics(address user, bytes32[] memory _topics) public onlyUserOrOwner(user) {
         require(_topics.length == 3, "Topics must be 3");
-        
-        UserTopics storage userTopic = topics[user];
-        userTopic.ttopics = _topics;
+
+        topics[user].ttopics = [_topics[0], _topics[1], _topics[2]];
+        emit TopicsUpdated(user, _topics);
     }
 
     // TODO: Automate this using ERC-20 and approve()
@@ -68,24 +108,121 @@ contract Donater is Ownable {
         emit Withdrawn(msg.sender, amount);
     }
 
-    function getTopics(address user) public view returns (string[] memory _topics) {
-        return topics[user].ttopics;    
+    function deposit() external payable {
+        deposits[msg.sender] += msg.value;
+        emit Deposited(msg.sender, msg.value);
     }
 
-    function setCharities(address user, address[] memory charities, uint256[] memory percentages) public onlyOwner {
-        require(charities.length == percentages.length, "Charities and percentages must be the same length");
+    function withdrawDeposit() external {
+        uint256 amount = deposits[msg.sender];
+        require(amount > 0, "No deposit to withdraw");
 
-        topics[user].charities = charities;
-        topics[user].charityPercents = percentages;
-        emit CharitiesUpdated(user, charities, percentages);
+        deposits[msg.sender] = 0;
+        payable(msg.sender).transfer(amount);
+        emit DepositWithdrawn(msg.sender, amount);
+    }
+
+    // Settles signed intents; invalid ones emit IntentRejected instead of reverting the batch
+    function donateBatch(DonationIntent[] calldata intents, bytes[] calldata signatures) external {
+        require(relayers[msg.sender], "Not a relayer");
+        require(intents.length == signatures.length, "Batch arrays must be the same length");
+
+        for (uint256 i; i < intents.length; i++) {
+            DonationIntent calldata intent = intents[i];
+            uint8 reason = _checkIntent(intent, signatures[i]);
+            if (reason != 0) {
+                emit IntentRejected(intent.user, intent.nonce, reason);
+                continue;
+            }
+            intentNonces[intent.user][intent.nonce >> 8] |= uint256(1) << (intent.nonce & 0xff);
+            deposits[intent.user] -= intent.amount;
+            topics[intent.user].balance += intent.amount;
+            emit Donated(intent.user, intent.amount);
+        }
+    }
+
+    function setRelayer(address relayer, bool allowed) external onlyOwner {
+        relayers[relayer] = allowed;
+        emit RelayerUpdated(relayer, allowed);
+    }
+
+    function usedIntents(address user, uint256 nonce) public view returns (bool) {
+        return (intentNonces[user][nonce >> 8] & (uint256(1) << (nonce & 0xff))) != 0;
+    }
+
+    function _checkIntent(DonationIntent calldata intent, bytes calldata signature) internal view returns (uint8) {
+        if (block.timestamp > intent.deadline) return INTENT_EXPIRED;
+        if (usedIntents(intent.user, intent.nonce)) return INTENT_USED;
+        if (deposits[intent.user] < intent.amount) return INTENT_UNFUNDED;
+
+        bytes32 digest = _hashTypedDataV4(keccak256(abi.encode(
+            DONATION_INTENT_TYPEHASH, intent.user, intent.amount, intent.nonce, intent.deadline
+        )));
+        (address signer, ECDSA.RecoverError error, ) = ECDSA.tryRecover(digest, signature);
+        if (error != ECDSA.RecoverError.NoError || signer != intent.user) return INTENT_BAD_SIGNATURE;
+        return 0;
+    }
+
+    function getTopics(address user) public view returns (bytes32[3] memory _topics) {
+        return topics[user].ttopics;
+    }
+
+    function setCharities(address user, address[] memory charities, uint8[] memory percentages) public onlyOwner {
+        _setCharities(user, charities, percentages);
+    }
+
+    // Rebalances many users in one transaction; emits CharitiesUpdated per user
+    function setCharitiesBatch(address[] calldata users, address[][] calldata charities, uint8[][] calldata percentages) external onlyOwner {
+        require(users.length == charities.length && users.length == percentages.length, "Batch arrays must be the same length");
+
+        for (uint256 i; i < users.length; i++) {
+            _setCharities(users[i], charities[i], percentages[i]);
+        }
     }
 
     function splitAmongCharities(address user) public onlyOwner {
-        uint256 totalBalance = topics[user].balance;
-        topics[user].balance = 0;
-        for (uint256 i; i < topics[user].charityPercents.length; i++) {
-            address charity = topics[user].charities[i];
-            uint256 percentage = topics[user].charityPercents[i];
+        _splitAmongCharities(user);
+    }
+
+    // Pays out many users in one transaction; emits SplitAmongCharities per user
+    function splitAmongCharitiesBatch(address[] calldata users) external onlyOwnerOrSplitter {
+        for (uint256 i; i < users.length; i++) {
+            _splitAmongCharities(users[i]);
+        }
+    }
+
+    function setSplitter(address splitter, bool allowed) external onlyOwner {
+        splitters[splitter] = allowed;
+        emit SplitterUpdated(splitter, allowed);
+    }
+
+    function _setCharities(address user, address[] memory charities, uint8[] memory percentages) internal {
+        _storeCharities(topics[user], charities, percentages);
+        emit CharitiesUpdated(user, charities, percentages);
+    }
+
+    function _storeCharities(UserTopics storage userTopic, address[] memory charities, uint8[] memory percentages) internal {
+        require(charities.length == percentages.length, "Charities and percentages must be the same length");
+        require(charities.length <= MAX_CHARITIES, "Too many charities");
+
+        uint256 packed;
+        for (uint256 i; i < percentages.length; i++) {
+            packed |= uint256(percentages[i]) << (8 * i);
+        }
+        userTopic.charities = charities;
+        userTopic.charityPercents = packed;
+    }
+
+    function _splitAmongCharities(address user) internal {
+        UserTopics storage userTopic = topics[user];
+        uint256 totalBalance = userTopic.balance;
+        userTopic.balance = 0;
+
+        uint256 packed = userTopic.charityPercents;
+        uint256 count = userTopic.charities.length;
+        for (uint256 i; i < count; i++) {
+            address charity = userTopic.charities[i];
+            uint256 percentage = (packed >> (8 * i)) & 0xff;
             uint256 amount = totalBalance * percentage / 100;
             payable(charity).transfer(amount);
         }
@@ -98,13 +235,17 @@ contract Donater is Ownable {
     }
 
     function getUserTopics(address user) public view returns (
-    string[] memory,
+    bytes32[3] memory,
     address[] memory,
-    uint256[] memory,
+    uint8[] memory,
     uint256
     ) {
     UserTopics storage ut = topics[user];
-    return (ut.ttopics, ut.charities, ut.charityPercents, ut.balance);
+    uint8[] memory percents = new uint8[](ut.charities.length);
+    for (uint256 i; i < percents.length; i++) {
+        percents[i] = uint8(ut.charityPercents >> (8 * i));
+    }
+    return (ut.ttopics, ut.charities, percents, ut.balance);
 }
 
-}   
+}
@@ -0,0 +1,128 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.28;
+
+import "@openzeppelin/contracts/access/Ownable.sol";
+
+// The pre-packing Donater storage layout, only deployed by the gas comparison tests
+contract DonaterUnpacked is Ownable {
+
+    constructor() Ownable(msg.sender) {}
+
+    struct UserTopics {
+        string[] ttopics;
+        address[] charities;
+        uint256[] charityPercents;
+        uint256 balance;
+    }
+
+    modifier onlyUserOrOwner(address user) {
+        require(msg.sender == user || msg.sender == owner(), "Not authorized");
+        _;
+    }
+
+    mapping(address => UserTopics) public topics;
+
+    event Donated(address indexed _user, uint256 _amount);
+    event SplitAmongCharities(address indexed _user, uint256 _amount);
+    event CharitiesUpdated(address indexed _user, address[] _charities, uint256[] _charityPercents);
+    event Enrolled(address indexed _user, string[] _topics, address[] _charities, uint256[] _charityPercents);
+    event Withdrawn(address indexed _user, uint256 _amount);
+
+    function enroll(string[] memory _topics, address[] memory _charities, uint256[] memory _charityPercents) public {
+        require(_topics.length == 3, "Topics must be 3");
+        
+        topics[msg.sender] = UserTopics({
+            ttopics: _topics,
+            charities: _charities,
+            charityPercents: _charityPercents,
+            balance: 0
+        });
+        emit Enrolled(msg.sender, _topics, _charities, _charityPercents);
+    }
+
+    function setTopics(address user, string[] memory _topics) public onlyUserOrOwner(user) {
+        require(_topics.length == 3, "Topics must be 3");
+        
+        UserTopics storage userTopic = topics[user];
+        userTopic.ttopics = _topics;
+    }
+
+    function donate() public payable {
+        topics[msg.sender].balance += msg.value;
+        emit Donated(msg.sender, msg.value);
+    }
+
+    function withdraw() public {
+        require(topics[msg.sender].balance > 0, "No balance to withdraw");
+
+        // send money back to msg.sender
+        uint256 amount = topics[msg.sender].balance;
+        topics[msg.sender].balance = 0;
+        payable(msg.sender).transfer(amount);
+        emit Withdrawn(msg.sender, amount);
+    }
+
+    function getTopics(address user) public view returns (string[] memory _topics) {
+        return topics[user].ttopics;    
+    }
+
+    function setCharities(address user, address[] memory charities, uint256[] memory percentages) public onlyOwner {
+        _setCharities(user, charities, percentages);
+    }
+
+    // Rebalances many users in one transaction; emits CharitiesUpdated per user
+    function setCharitiesBatch(address[] calldata users, address[][] calldata charities, uint256[][] calldata percentages) external onlyOwner {
+        require(users.length == charities.length && users.length == percentages.length, "Batch arrays must be the same length");
+
+        for (uint256 i; i < users.length; i++) {
+            _setCharities(users[i], charities[i], percentages[i]);
+        }
+    }
+
+    function splitAmongCharities(address user) public onlyOwner {
+        _splitAmongCharities(user);
+    }
+
+    // Pays out many users in one transaction; emits SplitAmongCharities per user
+    function splitAmongCharitiesBatch(address[] calldata users) external onlyOwner {
+        for (uint256 i; i < users.length; i++) {
+            _splitAmongCharities(users[i]);
+        }
+    }
+
+    function _setCharities(address user, address[] memory charities, uint256[] memory percentages) internal {
+        require(charities.length == percentages.length, "Charities and percentages must be the same length");
+
+        topics[user].charities = charities;
+        topics[user].charityPercents = percentages;
+        emit CharitiesUpdated(user, charities, percentages);
+    }
+
+    function _splitAmongCharities(address user) internal {
+        uint256 totalBalance = topics[user].balance;
+        topics[user].balance = 0;
+        for (uint256 i; i < topics[user].charityPercents.length; i++) {
+            address charity = topics[user].charities[i];
+            uint256 percentage = topics[user].charityPercents[i];
+            uint256 amount = totalBalance * percentage / 100;
+            payable(charity).transfer(amount);
+        }
+
+        emit SplitAmongCharities(user, totalBalance);
+    }
+
+    function getBalance(address recipient) public view returns (uint256 balance) {
+        return topics[recipient].balance;
+    }
+
+    function getUserTopics(address user) public view returns (
+    string[] memory,
+    address[] memory,
+    uint256[] memory,
+    uint256
+    ) {
+    UserTopics storage ut = topics[user];
+    return (ut.ttopics, ut.charities, ut.charityPercents, ut.balance);
+}
+
+}
@@ -3,6 +3,10 @@ import "@nomicfoundation/hardhat-toolbox";
 
 const config: HardhatUserConfig = {
   solidity: "0.8.28",
+  gasReporter: {
+    // REPORT_GAS=true npx hardhat test
+    enabled: process.env.REPORT_GAS === "true",
+  },
   networks: {
     fuji: {
       url: 'https://api.avax-test.network/ext/bc/C/rpc',
@@ -21,14 +21,18 @@ async function main() {
   
   // Save the contract address to a file for easy reference
   const fs = require('fs');
+  // version 2: packed storage, batch functions, TopicsUpdated and the intent relay.
+  // The Python services read the address and pick the matching ABI from this file.
   const contractInfo = {
     address: contractAddress,
+    version: 2,
     network: "Avalanche Fuji",
     chainId: 43113,
     deployedAt: new Date().toISOString()
   };
   
-  fs.writeFileSync('deployed-contract.json', JSON.stringify(contractInfo, null, 2));
+  const path = require('path');
+  fs.writeFileSync(path.join(__dirname, '..', 'deployed-contract.json'), JSON.stringify(contractInfo, null, 2));
   console.log("💾 Contract info saved to deployed-contract.json");
 }
 
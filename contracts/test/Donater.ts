@@ -1,6 +1,10 @@
 const { expect } = require("chai");
 const { ethers } = require("hardhat");
 
+// Topics are stored as bytes32 ids; see encode_topic in web3_utils/interact_with_contract.py
+const topicIds = (names: string[]) => names.map((name) => ethers.encodeBytes32String(name));
+const topicNames = (ids: string[]) => ids.map((id) => ethers.decodeBytes32String(id));
+
 describe("Donater", function () {
   let Donater;
   let donater: any;
@@ -24,10 +28,10 @@ describe("Donater", function () {
       const charities = [charity1.address, charity2.address];
       const percentages = [60, 40];
 
-      await donater.connect(user1).enroll(topics, charities, percentages);
+      await donater.connect(user1).enroll(topicIds(topics), charities, percentages);
       
       const userTopics = await donater.getUserTopics(user1.address);
-      expect(userTopics[0]).to.deep.equal(topics);
+      expect(topicNames(userTopics[0])).to.deep.equal(topics);
       expect(userTopics[1]).to.deep.equal(charities);
       expect(userTopics[2].map((p: any) => p)).to.deep.equal(percentages);
       expect(userTopics[3]).to.equal(0); // Initial balance should be 0
@@ -39,7 +43,7 @@ describe("Donater", function () {
       const percentages = [100];
 
       await expect(
-        donater.connect(user1).enroll(topics, charities, percentages)
+        donater.connect(user1).enroll(topicIds(topics), charities, percentages)
       ).to.be.revertedWith("Topics must be 3");
     });
   });
@@ -49,7 +53,7 @@ describe("Donater", function () {
       const topics = ["Education", "Healthcare", "Environment"];
       const charities = [charity1.address, charity2.address];
       const percentages = [60, 40];
-      await donater.connect(user1).enroll(topics, charities, percentages);
+      await donater.connect(user1).enroll(topicIds(topics), charities, percentages);
     });
 
     it("should allow users to donate", async function () {
@@ -88,7 +92,7 @@ describe("Donater", function () {
       const topics = ["Education", "Healthcare", "Environment"];
       const charities = [charity1.address];
       const percentages = [100];
-      await donater.connect(user1).enroll(topics, charities, percentages);
+      await donater.connect(user1).enroll(topicIds(topics), charities, percentages);
     });
 
     it("should allow owner to set new charities and percentages", async function () {
@@ -126,7 +130,7 @@ describe("Donater", function () {
       const topics = ["Education", "Healthcare", "Environment"];
       const charities = [charity1.address, charity2.address];
       const percentages = [60, 40];
-      await donater.connect(user1).enroll(topics, charities, percentages);
+      await donater.connect(user1).enroll(topicIds(topics), charities, percentages);
       
       // Donate 1 ETH
       await donater.connect(user1).donate({ value: ethers.parseEther("1.0") });
@@ -164,37 +168,364 @@ describe("Donater", function () {
       const topics = ["Education", "Healthcare", "Environment"];
       const charities = [charity1.address];
       const percentages = [100];
-      await donater.connect(user1).enroll(topics, charities, percentages);
+      await donater.connect(user1).enroll(topicIds(topics), charities, percentages);
     });
 
     it("should allow users to set their topics", async function () {
       const newTopics = ["Art", "Music", "Sports"];
-      await donater.connect(user1).setTopics(user1.address, newTopics);
+      await donater.connect(user1).setTopics(user1.address, topicIds(newTopics));
       
       const userTopics = await donater.getTopics(user1.address);
-      expect(userTopics).to.deep.equal(newTopics);
+      expect(topicNames(userTopics)).to.deep.equal(newTopics);
     });
 
     it("should allow owner to set user topics", async function () {
       const newTopics = ["Art", "Music", "Sports"];
-      await donater.connect(owner).setTopics(user1.address, newTopics);
+      await donater.connect(owner).setTopics(user1.address, topicIds(newTopics));
       
       const userTopics = await donater.getTopics(user1.address);
-      expect(userTopics).to.deep.equal(newTopics);
+      expect(topicNames(userTopics)).to.deep.equal(newTopics);
+    });
+
+    it("should emit TopicsUpdated event", async function () {
+      const newTopics = ["Art", "Music", "Sports"];
+      await expect(donater.connect(owner).setTopics(user1.address, topicIds(newTopics)))
+        .to.emit(donater, "TopicsUpdated")
+        .withArgs(user1.address, topicIds(newTopics));
     });
 
     it("should revert when unauthorized user tries to set topics", async function () {
       const newTopics = ["Art", "Music", "Sports"];
       await expect(
-        donater.connect(user2).setTopics(user1.address, newTopics)
+        donater.connect(user2).setTopics(user1.address, topicIds(newTopics))
       ).to.be.revertedWith("Not authorized");
     });
 
     it("should revert when topics array length is not 3", async function () {
       const newTopics = ["Art", "Music"];
       await expect(
-        donater.connect(user1).setTopics(user1.address, newTopics)
+        donater.connect(user1).setTopics(user1.address, topicIds(newTopics))
       ).to.be.revertedWith("Topics must be 3");
     });
   });
+  describe("Batch Charity Management", function () {
+    const topics = ["Education", "Healthcare", "Environment"];
+    let users: any[];
+
+    beforeEach(async function () {
+      users = (await ethers.getSigners()).slice(6, 16);
+      for (const user of users) {
+        await donater.connect(user).enroll(topicIds(topics), [charity1.address], [100]);
+        await donater.connect(user).donate({ value: ethers.parseEther("1.0") });
+      }
+    });
+
+    it("should allow owner to set charities for many users in one transaction", async function () {
+      const addresses = users.map((user) => user.address);
+      const charities = users.map(() => [charity2.address, charity3.address]);
+      const percentages = users.map(() => [70, 30]);
+
+      await donater.connect(owner).setCharitiesBatch(addresses, charities, percentages);
+
+      for (const user of users) {
+        const userTopics = await donater.getUserTopics(user.address);
+        expect(userTopics[1]).to.deep.equal([charity2.address, charity3.address]);
+        expect(userTopics[2].map((p: any) => Number(p))).to.deep.equal([70, 30]);
+      }
+    });
+
+    it("should emit CharitiesUpdated for every user in a batch", async function () {
+      const tx = donater.connect(owner).setCharitiesBatch(
+        [users[0].address, users[1].address],
+        [[charity2.address], [charity3.address]],
+        [[100], [100]]
+      );
+
+      await expect(tx)
+        .to.emit(donater, "CharitiesUpdated")
+        .withArgs(users[0].address, [charity2.address], [100]);
+      await expect(tx)
+        .to.emit(donater, "CharitiesUpdated")
+        .withArgs(users[1].address, [charity3.address], [100]);
+    });
+
+    it("should revert when batch arrays have different lengths", async function () {
+      await expect(
+        donater.connect(owner).setCharitiesBatch([users[0].address, users[1].address], [[charity2.address]], [[100]])
+      ).to.be.revertedWith("Batch arrays must be the same length");
+    });
+
+    it("should revert a batch when one user's charities and percentages differ in length", async function () {
+      await expect(
+        donater.connect(owner).setCharitiesBatch(
+          [users[0].address, users[1].address],
+          [[charity2.address], [charity2.address, charity3.address]],
+          [[100], [100]]
+        )
+      ).to.be.revertedWith("Charities and percentages must be the same length");
+    });
+
+    it("should only allow the owner to call the batch functions", async function () {
+      await expect(
+        donater.connect(user1).setCharitiesBatch([users[0].address], [[charity2.address]], [[100]])
+      ).to.be.revertedWithCustomError(donater, "OwnableUnauthorizedAccount");
+      await expect(
+        donater.connect(user1).splitAmongCharitiesBatch([users[0].address])
+      ).to.be.revertedWith("Not authorized");
+    });
+
+    it("should let an authorized splitter pay out batches until revoked", async function () {
+      const splitter = user2;
+      await expect(donater.connect(user1).setSplitter(splitter.address, true))
+        .to.be.revertedWithCustomError(donater, "OwnableUnauthorizedAccount");
+
+      await expect(donater.connect(owner).setSplitter(splitter.address, true))
+        .to.emit(donater, "SplitterUpdated")
+        .withArgs(splitter.address, true);
+      await expect(donater.connect(splitter).splitAmongCharitiesBatch([users[0].address]))
+        .to.emit(donater, "SplitAmongCharities")
+        .withArgs(users[0].address, ethers.parseEther("1.0"));
+      // Only the batch payout; the splitter can't change portfolios
+      await expect(
+        donater.connect(splitter).setCharitiesBatch([users[1].address], [[charity2.address]], [[100]])
+      ).to.be.revertedWithCustomError(donater, "OwnableUnauthorizedAccount");
+
+      await donater.connect(owner).setSplitter(splitter.address, false);
+      await expect(
+        donater.connect(splitter).splitAmongCharitiesBatch([users[1].address])
+      ).to.be.revertedWith("Not authorized");
+    });
+
+    it("should split donations for many users in one transaction", async function () {
+      const initialBalance = await ethers.provider.getBalance(charity1.address);
+
+      const tx = donater.connect(owner).splitAmongCharitiesBatch(users.map((user) => user.address));
+      await expect(tx)
+        .to.emit(donater, "SplitAmongCharities")
+        .withArgs(users[0].address, ethers.parseEther("1.0"));
+
+      const finalBalance = await ethers.provider.getBalance(charity1.address);
+      expect(finalBalance - initialBalance).to.equal(ethers.parseEther("1.0") * BigInt(users.length));
+      for (const user of users) {
+        expect(await donater.getBalance(user.address)).to.equal(0);
+      }
+    });
+
+    it("should use less gas than per-user transactions", async function () {
+      // Same starting state on a second deployment for the per-user path
+      const perUser = await Donater.deploy();
+      await perUser.waitForDeployment();
+      for (const user of users) {
+        await perUser.connect(user).enroll(topicIds(topics), [charity1.address], [100]);
+        await perUser.connect(user).donate({ value: ethers.parseEther("1.0") });
+      }
+
+      const addresses = users.map((user) => user.address);
+      const charities = users.map(() => [charity2.address, charity3.address]);
+      const percentages = users.map(() => [60, 40]);
+
+      let perUserSetGas = 0n;
+      let perUserSplitGas = 0n;
+      for (const user of users) {
+        const setTx = await perUser.connect(owner).setCharities(user.address, [charity2.address, charity3.address], [60, 40]);
+        perUserSetGas += (await setTx.wait()).gasUsed;
+      }
+      for (const user of users) {
+        const splitTx = await perUser.connect(owner).splitAmongCharities(user.address);
+        perUserSplitGas += (await splitTx.wait()).gasUsed;
+      }
+
+      const batchSetTx = await donater.connect(owner).setCharitiesBatch(addresses, charities, percentages);
+      const batchSetGas = (await batchSetTx.wait()).gasUsed;
+      const batchSplitTx = await donater.connect(owner).splitAmongCharitiesBatch(addresses);
+      const batchSplitGas = (await batchSplitTx.wait()).gasUsed;
+
+      console.table({
+        setCharities: { users: users.length, perUser: perUserSetGas.toString(), batch: batchSetGas.toString() },
+        splitAmongCharities: { users: users.length, perUser: perUserSplitGas.toString(), batch: batchSplitGas.toString() },
+      });
+      expect(batchSetGas).to.be.lessThan(perUserSetGas);
+      expect(batchSplitGas).to.be.lessThan(perUserSplitGas);
+    });
+  });
+  describe("Relayed Donations", function () {
+    const intentTypes = {
+      DonationIntent: [
+        { name: "user", type: "address" },
+        { name: "amount", type: "uint256" },
+        { name: "nonce", type: "uint256" },
+        { name: "deadline", type: "uint256" },
+      ],
+    };
+    let domain: any;
+    let deadline: bigint;
+    let relayer: any;
+
+    const signIntent = async (user: any, amount: bigint, nonce: number, intentDeadline = deadline) => {
+      const intent = { user: user.address, amount, nonce, deadline: intentDeadline };
+      return { intent, signature: await user.signTypedData(domain, intentTypes, intent) };
+    };
+
+    beforeEach(async function () {
+      domain = {
+        name: "Donater",
+        version: "1",
+        chainId: (await ethers.provider.getNetwork()).chainId,
+        verifyingContract: await donater.getAddress(),
+      };
+      deadline = BigInt((await ethers.provider.getBlock("latest")).timestamp + 3600);
+      relayer = (await ethers.getSigners())[16];
+      await donater.connect(owner).setRelayer(relayer.address, true);
+      await donater.connect(user1).deposit({ value: ethers.parseEther("1.0") });
+    });
+
+    it("should move signed intents from the deposit to the balance", async function () {
+      const first = await signIntent(user1, ethers.parseEther("0.3"), 0);
+      const second = await signIntent(user1, ethers.parseEther("0.2"), 1);
+
+      const tx = donater.connect(relayer).donateBatch([first.intent, second.intent], [first.signature, second.signature]);
+      await expect(tx).to.emit(donater, "Donated").withArgs(user1.address, ethers.parseEther("0.3"));
+      await expect(tx).to.emit(donater, "Donated").withArgs(user1.address, ethers.parseEther("0.2"));
+
+      expect(await donater.getBalance(user1.address)).to.equal(ethers.parseEther("0.5"));
+      expect(await donater.deposits(user1.address)).to.equal(ethers.parseEther("0.5"));
+      expect(await donater.usedIntents(user1.address, 0)).to.equal(true);
+    });
+
+    it("should skip invalid intents without reverting the batch", async function () {
+      const valid = await signIntent(user1, ethers.parseEther("0.1"), 0);
+      const forged = { intent: { ...valid.intent, nonce: 1 }, signature: (await signIntent(user2, ethers.parseEther("0.1"), 1)).signature };
+      const unfunded = await signIntent(user1, ethers.parseEther("5.0"), 2);
+      const expired = await signIntent(user1, ethers.parseEther("0.1"), 3, 1n);
+
+      const tx = donater.connect(relayer).donateBatch(
+        [valid.intent, valid.intent, forged.intent, unfunded.intent, expired.intent],
+        [valid.signature, valid.signature, forged.signature, unfunded.signature, expired.signature]
+      );
+      await expect(tx).to.emit(donater, "IntentRejected").withArgs(user1.address, 0, 2); // replayed
+      await expect(tx).to.emit(donater, "IntentRejected").withArgs(user1.address, 1, 4); // bad signature
+      await expect(tx).to.emit(donater, "IntentRejected").withArgs(user1.address, 2, 3); // deposit too low
+      await expect(tx).to.emit(donater, "IntentRejected").withArgs(user1.address, 3, 1); // expired
+
+      expect(await donater.getBalance(user1.address)).to.equal(ethers.parseEther("0.1"));
+    });
+
+    it("should only let authorized relayers settle intents", async function () {
+      const { intent, signature } = await signIntent(user1, ethers.parseEther("0.1"), 0);
+      await expect(donater.connect(user1).donateBatch([intent], [signature])).to.be.revertedWith("Not a relayer");
+      // The owner key stays out of the relay
+      await expect(donater.connect(owner).donateBatch([intent], [signature])).to.be.revertedWith("Not a relayer");
+      await expect(donater.connect(user1).setRelayer(user1.address, true))
+        .to.be.revertedWithCustomError(donater, "OwnableUnauthorizedAccount");
+
+      await expect(donater.connect(owner).setRelayer(relayer.address, false))
+        .to.emit(donater, "RelayerUpdated")
+        .withArgs(relayer.address, false);
+      await expect(donater.connect(relayer).donateBatch([intent], [signature])).to.be.revertedWith("Not a relayer");
+    });
+
+    it("should let users withdraw their unspent deposit", async function () {
+      await expect(donater.connect(user1).withdrawDeposit())
+        .to.emit(donater, "DepositWithdrawn")
+        .withArgs(user1.address, ethers.parseEther("1.0"));
+      expect(await donater.deposits(user1.address)).to.equal(0);
+      await expect(donater.connect(user1).withdrawDeposit()).to.be.revertedWith("No deposit to withdraw");
+    });
+
+    it("should use fewer transactions and less gas per donation than donate()", async function () {
+      const users = (await ethers.getSigners()).slice(6, 16);
+      const donationsPerUser = 5;
+      const amount = ethers.parseEther("0.01");
+      const gasUsed = async (tx: any) => (await (await tx).wait()).gasUsed;
+
+      let directGas = 0n;
+      for (const user of users) {
+        for (let i = 0; i < donationsPerUser; i++) {
+          directGas += await gasUsed(donater.connect(user).donate({ value: amount }));
+        }
+      }
+
+      // One deposit per user covers all of their donations
+      let depositGas = 0n;
+      const intents = [];
+      const signatures = [];
+      for (const user of users) {
+        depositGas += await gasUsed(donater.connect(user).deposit({ value: amount * BigInt(donationsPerUser) }));
+        for (let i = 0; i < donationsPerUser; i++) {
+          const signed = await signIntent(user, amount, i);
+          intents.push(signed.intent);
+          signatures.push(signed.signature);
+        }
+      }
+      const batchGas = await gasUsed(donater.connect(relayer).donateBatch(intents, signatures));
+
+      const donations = BigInt(users.length * donationsPerUser);
+      console.table({
+        "donate()": { transactions: Number(donations), gasPerDonation: (directGas / donations).toString() },
+        "relay (deposits + batch)": { transactions: users.length + 1, gasPerDonation: ((depositGas + batchGas) / donations).toString() },
+        "relay (batch only)": { transactions: 1, gasPerDonation: (batchGas / donations).toString() },
+      });
+      expect(depositGas + batchGas).to.be.lessThan(directGas);
+    });
+  });
+  describe("Storage Layout Gas", function () {
+    it("should use less gas than the unpacked layout for enroll, setCharities and split", async function () {
+      const Unpacked = await ethers.getContractFactory("DonaterUnpacked");
+      const unpacked = await Unpacked.deploy();
+      await unpacked.waitForDeployment();
+
+      const topics = ["Education", "Healthcare", "Environment"];
+      const charities = [charity1.address, charity2.address, charity3.address];
+      const percentages = [50, 30, 20];
+      const newPercentages = [20, 30, 50];
+
+      const gasUsed = async (tx: any) => (await (await tx).wait()).gasUsed;
+      const packed = {
+        enroll: await gasUsed(donater.connect(user1).enroll(topicIds(topics), charities, percentages)),
+        setCharities: await gasUsed(donater.connect(owner).setCharities(user1.address, charities, newPercentages)),
+        split: 0n,
+      };
+      const legacy = {
+        enroll: await gasUsed(unpacked.connect(user1).enroll(topics, charities, percentages)),
+        setCharities: await gasUsed(unpacked.connect(owner).setCharities(user1.address, charities, newPercentages)),
+        split: 0n,
+      };
+
+      await donater.connect(user1).donate({ value: ethers.parseEther("1.0") });
+      await unpacked.connect(user1).donate({ value: ethers.parseEther("1.0") });
+      packed.split = await gasUsed(donater.connect(owner).splitAmongCharities(user1.address));
+      legacy.split = await gasUsed(unpacked.connect(owner).splitAmongCharities(user1.address));
+
+      console.table(
+        Object.fromEntries(
+          (["enroll", "setCharities", "split"] as const).map((name) => [
+            name,
+            { unpacked: legacy[name].toString(), packed: packed[name].toString(), saved: (legacy[name] - packed[name]).toString() },
+          ])
+        )
+      );
+      expect(packed.enroll).to.be.lessThan(legacy.enroll);
+      expect(packed.setCharities).to.be.lessThan(legacy.setCharities);
+      expect(packed.split).to.be.lessThan(legacy.split);
+    });
+
+    it("should round-trip packed percentages through getUserTopics", async function () {
+      const charities = [charity1.address, charity2.address, charity3.address];
+      const percentages = [1, 255, 0];
+
+      await donater.connect(user1).enroll(topicIds(["a", "b", "c"]), charities, percentages);
+
+      const userTopics = await donater.getUserTopics(user1.address);
+      expect(userTopics[2].map((p: any) => Number(p))).to.deep.equal(percentages);
+    });
+
+    it("should revert when a portfolio has more than 32 charities", async function () {
+      const charities = Array(33).fill(charity1.address);
+      const percentages = Array(33).fill(1);
+
+      await expect(
+        donater.connect(owner).setCharities(user1.address, charities, percentages)
+      ).to.be.revertedWith("Too many charities");
+    });
+  });
 });
\ No newline at end of file
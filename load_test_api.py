@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+# Needs a running API (LOAD_TEST_URL), so it is named to stay out of pytest's
+# test_*.py collection; run it directly with python load_test_api.py
+API_URL = os.getenv("LOAD_TEST_URL", "http://localhost:8000")
+DURATION = float(os.getenv("LOAD_TEST_SECONDS", "10"))
+CONCURRENCY_LEVELS = [int(level) for level in os.getenv("LOAD_TEST_CONCURRENCY", "1,8,32,64").split(",")]
+# Throughput at the highest concurrency must be at least this multiple of the lowest
+MIN_SCALING = float(os.getenv("LOAD_TEST_MIN_SCALING", "2"))
+
+USER_IDS = [f"load-user-{i}" for i in range(200)]
+CATEGORIES = ["environment", "health", "education", "animals", "poverty"]
+
+# (method, path, params), weighted roughly like the app's read/write mix
+def pick_request():
+    user_id = random.choice(USER_IDS)
+    return random.choices([
+        ("GET", f"/charities/{random.choice(CATEGORIES)}", None),
+        ("GET", f"/userpreferences/{user_id}", None),
+        ("GET", f"/counter/{user_id}", None),
+        ("POST", "/counter", {"userId": user_id, "count": random.randint(0, 100)}),
+        ("GET", f"/chainuser/{user_id}", None),
+        ("GET", f"/donations/{user_id}", {"limit": 20}),
+        ("GET", f"/ai/recommendations/{user_id}", None),
+    ], weights=[20, 15, 15, 10, 15, 15, 10])[0]
+
+async def run_level(client, concurrency):
+    """Keep `concurrency` requests in flight for DURATION seconds"""
+    latencies = []
+    errors = 0
+    in_flight = 0
+    peak = 0
+    deadline = time.monotonic() + DURATION
+
+    async def worker():
+        nonlocal errors, in_flight, peak
+        while time.monotonic() < deadline:
+            method, path, params = pick_request()
+            in_flight += 1
+            peak = max(peak, in_flight)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            finally:
+                in_flight -= 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        "peak": peak,
+        "errors": errors,
+    }
+
+async def run_load_test():
+    limits = httpx.Limits(max_connections=max(CONCURRENCY_LEVELS), max_keepalive_connections=max(CONCURRENCY_LEVELS))
+    async with httpx.AsyncClient(base_url=API_URL, limits=limits, timeout=30) as client:
+        results = []
+        for concurrency in CONCURRENCY_LEVELS:
+            result = await run_level(client, concurrency)
+            results.append(result)
+            print(
+                f"  {result['concurrency']:>4} clients: {result['rps']:8.1f} req/s, "
+                f"p50 {result['p50']:6.1f} ms, p95 {result['p95']:6.1f} ms, "
+                f"peak in flight {result['peak']}, errors {result['errors']}"
+            )
+        return results
+
+def run_api_load():
+    """Mixed endpoint traffic at rising concurrency; throughput should rise with it"""
+    print(f"🧪 Load testing {API_URL} ({DURATION:.0f}s per level)...")
+    results = asyncio.run(run_load_test())
+
+    first, last = results[0], results[-1]
+    scaling = last["rps"] / first["rps"] if first["rps"] else 0
+    errors = sum(result["errors"] for result in results)
+    ok = scaling >= MIN_SCALING and not errors
+    print(f"{'✅' if ok else '❌'} {scaling:.1f}x throughput from {first['concurrency']} to {last['concurrency']} clients (need {MIN_SCALING:.1f}x), {errors} errors")
+    assert ok, f"Throughput scaled {scaling:.1f}x with {errors} errors"
+
+if __name__ == "__main__":
+    try:
+        run_api_load()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,11 @@
+from .feed_fetcher import FeedFetcher, FeedResult
+from .llm_cache import LLMCache, normalize_text
+from .vector_index import CategoryIndex
+from .analysis import ArticleAnalysis, CHARITY_RESULTS
+from .dedup import NearDuplicateIndex, normalize_link
+from .seen_store import SeenStore, BloomFilter
+from .recommendation_store import RecommendationStore
+from .portfolio import PortfolioCohort, group_cohorts
+from .worker_pool import KeyedWorkerPool
+from .llm_gateway import LLMGateway
+from .agent_loop import AgentLoop, AgentRun, compact_charities
@@ -0,0 +1,155 @@
+import json
+import threading
+from dataclasses import dataclass
+
+
+def compact_charities(charities, mission_chars=200):
+    """One line per charity instead of an indented JSON dump."""
+    lines = []
+    for charity in charities:
+        mission = " ".join(str(charity.get("mission", "")).split())
+        if len(mission) > mission_chars:
+            mission = mission[:mission_chars].rstrip() + "..."
+        score = charity.get("similarity_score")
+        score = f" (similarity {score:.2f})" if isinstance(score, (int, float)) else ""
+        lines.append(f"- {charity['name']}{score}: {mission}" if mission else f"- {charity['name']}{score}")
+    return "\n".join(lines) or "None"
+
+
+@dataclass
+class AgentRun:
+    """How one agent decision went: turns and tokens used, and why it stopped."""
+    turns: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    stop_reason: str = "done"  # done, no_tool_call, max_turns or max_tokens
+
+    @property
+    def finished(self):
+        return self.stop_reason == "done"
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+class AgentLoop:
+    """Tool-calling loop with a turn and token budget.
+
+    `handle(name, args)` executes a tool call and returns the tool message
+    content; `done()` says whether the agent has reached a decision. Only
+    the opening messages and the last `keep_messages` messages of the
+    history are sent back to the model. Per-loop totals go to stats().
+    """
+
+    def __init__(self, gateway, name, tools, model="gpt-4o-mini", max_turns=6, max_tokens=8000, keep_messages=6):
+        self.gateway = gateway
+        self.name = name
+        self.tools = tools
+        self.model = model
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.keep_messages = keep_messages
+        self.lock = threading.Lock()
+        self.totals = {"decisions": 0, "turns": 0, "tokens": 0, "unfinished": 0, "max_turns_seen": 0}
+
+    def trim(self, messages, pinned):
+        """Pinned prefix plus the most recent messages, never splitting a tool call from its results."""
+        tail = messages[pinned:]
+        if len(tail) <= self.keep_messages:
+            return messages
+        start = len(tail) - self.keep_messages
+        # A tool result must follow the assistant message that requested it
+        while start < len(tail) and self.role(tail[start]) == "tool":
+            start += 1
+        return messages[:pinned] + tail[start:]
+
+    @staticmethod
+    def role(message):
+        return message["role"] if isinstance(message, dict) else message.role
+
+    def request(self, messages, pinned):
+        return {
+            "model": self.model,
+            "messages": self.trim(messages, pinned),
+            "tools": self.tools,
+            "tool_choice": "auto",
+        }
+
+    def account(self, run, response):
+        run.turns += 1
+        if getattr(response, "usage", None):
+            run.prompt_tokens += response.usage.prompt_tokens or 0
+            run.completion_tokens += response.usage.completion_tokens or 0
+
+    def over_budget(self, run):
+        if run.turns >= self.max_turns:
+            run.stop_reason = "max_turns"
+        elif run.tokens >= self.max_tokens:
+            run.stop_reason = "max_tokens"
+        else:
+            return False
+        return True
+
+    def run(self, messages, handle, done):
+        """Run until done() or the budget runs out; `messages` is extended in place."""
+        run = AgentRun()
+        pinned = len(messages)
+        while not done():
+            if self.over_budget(run):
+                break
+            response = self.gateway.chat(**self.request(messages, pinned))
+            self.account(run, response)
+            message = response.choices[0].message
+            messages.append(message)
+            if not message.tool_calls:
+                run.stop_reason = "no_tool_call"
+                break
+            for tool_call in message.tool_calls:
+                result = handle(tool_call.function.name, json.loads(tool_call.function.arguments or "{}"))
+                messages.append({"role": "tool", "content": result, "tool_call_id": tool_call.id})
+        self.record(run)
+        return run
+
+    async def arun(self, messages, handle, done):
+        """Async run(); `handle` is a coroutine function."""
+        run = AgentRun()
+        pinned = len(messages)
+        while not done():
+            if self.over_budget(run):
+                break
+            response = await self.gateway.achat(**self.request(messages, pinned))
+            self.account(run, response)
+            message = response.choices[0].message
+            messages.append(message)
+            if not message.tool_calls:
+                run.stop_reason = "no_tool_call"
+                break
+            for tool_call in message.tool_calls:
+                result = await handle(tool_call.function.name, json.loads(tool_call.function.arguments or "{}"))
+                messages.append({"role": "tool", "content": result, "tool_call_id": tool_call.id})
+        self.record(run)
+        return run
+
+    def record(self, run):
+        with self.lock:
+            totals = self.totals
+            totals["decisions"] += 1
+            totals["turns"] += run.turns
+            totals["tokens"] += run.tokens
+            totals["max_turns_seen"] = max(totals["max_turns_seen"], run.turns)
+            if not run.finished:
+                totals["unfinished"] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.totals)
+
+    def report(self):
+        totals = self.stats()
+        if totals["decisions"]:
+            print(
+                f"{self.name} agent: {totals['decisions']} decisions, "
+                f"{totals['turns'] / totals['decisions']:.1f} turns and {totals['tokens'] / totals['decisions']:.0f} tokens on average, "
+                f"longest {totals['max_turns_seen']} turns, {totals['unfinished']} without a decision"
+            )
@@ -0,0 +1,87 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Candidate charities per article; ArticleAnalysis.charities caches this many
+CHARITY_RESULTS = 5
+
+
+class ArticleAnalysis:
+    """Per-article state shared by every pipeline stage.
+
+    The embedding, category ranking, subscribers and candidate charities are
+    computed lazily, at most once each, by calling back into the matcher.
+    Every stage that runs is timed in `timings`.
+    """
+
+    def __init__(self, matcher, article):
+        self.matcher = matcher
+        self.article = article
+        self.relevant = None
+        self.urgency_score = None
+        self.results = {}
+        self.timings = {}
+        # Stages may run in worker threads (run_async), compute each value once
+        self.lock = threading.RLock()
+
+    @property
+    def link(self):
+        return self.article["link"]
+
+    @property
+    def text(self):
+        return f"{self.article['title']} {self.article.get('description', '')}"
+
+    def seed(self, stage, value, seconds=0.0):
+        """Provide a value computed elsewhere, e.g. by a batched embedding pass."""
+        with self.lock:
+            self.results[stage] = value
+            self.timings[stage] = seconds
+
+    def compute(self, stage, fn):
+        with self.lock:
+            if stage not in self.results:
+                start = time.perf_counter()
+                try:
+                    self.results[stage] = fn()
+                finally:
+                    self.timings[stage] = time.perf_counter() - start
+            return self.results[stage]
+
+    @contextmanager
+    def timed(self, stage):
+        """Time a stage that isn't one of the lazily computed values."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    @property
+    def embedding(self):
+        return self.compute("embedding", lambda: self.matcher.embed_articles([self.article])[0])
+
+    @property
+    def ranking(self):
+        return self.compute("ranking", lambda: self.matcher.category_index.query([self.embedding])[0])
+
+    @property
+    def categories(self):
+        return self.compute("categories", lambda: self.matcher.category_matches(self.ranking, self.article.get("category_hints")))
+
+    @property
+    def top_category(self):
+        categories = self.categories
+        return categories[0]["category"] if categories else None
+
+    @property
+    def subscribers(self):
+        return self.compute("subscribers", lambda: self.matcher.subscribers_for_category(self.top_category))
+
+    @property
+    def charities(self):
+        return self.compute("charities", lambda: self.matcher.query_similar_charities(self, CHARITY_RESULTS))
+
+    def report(self):
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in self.timings.items())
+        print(f"Stages for {self.link}: {stages}")
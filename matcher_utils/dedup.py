@@ -0,0 +1,135 @@
+import hashlib
+import random
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .llm_cache import normalize_text
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "smid", "smtyp", "partner", "ref", "cmpid", "ocid"}
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_link(url):
+    """Canonical form of an article URL: no tracking parameters, fragment or trailing slash."""
+    parts = urlsplit(url.strip())
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def shingles(text, size=3):
+    words = normalize_text(text).split()
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH index over recent articles' normalized title and description.
+
+    Lookups touch a fixed number of LSH buckets, so checking an article is
+    O(1) in the number of indexed articles. Entries older than `window`
+    seconds fall out of the index.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.7, window=48 * 3600, seed=1):
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window = window
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self.buckets = {}  # (band, band signature) -> set of doc ids
+        self.docs = {}  # doc id -> (link, signature, added_at)
+        self.links = {}  # normalized link -> doc id
+        self.expiry = deque()  # (added_at, doc id), oldest first
+        self.next_id = 0
+        self.checked = 0
+        self.duplicates = 0
+
+    def signature(self, text):
+        """MinHash signature of the text, or None if it has no words to compare."""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in shingles(text)
+        ]
+        if not hashes:
+            return None
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes)
+            for a, b in self.permutations
+        )
+
+    def band_keys(self, signature):
+        if signature is None:
+            return []
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def expire(self, now):
+        while self.expiry and self.expiry[0][0] < now - self.window:
+            _, doc_id = self.expiry.popleft()
+            link, signature, _ = self.docs.pop(doc_id)
+            canonical = normalize_link(link)
+            if self.links.get(canonical) == doc_id:
+                del self.links[canonical]
+            for key in self.band_keys(signature):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def check(self, link, title, description=""):
+        """Return the link this article duplicates, or None after indexing it as new."""
+        now = time.time()
+        self.expire(now)
+        self.checked += 1
+
+        canonical = normalize_link(link)
+        if canonical in self.links:
+            original = self.docs[self.links[canonical]][0]
+            # The exact same link again is a retry of an unprocessed article, not a copy
+            return self.record_duplicate(original) if original != link else None
+
+        # Articles without any words are only matched by link
+        signature = self.signature(f"{title} {description}")
+        keys = self.band_keys(signature)
+        candidates = set()
+        for key in keys:
+            candidates.update(self.buckets.get(key, ()))
+        for doc_id in candidates:
+            other_link, other_signature, _ = self.docs[doc_id]
+            agreement = sum(x == y for x, y in zip(signature, other_signature)) / self.num_perm
+            if agreement >= self.threshold:
+                return self.record_duplicate(other_link)
+
+        doc_id = self.next_id
+        self.next_id += 1
+        self.docs[doc_id] = (link, signature, now)
+        self.links[canonical] = doc_id
+        self.expiry.append((now, doc_id))
+        for key in keys:
+            self.buckets.setdefault(key, set()).add(doc_id)
+        return None
+
+    def record_duplicate(self, original):
+        self.duplicates += 1
+        return original
+
+    def dedup_rate(self):
+        return self.duplicates / self.checked if self.checked else 0.0
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import feedparser
+import httpx
+
+
+@dataclass
+class FeedResult:
+    url: str
+    entries: list = field(default_factory=list)
+    status: Optional[int] = None
+    latency: float = 0.0
+    not_modified: bool = False
+    error: Optional[str] = None
+
+
+class FeedFetcher:
+    """Fetches RSS feeds in parallel over a pooled keep-alive HTTP client.
+
+    Each feed's ETag / Last-Modified validators are remembered so the next
+    cycle sends a conditional request and skips parsing on a 304. They are
+    only kept once commit_validators() is called after the cycle's articles
+    were handled, so a cycle that fails midway refetches its feeds in full.
+    """
+
+    def __init__(self, max_workers=8, timeout=15.0, max_bytes=5 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.client_options = {
+            "timeout": timeout,
+            "follow_redirects": True,
+            "limits": httpx.Limits(
+                max_connections=max_workers,
+                max_keepalive_connections=max_workers,
+            ),
+            "headers": {"User-Agent": "NewsCharityMatcher/1.0 (+feedparser)"},
+        }
+        self.client = httpx.Client(**self.client_options)
+        self.async_client = None  # created on first use inside the running event loop
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.validators = {}  # url -> {"etag": ..., "modified": ...}
+        self.pending_validators = {}  # validators of the current cycle, until committed
+        self.latencies = {}  # url -> seconds taken by the last fetch
+
+    def conditional_headers(self, url):
+        headers = {}
+        validators = self.validators.get(url, {})
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("modified"):
+            headers["If-Modified-Since"] = validators["modified"]
+        return headers
+
+    def remember_validators(self, url, response_headers):
+        etag = response_headers.get("etag")
+        modified = response_headers.get("last-modified")
+        if etag or modified:
+            self.pending_validators[url] = {"etag": etag, "modified": modified}
+
+    def commit_validators(self):
+        """Keep the validators of the last fetch, once its entries have been processed."""
+        self.validators.update(self.pending_validators)
+        self.pending_validators = {}
+
+    def check_content_length(self, response):
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise ValueError(f"Feed is {content_length} bytes, limit is {self.max_bytes}")
+
+    def append_capped(self, body, chunk):
+        body.extend(chunk)
+        if len(body) > self.max_bytes:
+            raise ValueError(f"Feed exceeded {self.max_bytes} bytes")
+
+    def read_capped(self, response):
+        """Read a streamed response body, refusing anything over max_bytes."""
+        self.check_content_length(response)
+        body = bytearray()
+        for chunk in response.iter_bytes():
+            self.append_capped(body, chunk)
+        return bytes(body)
+
+    async def read_capped_async(self, response):
+        self.check_content_length(response)
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            self.append_capped(body, chunk)
+        return bytes(body)
+
+    def parse_into(self, result, response, body):
+        feed = feedparser.parse(body, response_headers=dict(response.headers))
+        result.entries = feed.entries
+        self.remember_validators(result.url, response.headers)
+
+    def fetch(self, url) -> FeedResult:
+        start = time.perf_counter()
+        result = FeedResult(url=url)
+        try:
+            with self.client.stream("GET", url, headers=self.conditional_headers(url)) as response:
+                result.status = response.status_code
+                if response.status_code == 304:
+                    result.not_modified = True
+                else:
+                    response.raise_for_status()
+                    self.parse_into(result, response, self.read_capped(response))
+        except Exception as e:
+            result.error = str(e)
+
+        result.latency = time.perf_counter() - start
+        self.latencies[url] = result.latency
+        return result
+
+    def fetch_all(self, urls) -> list[FeedResult]:
+        """Fetch every feed concurrently, returning results in the order given."""
+        self.pending_validators = {}
+        results = list(self.executor.map(self.fetch, urls))
+        self.report(results)
+        return results
+
+    async def fetch_async(self, url) -> FeedResult:
+        start = time.perf_counter()
+        result = FeedResult(url=url)
+        try:
+            async with self.async_client.stream("GET", url, headers=self.conditional_headers(url)) as response:
+                result.status = response.status_code
+                if response.status_code == 304:
+                    result.not_modified = True
+                else:
+                    response.raise_for_status()
+                    body = await self.read_capped_async(response)
+                    # Parsing is CPU-bound, keep it off the event loop
+                    await asyncio.to_thread(self.parse_into, result, response, body)
+        except Exception as e:
+            result.error = str(e)
+
+        result.latency = time.perf_counter() - start
+        self.latencies[url] = result.latency
+        return result
+
+    async def fetch_all_async(self, urls) -> list[FeedResult]:
+        """Async counterpart of fetch_all over a pooled httpx.AsyncClient."""
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(**self.client_options)
+        self.pending_validators = {}
+        results = await asyncio.gather(*(self.fetch_async(url) for url in urls))
+        self.report(results)
+        return list(results)
+
+    def report(self, results):
+        for result in results:
+            if result.error:
+                status = f"error: {result.error}"
+            elif result.not_modified:
+                status = "304 not modified"
+            else:
+                status = f"{result.status}, {len(result.entries)} entries"
+            print(f"Fetched {result.url} in {result.latency * 1000:.0f}ms ({status})")
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
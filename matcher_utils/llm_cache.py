@@ -0,0 +1,110 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+
+def normalize_text(text):
+    """Collapse markup, case and whitespace so republished copies hash the same."""
+    text = re.sub(r"<[^>]+>", " ", text or "")
+    return " ".join(text.lower().split())
+
+
+class LLMCache:
+    """Disk-backed, content-addressed cache for LLM answers.
+
+    Entries live in a SQLite file in WAL mode, so the matcher and the API
+    process can share it. Entries expire after `ttl` seconds, and the least
+    recently used ones are evicted once the cache holds `max_entries`.
+    """
+
+    EVICT_EVERY = 100  # writes between eviction passes
+
+    def __init__(self, path="llm_cache.sqlite3", ttl=7 * 24 * 3600, max_entries=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.local = threading.local()
+        self.counter_lock = threading.Lock()
+
+        db = self.connection()
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    def connection(self):
+        # sqlite3 connections can't be shared across threads, keep one per thread
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    @staticmethod
+    def make_key(model, prompt, text):
+        payload = json.dumps([model, prompt, normalize_text(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry."""
+        now = time.time()
+        db = self.connection()
+        row = db.execute(
+            "SELECT value FROM llm_cache WHERE key = ? AND created_at > ?",
+            (key, now - self.ttl),
+        ).fetchone()
+
+        with self.counter_lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        self.connection().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now),
+        )
+        with self.counter_lock:
+            self.writes += 1
+            evict = self.writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond max_entries."""
+        db = self.connection()
+        db.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.ttl,))
+        db.execute(
+            """DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        entries = self.connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
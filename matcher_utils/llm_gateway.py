@@ -0,0 +1,304 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+def retryable_errors():
+    """Errors worth retrying; openai is imported on first use, it is slow to import."""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.InternalServerError,
+    )
+
+
+def parse_reset(value):
+    """Seconds in a rate-limit reset header such as "20ms", "1s" or "6m0s"."""
+    if not value:
+        return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously and can be corrected by the server."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1.0):
+        """Take `amount` now and return how long the caller must wait before using it."""
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def update(self, limit=None, remaining=None, reset=None):
+        """Adopt the limit and remaining budget reported in the response headers."""
+        with self.lock:
+            self.refill(time.monotonic())
+            if limit:
+                self.capacity = limit
+                self.rate = limit / 60.0
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+                if remaining < 1 and reset:
+                    # Nothing left until the server's window resets
+                    self.tokens = min(self.tokens, -reset * self.rate)
+
+
+class ModelStats:
+    def __init__(self, history=1000):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=history)
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "p50_latency": percentile(0.5),
+            "p95_latency": percentile(0.95),
+        }
+
+
+class LLMGateway:
+    """Single entry point for chat completions, sync and async.
+
+    Per model it keeps request and token buckets (refilled per minute and
+    corrected from the x-ratelimit-* response headers), caps concurrent
+    requests, retries 429/5xx/connection errors with jittered exponential
+    backoff, coalesces identical requests already in flight and counts
+    latency and token usage. Errors that survive the retries are raised.
+    """
+
+    def __init__(self, client, async_client=None, max_concurrency=8, max_retries=4,
+                 base_backoff=0.5, max_backoff=30.0, requests_per_minute=500, tokens_per_minute=200000):
+        # Retries happen here, with the rate limiter in the loop
+        self.client = client.with_options(max_retries=0)
+        self.async_client = async_client.with_options(max_retries=0) if async_client else None
+        self.retryable_errors = retryable_errors()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.lock = threading.Lock()
+        self.models = {}  # model -> {"requests", "tokens", "semaphore", "async_semaphore", "stats"}
+        self.in_flight = {}  # request key -> Future
+        self.async_in_flight = {}  # request key -> asyncio.Future
+
+    def model(self, name):
+        with self.lock:
+            state = self.models.get(name)
+            if state is None:
+                state = self.models[name] = {
+                    "requests": TokenBucket(self.requests_per_minute),
+                    "tokens": TokenBucket(self.tokens_per_minute),
+                    "semaphore": threading.BoundedSemaphore(self.max_concurrency),
+                    "async_semaphore": None,
+                    "stats": ModelStats(),
+                }
+            return state
+
+    @staticmethod
+    def request_key(kwargs):
+        def encode(value):
+            # Tool loops append the SDK's message objects to the history
+            if hasattr(value, "model_dump"):
+                return value.model_dump(exclude_none=True)
+            return str(value)
+
+        payload = json.dumps(kwargs, sort_keys=True, default=encode)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest(), len(payload)
+
+    def reserve(self, state, payload_size, kwargs):
+        """Wait time before this request fits in both buckets."""
+        estimated_tokens = payload_size / 4 + (kwargs.get("max_tokens") or 0)
+        return max(state["requests"].reserve(1), state["tokens"].reserve(estimated_tokens))
+
+    def record(self, state, raw, started):
+        headers = raw.headers
+        state["requests"].update(
+            header_number(headers, "x-ratelimit-limit-requests"),
+            header_number(headers, "x-ratelimit-remaining-requests"),
+            parse_reset(headers.get("x-ratelimit-reset-requests")),
+        )
+        state["tokens"].update(
+            header_number(headers, "x-ratelimit-limit-tokens"),
+            header_number(headers, "x-ratelimit-remaining-tokens"),
+            parse_reset(headers.get("x-ratelimit-reset-tokens")),
+        )
+        response = raw.parse()
+        with self.lock:
+            stats = state["stats"]
+            stats.requests += 1
+            stats.latencies.append(time.perf_counter() - started)
+            if getattr(response, "usage", None):
+                stats.prompt_tokens += response.usage.prompt_tokens or 0
+                stats.completion_tokens += response.usage.completion_tokens or 0
+        return response
+
+    def retry_delay(self, attempt, error):
+        response = getattr(error, "response", None)
+        retry_after = parse_reset(response.headers.get("retry-after")) if response is not None else None
+        if retry_after:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    def note_coalesced(self, model):
+        state = self.model(model)
+        with self.lock:
+            state["stats"].coalesced += 1
+
+    def note_failure(self, state, retrying):
+        with self.lock:
+            if retrying:
+                state["stats"].retries += 1
+            else:
+                state["stats"].errors += 1
+
+    def chat(self, **kwargs):
+        """chat.completions.create through the gateway."""
+        key, payload_size = self.request_key(kwargs)
+        with self.lock:
+            leader = key not in self.in_flight
+            if leader:
+                self.in_flight[key] = Future()
+            future = self.in_flight[key]
+
+        if not leader:
+            self.note_coalesced(kwargs["model"])
+            return future.result()
+
+        try:
+            future.set_result(self.send(kwargs, payload_size))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return future.result()
+
+    def send(self, kwargs, payload_size):
+        state = self.model(kwargs["model"])
+        attempt = 0
+        while True:
+            time.sleep(self.reserve(state, payload_size, kwargs))
+            with state["semaphore"]:
+                started = time.perf_counter()
+                try:
+                    raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+                    return self.record(state, raw, started)
+                except self.retryable_errors as e:
+                    if attempt >= self.max_retries:
+                        self.note_failure(state, retrying=False)
+                        raise
+                    self.note_failure(state, retrying=True)
+                    delay = self.retry_delay(attempt, e)
+                    error = type(e).__name__
+                except Exception:
+                    self.note_failure(state, retrying=False)
+                    raise
+            print(f"LLM request to {kwargs['model']} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    async def achat(self, **kwargs):
+        """Async chat.completions.create through the gateway."""
+        key, payload_size = self.request_key(kwargs)
+        future = self.async_in_flight.get(key)
+        if future is not None:
+            self.note_coalesced(kwargs["model"])
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.async_in_flight[key] = future
+        try:
+            future.set_result(await self.asend(kwargs, payload_size))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            del self.async_in_flight[key]
+        return future.result()
+
+    async def asend(self, kwargs, payload_size):
+        state = self.model(kwargs["model"])
+        if state["async_semaphore"] is None:
+            state["async_semaphore"] = asyncio.Semaphore(self.max_concurrency)
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.reserve(state, payload_size, kwargs))
+            async with state["async_semaphore"]:
+                started = time.perf_counter()
+                try:
+                    raw = await self.async_client.chat.completions.with_raw_response.create(**kwargs)
+                    return self.record(state, raw, started)
+                except self.retryable_errors as e:
+                    if attempt >= self.max_retries:
+                        self.note_failure(state, retrying=False)
+                        raise
+                    self.note_failure(state, retrying=True)
+                    delay = self.retry_delay(attempt, e)
+                    error = type(e).__name__
+                except Exception:
+                    self.note_failure(state, retrying=False)
+                    raise
+            print(f"LLM request to {kwargs['model']} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        with self.lock:
+            return {name: state["stats"].as_dict() for name, state in self.models.items()}
+
+    def report(self):
+        for name, stats in self.stats().items():
+            print(
+                f"LLM {name}: {stats['requests']} requests, {stats['retries']} retries, {stats['errors']} errors, "
+                f"{stats['coalesced']} coalesced, {stats['prompt_tokens']}+{stats['completion_tokens']} tokens, "
+                f"p50 {stats['p50_latency'] * 1000:.0f}ms p95 {stats['p95_latency'] * 1000:.0f}ms"
+            )
@@ -0,0 +1,36 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PortfolioCohort:
+    """Subscribers holding the same charities with the same percentages."""
+    charity_names: list[str]
+    percentages: list[int]
+    members: list[str] = field(default_factory=list)
+
+    def describe(self):
+        if not self.charity_names:
+            return "No charities in the portfolio"
+        return "\n".join(
+            f"{name} ({percent}%)" for name, percent in zip(self.charity_names, self.percentages)
+        )
+
+
+def portfolio_key(addresses, percentages):
+    """Order-independent identity of a portfolio, so reordered holdings share a cohort."""
+    return tuple(sorted((address.lower(), int(percent)) for address, percent in zip(addresses, percentages)))
+
+
+def group_cohorts(users, charity_names):
+    """Group {user_id: User} into cohorts; charity_names maps address -> charity name."""
+    cohorts = {}
+    for user_id, user in users.items():
+        key = portfolio_key(user.addresses, user.percentages)
+        cohort = cohorts.get(key)
+        if cohort is None:
+            cohort = cohorts[key] = PortfolioCohort(
+                [charity_names.get(address.lower(), address) for address, _ in key],
+                [percent for _, percent in key],
+            )
+        cohort.members.append(user_id)
+    return list(cohorts.values())
@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from pg_module.crud import add_recommendations, get_recommendations_for_user, trim_recommendations
+from pg_module.models import Recommendation
+
+
+def connect_engine(fallback_path):
+    """The Postgres engine if it is reachable, otherwise an embedded SQLite database."""
+    from pg_module.database import engine
+
+    try:
+        with engine.connect():
+            return engine
+    except Exception as e:
+        print(f"Postgres unavailable ({e}), storing recommendations in {fallback_path}")
+        return create_engine(f"sqlite:///{fallback_path}")
+
+
+class RecommendationStore:
+    """Indexed recommendation storage shared by the matcher and the API.
+
+    Rows for an article are written in one bulk insert. Reads are keyset
+    paginated on (userid, id), and each user keeps at most `retention`
+    recommendations.
+    """
+
+    TRIM_CHUNK = 500  # user ids per retention DELETE
+
+    def __init__(self, engine=None, fallback_path="recommendations.sqlite3", retention=200):
+        self.engine = engine or connect_engine(fallback_path)
+        self.retention = retention
+        Recommendation.__table__.create(self.engine, checkfirst=True)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+    def add(self, recommendations):
+        """Store (user_id, recommendation dict) pairs and enforce the per-user cap."""
+        now = datetime.utcnow()
+        rows = [
+            {
+                "userid": user_id,
+                "charityname": recommendation["charity"]["name"],
+                "created_at": now,
+                "payload": json.dumps(recommendation),
+            }
+            for user_id, recommendation in recommendations
+        ]
+        if not rows:
+            return
+
+        user_ids = sorted({row["userid"] for row in rows})
+        with self.Session() as db:
+            add_recommendations(db, rows)
+            for start in range(0, len(user_ids), self.TRIM_CHUNK):
+                trim_recommendations(db, user_ids[start:start + self.TRIM_CHUNK], self.retention)
+
+    def for_user(self, user_id, limit=50, before_id=None):
+        """Newest first; each dict carries its "id" to use as the next page's before_id."""
+        with self.Session() as db:
+            rows = get_recommendations_for_user(db, user_id, limit, before_id)
+        return [{**json.loads(row.payload), "id": row.id} for row in rows]
+
+    def is_empty(self):
+        with self.Session() as db:
+            return db.query(Recommendation.id).first() is None
@@ -0,0 +1,142 @@
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class SeenStore:
+    """Set of processed article links backed by SQLite, with a Bloom filter in front.
+
+    Adds are a single INSERT, so per-article writes are O(1). Links expire
+    after `ttl` seconds, and a background thread deletes expired rows and
+    rebuilds the Bloom filter. Memory stays bounded by the retention window.
+    Until the first build finishes, lookups go straight to the indexed
+    table, so startup doesn't read the history.
+    """
+
+    def __init__(self, path="processed_articles.sqlite3", ttl=30 * 24 * 3600,
+                 capacity=100000, compact_interval=3600):
+        self.path = path
+        self.ttl = ttl
+        self.capacity = capacity
+        self.compact_interval = compact_interval
+        self.local = threading.local()
+        self.bloom = None
+        self.bloom_lock = threading.Lock()
+        self.rebuilding = False
+        self.pending = []  # links added while the Bloom filter is being rebuilt
+        self.stopped = threading.Event()
+
+        db = self.connection()
+        db.execute("CREATE TABLE IF NOT EXISTS seen (link TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS seen_seen_at ON seen (seen_at)")
+
+        self.compactor = threading.Thread(target=self.compact_forever, name="seen-store-compactor", daemon=True)
+        self.compactor.start()
+
+    def connection(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def __contains__(self, link):
+        with self.bloom_lock:
+            if self.bloom is not None and link not in self.bloom:
+                return False
+        row = self.connection().execute(
+            "SELECT 1 FROM seen WHERE link = ? AND seen_at > ?", (link, time.time() - self.ttl)
+        ).fetchone()
+        return row is not None
+
+    def add(self, link):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO seen (link, seen_at) VALUES (?, ?)", (link, time.time())
+        )
+        with self.bloom_lock:
+            if self.bloom is not None:
+                self.bloom.add(link)
+            if self.rebuilding:
+                self.pending.append(link)
+
+    def import_links(self, links):
+        """One-off bulk import, e.g. from the old processed_articles.json."""
+        links = list(links)
+        now = time.time()
+        db = self.connection()
+        db.execute("BEGIN")
+        db.executemany("INSERT OR IGNORE INTO seen (link, seen_at) VALUES (?, ?)", ((link, now) for link in links))
+        db.execute("COMMIT")
+        # Same as add(): the filter may already have been built without them
+        with self.bloom_lock:
+            if self.bloom is not None:
+                for link in links:
+                    self.bloom.add(link)
+            if self.rebuilding:
+                self.pending.extend(links)
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def compact(self):
+        """Delete expired links and rebuild the Bloom filter from what is left."""
+        db = self.connection()
+        cutoff = time.time() - self.ttl
+        expired = db.execute("DELETE FROM seen WHERE seen_at <= ?", (cutoff,)).rowcount
+
+        with self.bloom_lock:
+            self.rebuilding = True
+            self.pending = []
+        count = len(self)
+        bloom = BloomFilter(max(self.capacity, 2 * count))
+        for (link,) in db.execute("SELECT link FROM seen WHERE seen_at > ?", (cutoff,)):
+            bloom.add(link)
+
+        with self.bloom_lock:
+            # Links added during the rebuild may have been missed by the scan
+            for link in self.pending:
+                bloom.add(link)
+            self.pending = []
+            self.rebuilding = False
+            self.bloom = bloom
+
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if expired:
+            print(f"Seen store: expired {expired} links, {count} remain")
+
+    def compact_forever(self):
+        while not self.stopped.is_set():
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting seen store: {e}")
+            self.stopped.wait(self.compact_interval)
+
+    def close(self):
+        self.stopped.set()
@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+
+
+class CategoryIndex:
+    """In-process copy of the Chroma categories collection.
+
+    Category embeddings are kept in a NumPy matrix so a batch of articles is
+    scored with one matrix multiply instead of one Chroma query per article.
+    Distances follow the collection's hnsw:space, so results line up with
+    what categories_collection.query used to return.
+    """
+
+    def __init__(self, collection, embedding_function, refresh_interval=300):
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.refresh_interval = refresh_interval
+        self.space = (collection.metadata or {}).get("hnsw:space", "l2")
+        self.ids = []
+        self.documents = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.sq_norms = np.zeros(0, dtype=np.float32)
+        self.unit_matrix = self.matrix
+        self.checked_at = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Reload the collection if refresh_interval has passed; returns True if it changed."""
+        now = time.time()
+        if not force and now - self.checked_at < self.refresh_interval:
+            return False
+        self.checked_at = now
+
+        result = self.collection.get(include=["embeddings", "documents"])
+        ids = list(result["ids"])
+        documents = list(result["documents"])
+        embeddings = result.get("embeddings")
+        if embeddings is None or len(embeddings) != len(ids):
+            embeddings = self.embedding_function(documents) if documents else []
+
+        if ids:
+            matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        changed = ids != self.ids or documents != self.documents or matrix.shape != self.matrix.shape
+        if not changed:
+            changed = not np.array_equal(matrix, self.matrix)
+
+        if changed:
+            self.ids, self.documents, self.matrix = ids, documents, matrix
+            self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+            self.unit_matrix = matrix / np.maximum(np.sqrt(self.sq_norms), 1e-12)[:, None]
+            print(f"Loaded {len(ids)} category embeddings into the local index")
+        return changed
+
+    def embed(self, texts):
+        return np.asarray(self.embedding_function(list(texts)), dtype=np.float32)
+
+    def distances(self, embeddings):
+        """(articles x categories) distance matrix in the collection's metric."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.space == "cosine":
+            norms = np.maximum(np.linalg.norm(embeddings, axis=1), 1e-12)[:, None]
+            return 1.0 - (embeddings / norms) @ self.unit_matrix.T
+        dots = embeddings @ self.matrix.T
+        if self.space == "ip":
+            return 1.0 - dots
+        # Chroma's l2 space reports squared euclidean distance
+        sq = np.einsum("ij,ij->i", embeddings, embeddings)[:, None]
+        return np.maximum(sq + self.sq_norms[None, :] - 2.0 * dots, 0.0)
+
+    def query(self, embeddings, k=3):
+        """Top-k (document, distance) pairs per embedding, nearest first."""
+        if not self.ids or len(embeddings) == 0:
+            return [[] for _ in range(len(embeddings))]
+
+        distances = self.distances(embeddings)
+        k = min(k, len(self.ids))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(distances, top):
+            ordered = candidates[np.argsort(row[candidates])]
+            results.append([(self.documents[i], float(row[i])) for i in ordered])
+        return results
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class KeyedWorkerPool:
+    """Thread pool where tasks sharing a key run one after another, in submit order.
+
+    Different keys run in parallel on up to `max_workers` threads. Each task
+    gets its own Future, so one failing task doesn't affect the others.
+    Wait and run times and the queue depth are kept for report().
+    """
+
+    def __init__(self, max_workers=16, name="worker", history=10000):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.lock = threading.Lock()
+        self.tails = {}  # key -> Future of the last task submitted for that key
+        self.depth = 0  # tasks submitted but not finished
+        self.max_depth = 0
+        self.waits = deque(maxlen=history)
+        self.latencies = deque(maxlen=history)
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key, fn, *args, **kwargs):
+        future = Future()
+        submitted_at = time.perf_counter()
+
+        def run():
+            started_at = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                outcome = (False, e)
+            else:
+                outcome = (True, result)
+            finished_at = time.perf_counter()
+
+            with self.lock:
+                self.depth -= 1
+                self.waits.append(started_at - submitted_at)
+                self.latencies.append(finished_at - started_at)
+                self.completed += 1
+                if not outcome[0]:
+                    self.failed += 1
+                if self.tails.get(key) is future:
+                    del self.tails[key]
+
+            # Resolving the future starts the next task queued for this key
+            if outcome[0]:
+                future.set_result(outcome[1])
+            else:
+                future.set_exception(outcome[1])
+
+        with self.lock:
+            previous = self.tails.get(key)
+            self.tails[key] = future
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+
+        if previous is None:
+            self.executor.submit(run)
+        else:
+            previous.add_done_callback(lambda _: self.executor.submit(run))
+        return future
+
+    def run_all(self, calls):
+        """Run (key, fn, *args) tuples and wait; returns [(key, result, error)] in call order."""
+        futures = [(call[0], self.submit(call[0], call[1], *call[2:])) for call in calls]
+        results = []
+        for key, future in futures:
+            error = future.exception()
+            results.append((key, None if error else future.result(), error))
+        return results
+
+    def report(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            waits = sorted(self.waits)
+            depth, max_depth, completed, failed = self.depth, self.max_depth, self.completed, self.failed
+        if not latencies:
+            return
+
+        def percentile(values, p):
+            return values[min(len(values) - 1, int(p * len(values)))] * 1000
+
+        print(
+            f"{self.name} pool: {completed} tasks, {failed} failed, "
+            f"run p50 {percentile(latencies, 0.5):.0f}ms p95 {percentile(latencies, 0.95):.0f}ms, "
+            f"wait p95 {percentile(waits, 0.95):.0f}ms, queue depth {depth} (max {max_depth})"
+        )
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
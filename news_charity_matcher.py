@@ -1,22 +1,46 @@
-import feedparser
-import requests
-from bs4 import BeautifulSoup
-import openai
+import asyncio
+import re
+import threading
 import time
 import json
+from concurrent.futures import wait
 from datetime import datetime
-import chromadb
-from chromadb.utils import embedding_functions
 from dotenv import load_dotenv
 from pg_module import (
     get_charities_for_category,
     get_users_for_category,
     get_names_of_charities,
     get_addresses_of_charities,
+    get_chain_users,
     CharityAddress
 )
 import os
-from web3_utils.interact_with_contract import get_user, set_charities, contract, split_among_charities
+from web3_utils.interact_with_contract import (
+    get_users,
+    set_charities,
+    set_charities_batch,
+    split_among_charities,
+    split_among_charities_batch,
+    get_contract,
+    supports_batches,
+    user_from_row,
+    RECEIPT_TIMEOUT,
+)
+from matcher_utils import (
+    FeedFetcher,
+    LLMCache,
+    CategoryIndex,
+    ArticleAnalysis,
+    CHARITY_RESULTS,
+    NearDuplicateIndex,
+    SeenStore,
+    RecommendationStore,
+    group_cohorts,
+    KeyedWorkerPool,
+    LLMGateway,
+    AgentLoop,
+    compact_charities,
+)
 
 
 from pg_module.models import UserCategory
@@ -24,6 +48,243 @@ from pg_module.models import UserCategory
 load_dotenv()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+RELEVANCE_SYSTEM_PROMPT = """You are a charity impact analyst. Your job is to determine if news articles could affect charitable giving or create needs for charitable work.
+                
+    Consider:
+    - Could this affect people's willingness or ability to donate?
+    - Might this create new needs for charitable assistance?
+    - Could this influence how charities operate?
+    - Might this affect vulnerable populations?
+
+    If you're uncertain, use request_more_info to research the article before deciding.
+    Mark articles as relevant if there's any potential charitable impact."""
+
+RELEVANCE_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "mark_relevant",
+            "description": "Mark an article as relevant to charity impact",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "reason": {
+                        "type": "string",
+                        "description": "Reason for marking as relevant",
+                    }
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "mark_irrelevant",
+            "description": "Mark an article as irrelevant to charity impact",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "reason": {
+                        "type": "string",
+                        "description": "Reason for marking as irrelevant",
+                    }
+                },
+            },
+        },
+    },
+]
+
+URGENCY_PROMPT = """Article Title: {title}
+Description: {description}
+
+On a scale of 1-10, rate the urgency of this situation in terms of immediate funding needs, where:
+1 = No immediate funding urgency
+10 = Extremely urgent, immediate funding crucial
+
+Consider factors like:
+- Immediate threat to life or well-being
+- Time-sensitivity of the situation
+- Scale of impact
+- Current resource availability
+- Vulnerability of affected populations
+
+Provide your response in this exact format:
+"Urgency Score: [number 1-10]
+Brief Reason: [one-line explanation]"
+"""
+
+BATCH_RELEVANCE_SYSTEM_PROMPT = """You are a charity impact analyst. You will receive a numbered list of news articles and must decide, for each one, if it could affect charitable giving or create needs for charitable work.
+
+    Consider:
+    - Could this affect people's willingness or ability to donate?
+    - Might this create new needs for charitable assistance?
+    - Could this influence how charities operate?
+    - Might this affect vulnerable populations?
+
+    Mark articles as relevant if there's any potential charitable impact.
+    Use "unclear" only if you cannot decide without researching the article further.
+    Return exactly one verdict per article, using the article's index."""
+
+BATCH_RELEVANCE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "relevance_verdicts",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "verdicts": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "verdict": {
+                                "type": "string",
+                                "enum": ["relevant", "irrelevant", "unclear"],
+                            },
+                            "reason": {"type": "string"},
+                        },
+                        "required": ["index", "verdict", "reason"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["verdicts"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+ASSESSMENT_SYSTEM_PROMPT = """You are a charity impact analyst and an expert at assessing humanitarian and charitable funding urgency. For the given news article, decide in one pass:
+
+    1. Relevance: could this affect charitable giving, create needs for charitable work, influence how charities operate or affect vulnerable populations? Mark it relevant if there's any potential charitable impact.
+    2. Urgency: on a scale of 1-10, how urgent is the situation in terms of immediate funding needs (1 = no immediate funding urgency, 10 = extremely urgent, immediate funding crucial)? Consider immediate threat to life or well-being, time-sensitivity, scale of impact, current resource availability and vulnerability of affected populations.
+    3. Categories: which of the listed charity categories fit the article best, most relevant first. Return an empty list if none apply.
+
+    Be objective and analytical in your assessment."""
+
+
+def assessment_response_format(categories):
+    """JSON schema for the fused assessment; category hints are restricted to known categories."""
+    category_items = {"type": "string", "enum": list(categories)} if categories else {"type": "string"}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "article_assessment",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "relevant": {"type": "boolean"},
+                    "relevance_reason": {"type": "string"},
+                    "urgency_score": {"type": "integer"},
+                    "urgency_reason": {"type": "string"},
+                    "categories": {"type": "array", "items": category_items},
+                },
+                "required": ["relevant", "relevance_reason", "urgency_score", "urgency_reason", "categories"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def parse_urgency_score(urgency_result, default=5.0):
+    """Pull the number out of a "Urgency Score: N" answer, tolerating formatting drift."""
+    match = re.search(r"Urgency Score:\s*\**\s*(\d+(?:\.\d+)?)", urgency_result or "", re.IGNORECASE)
+    if not match:
+        return default
+    return min(max(float(match.group(1)), 1.0), 10.0)
+
+
+PORTFOLIO_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "keep_portfolio",
+            "description": "Keep the current portfolio without changes",
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_portfolio",
+            "description": "Update the portfolio with new charities and percentages",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "new_charities": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                    },
+                    "new_percents": {
+                        "type": "array",
+                        "items": {"type": "number"},
+                    },
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "send_money",
+            "description": "Send money to charities in the portfolio",
+        },
+    },
+]
+
+BATCH_PORTFOLIO_SYSTEM_PROMPT = """You are a portfolio manager for a charity impact fund. Your job is to manage portfolios of charities to maximize social impact. You will be given a news article, a list of similar charities and several numbered portfolios.
+
+    For each portfolio decide one action:
+    - "keep": keep the current portfolio without changes
+    - "update": replace it with new charities and percentages, chosen from the portfolio and the similar charities. The percentages must sum to 100.
+    - "send_money": send the money held for the portfolio to its charities
+
+    Return one decision per portfolio, using its number as the index. Leave "charities" and "percents" empty unless the action is "update"."""
+
+BATCH_PORTFOLIO_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "portfolio_decisions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "decisions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "action": {
+                                "type": "string",
+                                "enum": ["keep", "update", "send_money"],
+                            },
+                            "charities": {"type": "array", "items": {"type": "string"}},
+                            "percents": {"type": "array", "items": {"type": "integer"}},
+                            "reason": {"type": "string"},
+                        },
+                        "required": ["index", "action", "charities", "percents", "reason"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["decisions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+# Per-stage concurrency for run_async; Postgres and chain work stay narrow by default
+DEFAULT_STAGE_LIMITS = {
+    "relevance": 8,
+    "categories": 4,
+    "charities": 4,
+    "portfolio": 1,
+}
+
 
 class NewsCharityMatcher:
     def __init__(self, postgres_db):
@@ -33,72 +294,198 @@ class NewsCharityMatcher:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
 
+        # Imported here rather than at module level to keep `import news_charity_matcher` cheap
+        import openai
+
         self.client = openai.OpenAI(api_key=self.api_key)
-        self.processed_articles = set()
+        self.async_client = openai.AsyncOpenAI(api_key=self.api_key)
+        # Every chat completion goes through the gateway for rate limiting, retries and stats
+        self.llm = LLMGateway(
+            self.client,
+            self.async_client,
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+            tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+        )
         self.postgres_db = postgres_db
-        self.recommendations = {}  # Store recommendations by user ID
-        self.recommendations_file = "recommendations.json"
-        self.load_recommendations()
-
-        # Initialize ChromaDB client
-        try:
-            self.chroma_client = chromadb.HttpClient(
-                ssl=True,
-                host="api.trychroma.com",
-                tenant=os.getenv("CHROMA_TENANT", "78cc0fe1-3c83-43ab-a520-785387364715"),
-                database=os.getenv("CHROMA_DATABASE", "avalanche"),
-                headers={"x-chroma-token": os.getenv("CHROMA_API_KEY")},
-            )
-        except Exception as e:
-            print(f"Error initializing ChromaDB client: {e}")
-            raise RuntimeError(f"Failed to initialize ChromaDB client: {str(e)}")
-
-        # Get existing collections
-        self.categories_collection = self.chroma_client.get_collection("categories")
-        self.charities_collection = self.chroma_client.get_collection("charities")
-
-        # Load categories from ChromaDB
-        categories_result = self.categories_collection.get()
-        self.CATEGORIES = [doc for doc in categories_result["documents"]]
-        self.category_ids = {
-            cat: id
-            for id, cat in zip(categories_result["ids"], categories_result["documents"])
+        # The SQLAlchemy session is shared by run_async worker threads
+        self.db_lock = threading.RLock()
+        self.recommendation_store = RecommendationStore(
+            # Relative to the repo root, where the API looks for it too
+            fallback_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), os.getenv("RECOMMENDATION_STORE_FALLBACK", "recommendations.sqlite3")),
+            retention=int(os.getenv("RECOMMENDATION_RETENTION", "200")),
+        )
+        self.import_recommendations_json()
+
+        # ChromaDB and the category index are connected on first use (see __getattr__)
+        self.chroma_lock = threading.Lock()
+
+        # Articles per batched relevance request, 1 disables batching
+        self.relevance_batch_size = int(os.getenv("RELEVANCE_BATCH_SIZE", "10"))
+        self.relevance_stats = {"articles": 0, "batch_calls": 0, "fallbacks": 0}
+
+        # "fused" assesses relevance, urgency and category hints in one call
+        self.assessment_mode = os.getenv("ARTICLE_ASSESSMENT_MODE", "separate")
+
+        # Portfolio decisions are made per cohort of identical portfolios
+        self.portfolio_batch_size = int(os.getenv("PORTFOLIO_BATCH_SIZE", "10"))
+        self.portfolio_stats = {"users": 0, "cohorts": 0, "decision_calls": 0}
+
+        # Agent loops stop after AGENT_MAX_TURNS turns or AGENT_MAX_TOKENS tokens per decision
+        agent_budget = {
+            "max_turns": int(os.getenv("AGENT_MAX_TURNS", "6")),
+            "max_tokens": int(os.getenv("AGENT_MAX_TOKENS", "8000")),
+            "keep_messages": int(os.getenv("AGENT_HISTORY_MESSAGES", "6")),
         }
+        self.relevance_agent = AgentLoop(self.llm, "Relevance", RELEVANCE_TOOLS, **agent_budget)
+        self.portfolio_agent = AgentLoop(self.llm, "Portfolio", PORTFOLIO_TOOLS, **agent_budget)
+        # Chain writes fan out per subscriber; one user's updates stay in order across articles
+        self.user_pool = KeyedWorkerPool(int(os.getenv("SUBSCRIBER_WORKERS", "16")), name="subscriber")
+        # Needs a Donater deployment with setCharitiesBatch / splitAmongCharitiesBatch
+        self.chain_batch_writes = os.getenv("CHAIN_BATCH_WRITES", "1") == "1" and supports_batches()
+        # Read portfolios from the tables run_indexer.py keeps (a few confirmations behind the chain)
+        self.chain_indexed_reads = os.getenv("CHAIN_INDEXED_READS", "1") == "1"
+        # Block of the matcher's latest confirmed setCharities per user (lowercased, guarded
+        # by db_lock); indexed rows older than it are read over RPC instead, so a decision
+        # never sees its own earlier write undone
+        self.portfolio_writes = {}
+        # With run_split_scheduler.py running, send_money decisions are left to its batched payouts
+        self.scheduled_splits = os.getenv("SPLIT_SCHEDULER", "0") == "1" and supports_batches()
+
+        # Content-addressed LLM answer cache, shareable with the API process
+        self.llm_cache = LLMCache(
+            path=os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+            ttl=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000")),
+        )
+
+        # Near-duplicate suppression across feeds, before any LLM call
+        self.dedup_index = NearDuplicateIndex(
+            threshold=float(os.getenv("DEDUP_THRESHOLD", "0.7")),
+            window=int(float(os.getenv("DEDUP_WINDOW_HOURS", "48")) * 3600),
+        )
+
+        # Pooled, conditional RSS fetcher shared across cycles
+        self.feed_fetcher = FeedFetcher(
+            max_workers=int(os.getenv("RSS_FETCH_WORKERS", "8")),
+            timeout=float(os.getenv("RSS_FETCH_TIMEOUT", "15")),
+            max_bytes=int(os.getenv("RSS_MAX_BYTES", str(5 * 1024 * 1024))),
+        )
 
         # Load processed articles history
-        try:
-            with open("processed_articles.json", "r") as f:
-                self.processed_articles = set(json.load(f))
-        except FileNotFoundError:
-            self.processed_articles = set()
+        self.processed_articles = SeenStore(
+            path=os.getenv("SEEN_STORE_PATH", "processed_articles.sqlite3"),
+            ttl=int(float(os.getenv("SEEN_TTL_DAYS", "30")) * 24 * 3600),
+        )
+        self.import_processed_articles_json()
+
+    CHROMA_ATTRIBUTES = (
+        "chroma_client", "categories_collection", "charities_collection",
+        "embedding_function", "category_index", "CATEGORIES", "category_ids",
+    )
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet: build the ChromaDB side on first use
+        if name in self.CHROMA_ATTRIBUTES:
+            self.connect_chroma()
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def connect_chroma(self):
+        """Connect to ChromaDB and load the category index (the embedding model loads here too)."""
+        with self.chroma_lock:
+            if "category_ids" in self.__dict__:
+                return
+            import chromadb
+            from chromadb.utils import embedding_functions
+
+            # Initialize ChromaDB client
+            try:
+                self.chroma_client = chromadb.HttpClient(
+                    ssl=True,
+                    host="api.trychroma.com",
+                    tenant=os.getenv("CHROMA_TENANT", "78cc0fe1-3c83-43ab-a520-785387364715"),
+                    database=os.getenv("CHROMA_DATABASE", "avalanche"),
+                    headers={"x-chroma-token": os.getenv("CHROMA_API_KEY")},
+                )
+            except Exception as e:
+                print(f"Error initializing ChromaDB client: {e}")
+                raise RuntimeError(f"Failed to initialize ChromaDB client: {str(e)}")
+
+            # Get existing collections
+            self.categories_collection = self.chroma_client.get_collection("categories")
+            self.charities_collection = self.chroma_client.get_collection("charities")
+
+            # Load categories from ChromaDB into a local index, refreshed when the collection changes
+            self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            self.category_index = CategoryIndex(
+                self.categories_collection,
+                self.embedding_function,
+                refresh_interval=int(os.getenv("CATEGORY_INDEX_REFRESH", "300")),
+            )
+            self.load_category_names()
 
     def get_rss_feeds(self, rss_urls):
+        return self.articles_from_feeds(self.feed_fetcher.fetch_all(rss_urls))
+
+    async def get_rss_feeds_async(self, rss_urls):
+        return self.articles_from_feeds(await self.feed_fetcher.fetch_all_async(rss_urls))
+
+    def articles_from_feeds(self, feed_results):
         articles = []
-        for url in rss_urls:
+        seen_links = set()
+        duplicates = 0
+        for result in feed_results:
+            if result.error:
+                print(f"Error processing RSS feed {result.url}: {result.error}")
+                continue
             try:
-                feed = feedparser.parse(url)
-                for entry in feed.entries:
-                    if entry.link not in self.processed_articles:
-                        articles.append(
-                            {
-                                "title": entry.title,
-                                "description": entry.get("description", ""),
-                                "link": entry.link,
-                            }
-                        )
+                for entry in result.entries:
+                    if entry.link in self.processed_articles or entry.link in seen_links:
+                        continue
+                    seen_links.add(entry.link)
+
+                    description = entry.get("description", "")
+                    original = self.dedup_index.check(entry.link, entry.title, description)
+                    if original is not None:
+                        # Merge into the original: never fetch or analyse this copy again
+                        print(f"Dropping near-duplicate {entry.link} of {original}")
+                        self.processed_articles.add(entry.link)
+                        duplicates += 1
+                        continue
+
+                    articles.append(
+                        {
+                            "title": entry.title,
+                            "description": description,
+                            "link": entry.link,
+                        }
+                    )
             except Exception as e:
-                print(f"Error processing RSS feed {url}: {str(e)}")
+                print(f"Error processing RSS feed {result.url}: {str(e)}")
+
+        print(
+            f"Dedup: dropped {duplicates} near-duplicates this cycle "
+            f"({self.dedup_index.dedup_rate():.1%} of articles since start)"
+        )
         return articles
 
-    def find_similar_charities(self, article, n_results=5):
+    def find_similar_charities(self, article, n_results=CHARITY_RESULTS, analysis=None):
         """Find charities similar to the article using semantic search."""
+        analysis = analysis or ArticleAnalysis(self, article)
+        if n_results != CHARITY_RESULTS:
+            return self.query_similar_charities(analysis, n_results)
+        return analysis.charities
+
+    def query_similar_charities(self, analysis, n_results=CHARITY_RESULTS):
+        """Query the charities collection for an analysed article, filtered by its top category."""
         try:
             # First, get the top category for the article
-            matching_categories, subscribers = self.find_matching_categories(article)
-            if not matching_categories:
+            top_category = analysis.top_category
+            if not top_category:
                 return []
 
-            top_category = matching_categories[0]["category"]
             print(f"\nFiltering charities by top category: {top_category}")
 
             # Get category ID
@@ -108,11 +495,9 @@ class NewsCharityMatcher:
                 return []
 
             print(f"Searching for charities with category ID: {category_id}")
-            # Query charities collection with category filter
-            article_text = f"{article['title']} {article.get('description', '')}"
-
+            # Query charities collection with category filter, reusing the article's embedding
             results = self.charities_collection.query(
-                query_texts=[article_text],
+                query_embeddings=[analysis.embedding.tolist()],
                 where={"category_id": {"$eq": category_id}},
                 n_results=n_results,
             )
@@ -148,7 +533,8 @@ class NewsCharityMatcher:
                     pg_category = category_mapping.get(top_category, top_category.lower())
                     print(f"Mapping '{top_category}' to '{pg_category}'")
                     
-                    pg_charities = get_charities_for_category(self.postgres_db, pg_category)
+                    with self.db_lock:
+                        pg_charities = get_charities_for_category(self.postgres_db, pg_category)
                     for charity in pg_charities:
                         charity_data = {
                             "name": charity.name,
@@ -166,238 +552,500 @@ class NewsCharityMatcher:
             print(f"Error finding similar charities: {e}")
             return []
 
-    def save_processed_articles(self):
-        with open("processed_articles.json", "w") as f:
-            json.dump(list(self.processed_articles), f)
-
-    def is_relevant_article(self, title: str, description: str):
-        """Use an AI agent to determine if an article is relevant to charity impact."""
+    def import_processed_articles_json(self, path="processed_articles.json"):
+        """Carry the old JSON history over into the seen store, once."""
+        if len(self.processed_articles) > 0 or not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                links = json.load(f)
+            self.processed_articles.import_links(links)
+            print(f"Imported {len(links)} processed articles from {path}")
+        except Exception as e:
+            print(f"Error importing {path}: {e}")
 
-        tools = [
+    def relevance_messages(self, title: str, description: str):
+        return [
             {
-                "type": "function",
-                "function": {
-                    "name": "mark_relevant",
-                    "description": "Mark an article as relevant to charity impact",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "reason": {
-                                "type": "string",
-                                "description": "Reason for marking as relevant",
-                            }
-                        },
-                    },
-                },
+                "role": "system",
+                "content": RELEVANCE_SYSTEM_PROMPT,
             },
             {
-                "type": "function",
-                "function": {
-                    "name": "mark_irrelevant",
-                    "description": "Mark an article as irrelevant to charity impact",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "reason": {
-                                "type": "string",
-                                "description": "Reason for marking as irrelevant",
-                            }
-                        },
-                    },
-                },
+                "role": "user",
+                "content": f"Analyze this article for charitable impact:\nTitle: {title}\nDescription: {description}",
             },
         ]
 
-        is_relevant = False
-        completed = False
-        messages = [
+    def research_messages(self, article_title, article_description):
+        return [
             {
                 "role": "system",
-                "content": """You are a charity impact analyst. Your job is to determine if news articles could affect charitable giving or create needs for charitable work.
-                
-    Consider:
-    - Could this affect people's willingness or ability to donate?
-    - Might this create new needs for charitable assistance?
-    - Could this influence how charities operate?
-    - Might this affect vulnerable populations?
-
-    If you're uncertain, use request_more_info to research the article before deciding.
-    Mark articles as relevant if there's any potential charitable impact.""",
+                "content": "You are a research analyst specializing in analyzing news articles. Provide comprehensive context and analysis.",
             },
             {
                 "role": "user",
-                "content": f"Analyze this article for charitable impact:\nTitle: {title}\nDescription: {description}",
+                "content": f"""
+                Research this news article in detail:
+                Title: {article_title}
+                Description: {article_description}
+                
+                Please provide:
+                1. Background context
+                2. More information about the article
+                """,
             },
         ]
 
-        def mark_relevant(reason):
-            nonlocal is_relevant, completed
-            print(f"Marking as RELEVANT: {reason}")
-            is_relevant = True
-            completed = True
+    def research_cache_key(self, article_title, article_description):
+        prompt = self.research_messages("", "")[0]["content"]
+        return LLMCache.make_key("gpt-4o-mini", prompt, f"{article_title}\n{article_description}")
 
-        def mark_irrelevant(reason):
-            nonlocal is_relevant, completed
-            print(f"Marking as IRRELEVANT: {reason}")
-            is_relevant = False
-            completed = True
-
-        def request_more_info(article_title, article_description):
-            """Use OpenAI to get deeper context about an article."""
-            try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a research analyst specializing in analyzing news articles. Provide comprehensive context and analysis.",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""
-                            Research this news article in detail:
-                            Title: {article_title}
-                            Description: {article_description}
-                            
-                            Please provide:
-                            1. Background context
-                            2. More information about the article
-                            """,
-                        },
-                    ],
-                )
-                return response.choices[0].message.content
-            except Exception as e:
-                return f"Error in research: {str(e)}"
+    def request_more_info(self, article_title, article_description):
+        """Use OpenAI to get deeper context about an article."""
+        cache_key = self.research_cache_key(article_title, article_description)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            while not completed:
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    tools=tools,
-                    tool_choice="auto",
-                )
+            response = self.llm.chat(
+                model="gpt-4o-mini",
+                messages=self.research_messages(article_title, article_description),
+            )
+            research = response.choices[0].message.content
+            self.llm_cache.set(cache_key, research)
+            return research
+        except Exception as e:
+            return f"Error in research: {str(e)}"
 
-                message = response.choices[0].message
-                messages.append(message)
+    async def request_more_info_async(self, article_title, article_description):
+        cache_key = self.research_cache_key(article_title, article_description)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-                if message.tool_calls:
-                    for tool_call in message.tool_calls:
-                        args = json.loads(tool_call.function.arguments)
+        try:
+            response = await self.llm.achat(
+                model="gpt-4o-mini",
+                messages=self.research_messages(article_title, article_description),
+            )
+            research = response.choices[0].message.content
+            self.llm_cache.set(cache_key, research)
+            return research
+        except Exception as e:
+            return f"Error in research: {str(e)}"
 
-                        if tool_call.function.name == "mark_relevant":
-                            mark_relevant(args.get("reason", "No reason provided"))
+    def relevance_cache_key(self, title, description):
+        # Batched and per-article checks answer the same question, so they share entries
+        return LLMCache.make_key("gpt-4o-mini", RELEVANCE_SYSTEM_PROMPT, f"{title}\n{description}")
 
-                        elif tool_call.function.name == "mark_irrelevant":
-                            mark_irrelevant(args.get("reason", "No reason provided"))
+    def relevance_verdict(self, tool_name, args):
+        """Turn a mark_relevant / mark_irrelevant tool call into True / False."""
+        reason = args.get("reason", "No reason provided")
+        if tool_name == "mark_relevant":
+            print(f"Marking as RELEVANT: {reason}")
+            return True
+        if tool_name == "mark_irrelevant":
+            print(f"Marking as IRRELEVANT: {reason}")
+            return False
+        return None
 
-                        elif tool_call.function.name == "request_more_info":
-                            more_info = request_more_info(
-                                args.get("article_title", title),
-                                args.get("article_description", description),
-                            )
-                            messages.append(
-                                {
-                                    "role": "tool",
-                                    "content": more_info,
-                                    "tool_call_id": tool_call.id,
-                                }
-                            )
+    def is_relevant_article(self, title: str, description: str):
+        """Use an AI agent to determine if an article is relevant to charity impact."""
+        cache_key = self.relevance_cache_key(title, description)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        verdict = None
+        messages = self.relevance_messages(title, description)
+
+        def handle(name, args):
+            nonlocal verdict
+            if name == "request_more_info":
+                return self.request_more_info(
+                    args.get("article_title", title),
+                    args.get("article_description", description),
+                )
+            verdict = self.relevance_verdict(name, args)
+            return "Verdict recorded"
 
-            return is_relevant
+        try:
+            run = self.relevance_agent.run(messages, handle, lambda: verdict is not None)
+            if verdict is None:
+                print(f"No relevance verdict after {run.turns} turns ({run.stop_reason}), including article")
+                return True
+            self.llm_cache.set(cache_key, verdict)
+            return verdict
 
         except Exception as e:
             print(f"Error in article relevance check: {e}")
             return True  # Default to including article if check fails
 
-    def find_matching_categories(self, article):
-        """Find top 3 matching categories for an article."""
+    async def is_relevant_article_async(self, title: str, description: str):
+        """Async variant of is_relevant_article on the AsyncOpenAI client."""
+        cache_key = self.relevance_cache_key(title, description)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        verdict = None
+        messages = self.relevance_messages(title, description)
+
+        async def handle(name, args):
+            nonlocal verdict
+            if name == "request_more_info":
+                return await self.request_more_info_async(
+                    args.get("article_title", title),
+                    args.get("article_description", description),
+                )
+            verdict = self.relevance_verdict(name, args)
+            return "Verdict recorded"
+
         try:
-            # Combine title and description for better matching
-            article_text = f"{article['title']} {article.get('description', '')}"
+            run = await self.relevance_agent.arun(messages, handle, lambda: verdict is not None)
+            if verdict is None:
+                print(f"No relevance verdict after {run.turns} turns ({run.stop_reason}), including article")
+                return True
+            self.llm_cache.set(cache_key, verdict)
+            return verdict
 
-            print("\nQuerying categories collection...")
-            # Query the category collection
-            results = self.categories_collection.query(
-                query_texts=[article_text], n_results=3
+        except Exception as e:
+            print(f"Error in article relevance check: {e}")
+            return True  # Default to including article if check fails
+
+    def batch_relevance_messages(self, articles):
+        listing = "\n\n".join(
+            f"[{i}] Title: {article['title']}\nDescription: {article.get('description', '')}"
+            for i, article in enumerate(articles)
+        )
+        return [
+            {"role": "system", "content": BATCH_RELEVANCE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Analyze these articles for charitable impact:\n\n{listing}"},
+        ]
+
+    def parse_batch_verdicts(self, batch, content):
+        """Map a batch response onto {link: True/False}; unclear or missing items are left out."""
+        verdicts = {}
+        try:
+            for item in json.loads(content).get("verdicts", []):
+                index = item.get("index")
+                if not isinstance(index, int) or not 0 <= index < len(batch):
+                    continue
+                if item.get("verdict") not in ("relevant", "irrelevant"):
+                    continue
+                article = batch[index]
+                verdicts[article["link"]] = item["verdict"] == "relevant"
+                self.llm_cache.set(
+                    self.relevance_cache_key(article["title"], article.get("description", "")),
+                    verdicts[article["link"]],
+                )
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"Could not parse batch relevance response: {e}")
+        return verdicts
+
+    def cached_relevance(self, articles):
+        """Split articles into ({link: cached verdict}, articles still needing a call)."""
+        verdicts = {}
+        uncached = []
+        for article in articles:
+            cached = self.llm_cache.get(
+                self.relevance_cache_key(article["title"], article.get("description", ""))
             )
+            if cached is None:
+                uncached.append(article)
+            else:
+                verdicts[article["link"]] = cached
+        return verdicts, uncached
+
+    def report_relevance_batch(self, articles, batch_calls, fallbacks):
+        stats = self.relevance_stats
+        stats["articles"] += len(articles)
+        stats["batch_calls"] += batch_calls
+        stats["fallbacks"] += fallbacks
+        # Per-article classification needs at least one call per article
+        saved = len(articles) - batch_calls - fallbacks
+        total_saved = stats["articles"] - stats["batch_calls"] - stats["fallbacks"]
+        print(
+            f"Relevance: {len(articles)} articles in {batch_calls} batch calls + {fallbacks} fallbacks "
+            f"({saved} API calls saved, {total_saved} since start)"
+        )
+        cache = self.llm_cache.stats()
+        print(f"LLM cache: {cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries")
+
+    def classify_relevance_batch(self, articles, batch_size=None):
+        """Classify many articles with one structured request per batch.
+
+        Returns {link: is_relevant}. Articles the batch leaves unclear fall back
+        to is_relevant_article.
+        """
+        batch_size = batch_size or self.relevance_batch_size
+        verdicts, uncached = self.cached_relevance(articles)
+        batch_calls = 0
+
+        if batch_size > 1:
+            for start in range(0, len(uncached), batch_size):
+                batch = uncached[start:start + batch_size]
+                try:
+                    response = self.llm.chat(
+                        model="gpt-4o-mini",
+                        messages=self.batch_relevance_messages(batch),
+                        response_format=BATCH_RELEVANCE_RESPONSE_FORMAT,
+                    )
+                    batch_calls += 1
+                    verdicts.update(self.parse_batch_verdicts(batch, response.choices[0].message.content))
+                except Exception as e:
+                    print(f"Error in batch relevance check: {e}")
 
-            # Check if we got valid results
-            if (
-                not results
-                or not results.get("documents")
-                or not results["documents"][0]
-            ):
-                print("No matching categories found")
-                return [], []
-
-            # Format results
-            categories = []
-            distances = results["distances"][0]
-
-            # Normalize distances to similarities (0 to 1 range)
-            max_distance = max(distances)
-            min_distance = min(distances)
-            range_distance = (
-                max_distance - min_distance if max_distance != min_distance else 1
+        unclear = [article for article in uncached if article["link"] not in verdicts]
+        for article in unclear:
+            verdicts[article["link"]] = self.is_relevant_article(
+                article["title"], article.get("description", "")
             )
 
-            for i in range(len(distances)):
-                category = results["documents"][0][
-                    i
-                ]  # Get category name directly from documents
-                # Convert distance to normalized similarity score
-                normalized_similarity = 1 - (
-                    (distances[i] - min_distance) / range_distance
-                )
-                categories.append(
-                    {"category": category, "similarity": normalized_similarity}
+        self.report_relevance_batch(articles, batch_calls, len(unclear))
+        return verdicts
+
+    async def classify_relevance_batch_async(self, articles, limit, batch_size=None):
+        """Async classify_relevance_batch; batches and fallbacks run concurrently under `limit`."""
+        batch_size = batch_size or self.relevance_batch_size
+        verdicts, uncached = self.cached_relevance(articles)
+        batch_calls = 0
+
+        async def classify(batch):
+            nonlocal batch_calls
+            try:
+                async with limit:
+                    response = await self.llm.achat(
+                        model="gpt-4o-mini",
+                        messages=self.batch_relevance_messages(batch),
+                        response_format=BATCH_RELEVANCE_RESPONSE_FORMAT,
+                    )
+                batch_calls += 1
+                verdicts.update(self.parse_batch_verdicts(batch, response.choices[0].message.content))
+            except Exception as e:
+                print(f"Error in batch relevance check: {e}")
+
+        async def fallback(article):
+            async with limit:
+                verdicts[article["link"]] = await self.is_relevant_article_async(
+                    article["title"], article.get("description", "")
                 )
 
-                # Get subscribers for top category
-                if i == 0:  # Only for the top category
-                    subscribers = get_users_for_category(self.postgres_db, category)
-                    
-                    # If no subscribers found, get all users as fallback
-                    if not subscribers:
-                        print(f"No subscribers found for category {category}, using all users as fallback")
-                        from pg_module.crud import get_all_users
-                        all_users = get_all_users(self.postgres_db)
-                        subscribers = [UserCategory(userid=user.userid, category=category) for user in all_users]
-                        print(f"Created {len(subscribers)} fallback subscribers")
+        if batch_size > 1:
+            await asyncio.gather(*(
+                classify(uncached[start:start + batch_size])
+                for start in range(0, len(uncached), batch_size)
+            ))
+
+        unclear = [article for article in uncached if article["link"] not in verdicts]
+        await asyncio.gather(*(fallback(article) for article in unclear))
+
+        self.report_relevance_batch(articles, batch_calls, len(unclear))
+        return verdicts
+
+    def assessment_messages(self, article):
+        categories = "\n".join(f"- {category}" for category in self.CATEGORIES)
+        return [
+            {"role": "system", "content": ASSESSMENT_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"Charity categories:\n{categories}\n\nArticle Title: {article['title']}\nDescription: {article.get('description', '')}",
+            },
+        ]
+
+    def assessment_cache_key(self, article):
+        prompt = ASSESSMENT_SYSTEM_PROMPT + "\n" + json.dumps(sorted(self.CATEGORIES))
+        return LLMCache.make_key(
+            "gpt-4o-mini", prompt, f"{article['title']}\n{article.get('description', '')}"
+        )
+
+    def parse_assessment(self, content):
+        """Validate a fused assessment response; returns None if it can't be trusted."""
+        try:
+            result = json.loads(content)
+            assessment = {
+                "relevant": bool(result["relevant"]),
+                "relevance_reason": str(result.get("relevance_reason", "")),
+                "urgency_score": min(max(float(result["urgency_score"]), 1.0), 10.0),
+                "urgency_reason": str(result.get("urgency_reason", "")),
+                "categories": [c for c in result.get("categories", []) if c in self.category_ids],
+            }
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            print(f"Invalid article assessment: {e}")
+            return None
+
+        print(
+            f"Assessment: {'RELEVANT' if assessment['relevant'] else 'IRRELEVANT'} ({assessment['relevance_reason']}), "
+            f"urgency {assessment['urgency_score']:.0f} ({assessment['urgency_reason']}), "
+            f"categories {assessment['categories']}"
+        )
+        return assessment
+
+    def assess_article(self, article):
+        """Relevance, urgency and category hints for an article in one schema-validated call.
+
+        Returns None when the call fails, so callers can fall back to the separate checks.
+        """
+        cache_key = self.assessment_cache_key(article)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self.llm.chat(
+                model="gpt-4o-mini",
+                messages=self.assessment_messages(article),
+                response_format=assessment_response_format(self.CATEGORIES),
+                temperature=0.3,
+            )
+            assessment = self.parse_assessment(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error assessing article: {e}")
+            return None
+
+        if assessment is not None:
+            self.llm_cache.set(cache_key, assessment)
+        return assessment
+
+    async def assess_article_async(self, article):
+        cache_key = self.assessment_cache_key(article)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.llm.achat(
+                model="gpt-4o-mini",
+                messages=self.assessment_messages(article),
+                response_format=assessment_response_format(self.CATEGORIES),
+                temperature=0.3,
+            )
+            assessment = self.parse_assessment(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error assessing article: {e}")
+            return None
+
+        if assessment is not None:
+            self.llm_cache.set(cache_key, assessment)
+        return assessment
+
+    def load_category_names(self):
+        self.CATEGORIES = list(self.category_index.documents)
+        self.category_ids = dict(zip(self.category_index.documents, self.category_index.ids))
+
+    def refresh_categories(self):
+        if self.category_index.refresh():
+            self.load_category_names()
+
+    def embed_articles(self, articles):
+        self.refresh_categories()
+        return self.category_index.embed(
+            [f"{article['title']} {article.get('description', '')}" for article in articles]
+        )
+
+    def analyze_articles(self, articles, n_results=3):
+        """Create an ArticleAnalysis per article, seeding embeddings and category rankings.
+
+        All articles are embedded in one batch and ranked with one matrix multiply.
+        """
+        analyses = {article["link"]: ArticleAnalysis(self, article) for article in articles}
+        if not analyses:
+            return analyses
 
-            print(f"\nMatched categories: {json.dumps(categories, indent=2)}")
-            return categories, subscribers
+        try:
+            start = time.perf_counter()
+            batch = [analysis.article for analysis in analyses.values()]
+            embeddings = self.embed_articles(batch)
+            rankings = self.category_index.query(embeddings, k=n_results)
+            share = (time.perf_counter() - start) / len(batch)
+            for analysis, embedding, ranked in zip(analyses.values(), embeddings, rankings):
+                analysis.seed("embedding", embedding, share)
+                analysis.seed("ranking", ranked)
+        except Exception as e:
+            # Each analysis will embed its own article lazily instead
+            print(f"Error ranking categories: {e}")
+        return analyses
+
+    def category_matches(self, ranked, hints=None):
+        """Turn ranked (category, distance) pairs into normalized similarities.
+
+        Categories the fused assessment suggested (hints, best first) are moved
+        ahead of the other embedding matches.
+        """
+        if not ranked:
+            print("No matching categories found")
+            return []
+
+        # Format results
+        categories = []
+        distances = [distance for _, distance in ranked]
+
+        # Normalize distances to similarities (0 to 1 range)
+        max_distance = max(distances)
+        min_distance = min(distances)
+        range_distance = (
+            max_distance - min_distance if max_distance != min_distance else 1
+        )
+
+        for i in range(len(distances)):
+            category = ranked[i][0]
+            # Convert distance to normalized similarity score
+            normalized_similarity = 1 - (
+                (distances[i] - min_distance) / range_distance
+            )
+            categories.append(
+                {"category": category, "similarity": normalized_similarity}
+            )
+
+        if hints:
+            order = {category: position for position, category in enumerate(hints)}
+            categories.sort(key=lambda match: order.get(match["category"], len(order)))
+
+        print(f"\nMatched categories: {json.dumps(categories, indent=2)}")
+        return categories
+
+    def subscribers_for_category(self, category):
+        """Subscribers of a category, falling back to every user when it has none."""
+        if not category:
+            return []
+
+        with self.db_lock:
+            subscribers = get_users_for_category(self.postgres_db, category)
 
+        # If no subscribers found, get all users as fallback
+        if not subscribers:
+            print(f"No subscribers found for category {category}, using all users as fallback")
+            from pg_module.crud import get_all_users
+            with self.db_lock:
+                all_users = get_all_users(self.postgres_db)
+            subscribers = [UserCategory(userid=user.userid, category=category) for user in all_users]
+            print(f"Created {len(subscribers)} fallback subscribers")
+
+        return subscribers
+
+    def find_matching_categories(self, article, analysis=None):
+        """Find top 3 matching categories for an article."""
+        analysis = analysis or ArticleAnalysis(self, article)
+        try:
+            return analysis.categories, analysis.subscribers
         except Exception as e:
             print(f"Error in find_matching_categories: {str(e)}")
-            print(f"Article text: {article_text}")
+            print(f"Article text: {analysis.text}")
             return [], []
 
     def get_urgency_score(self, article):
         """Get urgency score from 1-10 for the article using GPT."""
-        prompt = f"""Article Title: {article['title']}
-Description: {article['description']}
-
-On a scale of 1-10, rate the urgency of this situation in terms of immediate funding needs, where:
-1 = No immediate funding urgency
-10 = Extremely urgent, immediate funding crucial
-
-Consider factors like:
-- Immediate threat to life or well-being
-- Time-sensitivity of the situation
-- Scale of impact
-- Current resource availability
-- Vulnerability of affected populations
-
-Provide your response in this exact format:
-"Urgency Score: [number 1-10]
-Brief Reason: [one-line explanation]"
-"""
+        prompt = URGENCY_PROMPT.format(title=article['title'], description=article['description'])
+        cache_key = LLMCache.make_key(
+            "gpt-3.5-turbo", URGENCY_PROMPT, f"{article['title']}\n{article['description']}"
+        )
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
                 model="gpt-3.5-turbo",
                 messages=[
                     {
@@ -410,191 +1058,358 @@ Brief Reason: [one-line explanation]"
             )
 
             result = response.choices[0].message.content.strip()
+            self.llm_cache.set(cache_key, result)
             return result
 
         except Exception as e:
             print(f"Error getting urgency score: {e}")
             return "Urgency Score: N/A\nBrief Reason: Error in assessment"
 
-    def update_user_portfolios(
-        self, subscribers: list[UserCategory], category, similar_charities, article
-    ):
-        """Update user portfolios using an AI portfolio manager"""
-        try:
-            # Get urgency score for the article
-            urgency_result = self.get_urgency_score(article)
-            print("\nUrgency Assessment:")
-            print(urgency_result)
-            urgency_score = (
-                float(urgency_result.split("\n")[0].split(": ")[1])
-                if "Score:" in urgency_result
-                else 5.0
-            )
-
-            # For each subscriber
-            for user in subscribers:
-                user_id = user.userid
-                print(f"\nAnalyzing portfolio for user {user_id}")
-
-                user_object = get_user(contract, user_id)
-                if not user_object:
-                    print(f"User {user_id} not found in database")
+    def portfolio_cohorts(self, subscribers):
+        """Read the subscribers' on-chain portfolios in batches and group identical portfolios."""
+        user_ids = list(dict.fromkeys(user.userid for user in subscribers))
+        users = self.indexed_users(user_ids) if self.chain_indexed_reads else {}
+        missing = [user_id for user_id in user_ids if user_id not in users]
+        if missing:
+            users.update(get_users(get_contract(), missing))
+        for user_id in user_ids:
+            if user_id not in users:
+                print(f"User {user_id} not found on chain")
+
+        addresses = list({address for user_object in users.values() for address in user_object.addresses})
+        with self.db_lock:
+            charity_rows = get_names_of_charities(self.postgres_db, addresses) if addresses else []
+        charity_names = {row.address.lower(): row.name for row in charity_rows}
+
+        # TODO: Add mission statements of the charities, not just their names
+        return group_cohorts(users, charity_names)
+
+    def indexed_users(self, user_ids):
+        """Portfolios from the event indexer's tables; users it hasn't seen, or hasn't
+        caught up on since our own last write, are left to the RPC."""
+        with self.db_lock:
+            try:
+                rows = get_chain_users(self.postgres_db, user_ids)
+            except Exception as e:
+                self.postgres_db.rollback()
+                print(f"Error reading indexed portfolios, reading from chain: {e}")
+                return {}
+            by_address = {}
+            for row in rows:
+                written = self.portfolio_writes.get(row.userid)
+                if written is not None and row.last_block < written:
                     continue
-                portfolio_addresses = user_object.addresses
-                portfolio_percentages = user_object.percentages
-
-                # Get the names of the charities
-
-                portfolio_charity_names = get_names_of_charities(self.postgres_db, portfolio_addresses)
-
-                # TODO: Add mission statements of the charities, not just their names
-
-                # Agentic loop
-                new_charity_names = portfolio_charity_names
-                new_charity_percents = portfolio_percentages
-                has_changed = False
-                running = True
-
-                def keep_portfolio():
-                    nonlocal running
-                    running = False
-                    if has_changed:
-                        # TODO: fetch new charity addresses
-                        new_charity_addresses: list[CharityAddress] = get_addresses_of_charities(self.postgres_db, new_charity_names)
-
-                        new_charity_addresses.sort(key = lambda x: new_charity_names.index(x.name))
-
-                        set_charities(
-                            contract,
-                            user_id,
-                            new_charity_addresses,
-                            new_charity_percents,
-                        )
-                        print(f"Updated portfolio for user {user_id}")
-
-                    return "Keeping the current portfolio without changes"
-
-                def update_portfolio(new_charities, new_percents):
-                    nonlocal new_charity_names, new_charity_percents, has_changed
-                    new_charity_names = new_charities
-                    new_charity_percents = new_percents
-                    has_changed = True
-                    return f"Portfolio updated with new charities and percentages:\n{convert_charity_list_to_text()}"
-
-                def send_money():
-                    nonlocal running
-                    print(f"Sending money to charities in portfolio for user {user_id}")
-                    split_among_charities(contract, user_id)
-                    running = False
-                    return "Money sent to charities in portfolio"
-
-                def convert_charity_list_to_text():
-                    if not new_charity_names:
-                        return "No charities in the portfolio"
-                    return "\n".join(
-                        [
-                            f"{name} ({percent}%)"
-                            for name, percent in zip(
-                                new_charity_names, new_charity_percents
-                            )
-                        ]
+                self.portfolio_writes.pop(row.userid, None)
+                by_address[row.userid] = row
+        return {user_id: user_from_row(by_address[user_id.lower()]) for user_id in user_ids if user_id.lower() in by_address}
+
+    def portfolio_article_context(self, article, category, similar_charities, urgency_score):
+        context = f"Article Title: {article['title']}\nDescription: {article.get('description', '')}\nCategory: {category}\n"
+        if article.get("category_hints"):
+            context += f"Suggested Categories: {', '.join(article['category_hints'])}\n"
+        return context + f"Urgency Score: {urgency_score}\nSimilar Charities:\n{compact_charities(similar_charities)}"
+
+    def decide_portfolio(self, cohort, context):
+        """Run the portfolio-manager tool loop once for a cohort and return its decision.
+
+        The decision is {"action": "keep" | "update" | "send_money", "charities", "percents"};
+        nothing is written on-chain here.
+        """
+        new_charity_names = cohort.charity_names
+        new_charity_percents = cohort.percentages
+        has_changed = False
+        decision = None
+
+        def keep_portfolio():
+            nonlocal decision
+            if has_changed:
+                decision = {"action": "update", "charities": new_charity_names, "percents": new_charity_percents}
+            else:
+                decision = {"action": "keep"}
+            return "Keeping the current portfolio without changes"
+
+        def update_portfolio(new_charities, new_percents):
+            nonlocal new_charity_names, new_charity_percents, has_changed
+            new_charity_names = new_charities
+            new_charity_percents = new_percents
+            has_changed = True
+            return f"Portfolio updated with new charities and percentages:\n{convert_charity_list_to_text()}"
+
+        def send_money():
+            nonlocal decision
+            decision = {"action": "send_money"}
+            return "Money sent to charities in portfolio"
+
+        def convert_charity_list_to_text():
+            if not new_charity_names:
+                return "No charities in the portfolio"
+            return "\n".join(
+                [
+                    f"{name} ({percent}%)"
+                    for name, percent in zip(
+                        new_charity_names, new_charity_percents
                     )
+                ]
+            )
 
-                # Agentic loop
+        messages = [
+            {
+                "role": "system",
+                "content": f"You are a portfolio manager for a charity impact fund. Your job is to manage the fund's portfolio of charities to maximize social impact. You have the following charities in your portfolio:\n{convert_charity_list_to_text()}",
+            },
+            {
+                "role": "user",
+                "content": "Analyze the portfolio and make any necessary changes based on the article and the new charities. Call the 'keep_portfolio' function if you want to keep the current portfolio without changes, the 'update_portfolio' function if you want to update the portfolio with new charities and percentages, or the 'send_money' function if you want to send money to the charities in the portfolio. Make sure the charity percentages sum to 100, and end the conversation by calling the 'keep_portfolio' function.",
+            },
+            {
+                "role": "system",
+                "content": context,
+            },
+        ]
 
-                messages = [
-                    {
-                        "role": "system",
-                        "content": f"User {user_id}, you are a portfolio manager for a charity impact fund. Your job is to manage the fund's portfolio of charities to maximize social impact. You have the following charities in your portfolio:\n{convert_charity_list_to_text()}",
-                    },
-                    {
-                        "role": "user",
-                        "content": "Analyze the portfolio and make any necessary changes based on the article and the new charities. Call the 'keep_portfolio' function if you want to keep the current portfolio without changes, the 'update_portfolio' function if you want to update the portfolio with new charities and percentages, or the 'send_money' function if you want to send money to the charities in the portfolio. Make sure the charity percentages sum to 100, and end the conversation by calling the 'keep_portfolio' function.",
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Article Title: {article['title']}\nDescription: {article.get('description', '')}\nCategory: {category}\nUrgency Score: {urgency_score}\nSimilar Charities:\n{json.dumps(similar_charities, indent=2)}",
-                    },
-                ]
+        def handle(name, args):
+            if name == "keep_portfolio":
+                return keep_portfolio()
+            if name == "update_portfolio":
+                return update_portfolio(
+                    args.get("new_charities", []),
+                    args.get("new_percents", []),
+                )
+            if name == "send_money":
+                return send_money()
+            return f"Unknown function {name}"
+
+        run = self.portfolio_agent.run(messages, handle, lambda: decision is not None)
+        if decision is None:
+            print(f"No portfolio decision after {run.turns} turns ({run.stop_reason}), keeping the portfolio")
+            return {"action": "keep"}
+        return decision
+
+    def batch_portfolio_messages(self, cohorts, context):
+        portfolios = "\n\n".join(
+            f"[{index}]\n{cohort.describe()}" for index, cohort in enumerate(cohorts)
+        )
+        return [
+            {"role": "system", "content": BATCH_PORTFOLIO_SYSTEM_PROMPT},
+            {"role": "system", "content": context},
+            {"role": "user", "content": f"Portfolios:\n\n{portfolios}"},
+        ]
 
-                while running:
-                    response = self.client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=messages,
-                        tools=[
-                            {
-                                "type": "function",
-                                "function": {
-                                    "name": "keep_portfolio",
-                                    "description": "Keep the current portfolio without changes",
-                                },
-                            },
-                            {
-                                "type": "function",
-                                "function": {
-                                    "name": "update_portfolio",
-                                    "description": "Update the portfolio with new charities and percentages",
-                                    "parameters": {
-                                        "type": "object",
-                                        "properties": {
-                                            "new_charities": {
-                                                "type": "array",
-                                                "items": {"type": "string"},
-                                            },
-                                            "new_percents": {
-                                                "type": "array",
-                                                "items": {"type": "number"},
-                                            },
-                                        },
-                                    },
-                                },
-                            },
-                            {
-                                "type": "function",
-                                "function": {
-                                    "name": "send_money",
-                                    "description": "Send money to charities in the portfolio",
-                                },
-                            },
-                        ],
-                        tool_choice="auto",
-                    )
+    def parse_portfolio_decisions(self, cohorts, content):
+        """Map a batch response onto {cohort index: decision}; malformed items are left out."""
+        decisions = {}
+        try:
+            for item in json.loads(content).get("decisions", []):
+                index = item.get("index")
+                if not isinstance(index, int) or not 0 <= index < len(cohorts):
+                    continue
+                if item.get("action") == "update":
+                    decisions[index] = {
+                        "action": "update",
+                        "charities": item.get("charities", []),
+                        "percents": item.get("percents", []),
+                    }
+                elif item.get("action") in ("keep", "send_money"):
+                    decisions[index] = {"action": item["action"]}
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"Could not parse batch portfolio response: {e}")
+        return decisions
+
+    def decide_portfolios_batch(self, cohorts, context):
+        """Decide many distinct portfolios with one structured request per batch.
+
+        Returns {cohort index: decision}; cohorts the batch leaves out fall back
+        to decide_portfolio.
+        """
+        decisions = {}
+        batch_size = self.portfolio_batch_size
+        for start in range(0, len(cohorts), batch_size):
+            batch = cohorts[start:start + batch_size]
+            try:
+                response = self.llm.chat(
+                    model="gpt-4o-mini",
+                    messages=self.batch_portfolio_messages(batch, context),
+                    response_format=BATCH_PORTFOLIO_RESPONSE_FORMAT,
+                )
+                self.portfolio_stats["decision_calls"] += 1
+                for index, decision in self.parse_portfolio_decisions(batch, response.choices[0].message.content).items():
+                    decisions[start + index] = decision
+            except Exception as e:
+                print(f"Error in batch portfolio decision: {e}")
+        return decisions
+
+    def resolve_portfolio_update(self, decision):
+        """(charity addresses, percents) for an update decision, or None if it can't be applied."""
+        names = list(decision["charities"])
+        percents = [int(round(percent)) for percent in decision["percents"]]
+        if len(names) != len(percents) or sum(percents) != 100:
+            print(f"Ignoring portfolio update that doesn't sum to 100%: {names} {percents}")
+            return None
+
+        with self.db_lock:
+            charity_rows: list[CharityAddress] = get_addresses_of_charities(self.postgres_db, names)
+        addresses = {row.name: row.address for row in charity_rows}
+        missing = [name for name in names if name not in addresses]
+        if missing:
+            print(f"Ignoring portfolio update with unknown charities: {missing}")
+            return None
+        return [addresses[name] for name in names], percents
+
+    def commit_portfolio_decisions(self, decisions):
+        """Write an article's cohort decisions on-chain.
+
+        With CHAIN_BATCH_WRITES on, all updates go out as a few setCharitiesBatch
+        and splitAmongCharitiesBatch transactions; otherwise, or if a batch
+        fails, each member gets its own transaction. With SPLIT_SCHEDULER on,
+        payouts are left to run_split_scheduler.py.
+        """
+        updates = []
+        splits = []
+        for cohort, decision in decisions:
+            if decision["action"] == "send_money":
+                splits.extend(cohort.members)
+            elif decision["action"] == "update":
+                try:
+                    resolved = self.resolve_portfolio_update(decision)
+                except Exception as e:
+                    print(f"Error resolving portfolio update for users {cohort.members}: {e}")
+                    continue
+                if resolved:
+                    updates.extend((user_id, *resolved) for user_id in cohort.members)
 
-                    message = response.choices[0].message
-                    messages.append(message)
+        if updates:
+            receipts = self.chain_batch_writes and self.write_batch(set_charities_batch, updates)
+            if receipts:
+                self.remember_portfolio_writes([user_id for user_id, _, _ in updates], receipts)
+            else:
+                results = self.settle_transactions(self.user_pool.run_all(
+                    (user_id, set_charities, get_contract(), user_id, charity_addresses, percents, False)
+                    for user_id, charity_addresses, percents in updates
+                ))
+                self.report_member_errors(results)
+                for user_id, receipt, error in results:
+                    if not error:
+                        self.remember_portfolio_writes([user_id], [receipt])
+                updates = [update for update, (_, _, error) in zip(updates, results) if not error]
+            print(f"Updated portfolio for {len(updates)} user(s)")
+
+        if splits and self.scheduled_splits:
+            print(f"Leaving payouts for {len(splits)} user(s) to the split scheduler")
+        elif splits:
+            print(f"Sending money to charities in portfolio for {len(splits)} user(s)")
+            if not self.chain_batch_writes or not self.write_batch(split_among_charities_batch, splits):
+                self.report_member_errors(self.settle_transactions(
+                    self.user_pool.run_all(
+                        (user_id, split_among_charities, get_contract(), user_id, False) for user_id in splits
+                    )
+                ))
 
-                    for tool_call in message.tool_calls:
-                        args = json.loads(tool_call.function.arguments)
+    def write_batch(self, batch_function, items):
+        """Run a batched chain write and return its receipts; None if it has to be redone per user."""
+        try:
+            receipts = batch_function(get_contract(), items)
+        except Exception as e:
+            print(f"Batched {batch_function.__name__} failed ({e}), falling back to per-user transactions")
+            return None
+        reverted = [receipt for receipt in receipts if receipt["status"] != 1]
+        if reverted:
+            print(f"{len(reverted)} batched {batch_function.__name__} transaction(s) reverted, falling back to per-user transactions")
+            return None
+        print(f"Wrote {len(items)} user(s) in {len(receipts)} {batch_function.__name__} transaction(s)")
+        return receipts
+
+    def remember_portfolio_writes(self, user_ids, receipts):
+        """Note the block of our own confirmed setCharities writes (see indexed_users)."""
+        block = max(receipt["blockNumber"] for receipt in receipts)
+        with self.db_lock:
+            for user_id in user_ids:
+                key = user_id.lower()
+                self.portfolio_writes[key] = max(block, self.portfolio_writes.get(key, block))
+
+    def settle_transactions(self, submitted):
+        """Wait for the receipts of [(user_id, future, error)]; reverted transactions become errors.
+
+        All futures share one RECEIPT_TIMEOUT, so a stuck transaction doesn't hold up the others;
+        those still unmined by then are reported as errors.
+        """
+        submitted = list(submitted)
+        wait([future for _, future, error in submitted if error is None], timeout=RECEIPT_TIMEOUT)
+        results = []
+        for user_id, future, error in submitted:
+            receipt = None
+            if error is None and not future.done():
+                error = TimeoutError(f"no receipt after {RECEIPT_TIMEOUT}s")
+            elif error is None:
+                try:
+                    receipt = future.result()
+                    if receipt["status"] != 1:
+                        error = RuntimeError(f"transaction {receipt['transactionHash'].hex()} reverted")
+                except Exception as e:
+                    error = e
+            results.append((user_id, receipt, error))
+        return results
 
-                        if tool_call.function.name == "keep_portfolio":
-                            result = keep_portfolio()
-                        elif tool_call.function.name == "update_portfolio":
-                            result = update_portfolio(
-                                args.get("new_charities", []),
-                                args.get("new_percents", []),
-                            )
-                        elif tool_call.function.name == "send_money":
-                            result = send_money()
-
-                        messages.append(
-                            {
-                                "role": "tool",
-                                "content": result,
-                                "tool_call_id": tool_call.id,
-                            }
-                        )
+    def report_member_errors(self, results):
+        for user_id, _, error in results:
+            if error:
+                print(f"Error updating portfolio for user {user_id}: {error}")
 
-                print(f"Portfolio updated for user {user_id}")
+    def update_user_portfolios(
+        self, subscribers: list[UserCategory], category, similar_charities, article, urgency_score=None
+    ):
+        """Update user portfolios using an AI portfolio manager.
+
+        Subscribers with identical portfolios form a cohort that gets a single
+        decision. Cohorts with several members get the multi-turn agent; users
+        with a portfolio of their own are decided together in batched prompts
+        (PORTFOLIO_BATCH_SIZE, 1 disables batching). Portfolios are read in
+        JSON-RPC batches; chain writes run on user_pool (SUBSCRIBER_WORKERS
+        threads), keyed by user.
+        """
+        try:
+            # Get urgency score for the article, unless a fused assessment already did
+            if urgency_score is None:
+                urgency_result = self.get_urgency_score(article)
+                print("\nUrgency Assessment:")
+                print(urgency_result)
+                urgency_score = parse_urgency_score(urgency_result)
+
+            cohorts = self.portfolio_cohorts(subscribers)
+            context = self.portfolio_article_context(article, category, similar_charities, urgency_score)
+            calls_before = self.portfolio_stats["decision_calls"]
+
+            singles = [cohort for cohort in cohorts if len(cohort.members) == 1]
+            batched = self.decide_portfolios_batch(singles, context) if self.portfolio_batch_size > 1 else {}
+            decisions = [(singles[index], decision) for index, decision in batched.items()]
+            decided = {id(cohort) for cohort, _ in decisions}
+            pending = [cohort for cohort in cohorts if id(cohort) not in decided]
+            for cohort in pending:
+                print(f"\nAnalyzing portfolio for {len(cohort.members)} user(s): {cohort.describe()}")
+            agent_runs = self.user_pool.run_all(
+                (("cohort", index), self.decide_portfolio, cohort, context) for index, cohort in enumerate(pending)
+            )
+            for cohort, (_, decision, error) in zip(pending, agent_runs):
+                self.portfolio_stats["decision_calls"] += 1
+                if error:
+                    print(f"Error deciding portfolio for users {cohort.members}: {error}")
+                else:
+                    decisions.append((cohort, decision))
+
+            self.commit_portfolio_decisions(decisions)
+
+            self.portfolio_stats["users"] += sum(len(cohort.members) for cohort in cohorts)
+            self.portfolio_stats["cohorts"] += len(cohorts)
+            print(
+                f"Portfolios: {sum(len(cohort.members) for cohort in cohorts)} users in {len(cohorts)} cohorts, "
+                f"{self.portfolio_stats['decision_calls'] - calls_before} decisions requested"
+            )
+            self.user_pool.report()
 
         except Exception as e:
             print(f"Error updating user portfolios: {e}")
 
-    def store_recommendation(self, user_id, charity_name, news_article, reason, relevance_score):
-        """Store a recommendation for a user"""
-        if user_id not in self.recommendations:
-            self.recommendations[user_id] = []
-        
-        recommendation = {
+    def build_recommendation(self, charity_name, news_article, reason, relevance_score):
+        return {
             "charity": {
                 "name": charity_name,
                 "mission": "Charity mission statement",  # TODO: Get real mission
@@ -612,34 +1427,52 @@ Brief Reason: [one-line explanation]"
             "reason": reason,
             "relevance_score": relevance_score
         }
-        
-        self.recommendations[user_id].append(recommendation)
-        self.save_recommendations()  # Save to file
+
+    def store_recommendation(self, user_id, charity_name, news_article, reason, relevance_score):
+        """Store a recommendation for a user"""
+        recommendation = self.build_recommendation(charity_name, news_article, reason, relevance_score)
+        self.recommendation_store.add([(user_id, recommendation)])
         print(f"Stored recommendation for user {user_id}: {charity_name}")
 
-    def get_user_recommendations(self, user_id):
-        """Get stored recommendations for a user"""
-        return self.recommendations.get(user_id, [])
+    def get_user_recommendations(self, user_id, limit=50, before_id=None):
+        """Get stored recommendations for a user, newest first"""
+        return self.recommendation_store.for_user(user_id, limit, before_id)
 
-    def load_recommendations(self):
-        """Load recommendations from file"""
+    def import_recommendations_json(self, path="recommendations.json"):
+        """Carry recommendations from the old JSON file into an empty store, once."""
+        if not os.path.exists(path) or not self.recommendation_store.is_empty():
+            return
         try:
-            if os.path.exists(self.recommendations_file):
-                with open(self.recommendations_file, 'r') as f:
-                    self.recommendations = json.load(f)
-                print(f"Loaded {sum(len(recs) for recs in self.recommendations.values())} recommendations from file")
+            with open(path, 'r') as f:
+                recommendations = json.load(f)
+            self.recommendation_store.add(
+                (user_id, recommendation)
+                for user_id, user_recommendations in recommendations.items()
+                for recommendation in user_recommendations
+            )
+            print(f"Imported {sum(len(recs) for recs in recommendations.values())} recommendations from {path}")
         except Exception as e:
-            print(f"Error loading recommendations: {e}")
-            self.recommendations = {}
+            print(f"Error importing recommendations: {e}")
+
+    def store_recommendations(self, subscribers, similar_charities, article, relevance_score):
+        """Store a recommendation for every (subscriber, charity) pair of an article in one bulk write"""
+        reason = f"Based on recent news: {article['title']}"
+        recommendations = [
+            (
+                user.userid,
+                self.build_recommendation(charity["name"], article, reason, relevance_score),
+            )
+            for user in subscribers
+            for charity in similar_charities
+        ]
+        self.recommendation_store.add(recommendations)
+        print(f"Stored {len(recommendations)} recommendations for {len(subscribers)} users")
 
-    def save_recommendations(self):
-        """Save recommendations to file"""
-        try:
-            with open(self.recommendations_file, 'w') as f:
-                json.dump(self.recommendations, f, indent=2)
-            print(f"Saved {sum(len(recs) for recs in self.recommendations.values())} recommendations to file")
-        except Exception as e:
-            print(f"Error saving recommendations: {e}")
+    def print_matching_categories(self, matching_categories):
+        print("\nMatching Categories:")
+        for i, cat in enumerate(matching_categories, 1):
+            print(f"{i}. {cat['category']}")
+            print(f"   Similarity Score: {cat['similarity']:.4f}")
 
     def run(self, rss_urls, interval=300):  # interval in seconds (default 5 minutes)
         while True:
@@ -647,14 +1480,36 @@ Brief Reason: [one-line explanation]"
                 print(f"\nChecking for new articles at {datetime.now()}")
                 articles = self.get_rss_feeds(rss_urls)
 
+                # Classify the whole cycle up front in batched requests
+                fused = self.assessment_mode == "fused"
+                relevance = {} if fused else self.classify_relevance_batch(articles)
+                analyses = self.analyze_articles(
+                    [article for article in articles if relevance.get(article["link"], True)]
+                )
+
                 for article in articles:
                     print("\n" + "=" * 50)
                     print(f"Processing new article...")
 
+                    analysis = analyses.get(article["link"]) or ArticleAnalysis(self, article)
+                    assessment = None
+                    if fused:
+                        with analysis.timed("assessment"):
+                            assessment = self.assess_article(article)
+                    if assessment is not None:
+                        analysis.relevant = assessment["relevant"]
+                        analysis.urgency_score = assessment["urgency_score"]
+                        article["category_hints"] = assessment["categories"]
+                    elif article["link"] in relevance:
+                        analysis.relevant = relevance[article["link"]]
+                    else:
+                        with analysis.timed("relevance"):
+                            analysis.relevant = self.is_relevant_article(
+                                article["title"], article.get("description", "")
+                            )
+
                     # Check if article is relevant using GPT
-                    if not self.is_relevant_article(
-                        article["title"], article.get("description", "")
-                    ):
+                    if not analysis.relevant:
                         print("Skipping article based on GPT response")
                         continue
 
@@ -663,47 +1518,164 @@ Brief Reason: [one-line explanation]"
 
                     # Find matching categories and subscribers
                     matching_categories, subscribers = self.find_matching_categories(
-                        article
+                        article, analysis
                     )
-                    print("\nMatching Categories:")
-                    for i, cat in enumerate(matching_categories, 1):
-                        print(f"{i}. {cat['category']}")
-                        print(f"   Similarity Score: {cat['similarity']:.4f}")
+                    self.print_matching_categories(matching_categories)
 
                     # Find similar charities
-                    similar_charities = self.find_similar_charities(article)
+                    similar_charities = self.find_similar_charities(article, analysis=analysis)
 
                     if similar_charities and subscribers:
                         # Update user portfolios
-                        self.update_user_portfolios(
-                            subscribers,
-                            matching_categories[0]["category"],
-                            similar_charities,
-                            article,
-                        )
+                        with analysis.timed("portfolio"):
+                            self.update_user_portfolios(
+                                subscribers,
+                                matching_categories[0]["category"],
+                                similar_charities,
+                                article,
+                                analysis.urgency_score,
+                            )
                         
                         # Store recommendations for each user
-                        for user in subscribers:
-                            for charity in similar_charities:
-                                reason = f"Based on recent news: {article['title']}"
-                                relevance_score = matching_categories[0]["similarity"]
-                                self.store_recommendation(
-                                    user.userid,
-                                    charity["name"],
-                                    article,
-                                    reason,
-                                    relevance_score
-                                )
+                        with analysis.timed("recommendations"):
+                            self.store_recommendations(
+                                subscribers,
+                                similar_charities,
+                                article,
+                                matching_categories[0]["similarity"],
+                            )
 
                     else:
                         print("No similar charities found.")
 
+                    analysis.report()
+
                     # Mark article as processed
                     self.processed_articles.add(article["link"])
-                    self.save_processed_articles()
 
+                # Only now can the next cycle skip these feeds on a 304
+                self.feed_fetcher.commit_validators()
+                self.llm.report()
+                self.relevance_agent.report()
+                self.portfolio_agent.report()
                 time.sleep(interval)
 
             except Exception as e:
                 print(f"Error occurred: {str(e)}")
                 time.sleep(60)  # Wait a minute before retrying
+
+    async def process_article_async(self, analysis, stages):
+        """Run one article through the pipeline, holding each stage's semaphore only while in it."""
+        article = analysis.article
+        if analysis.relevant is None and self.assessment_mode == "fused":
+            async with stages["relevance"]:
+                with analysis.timed("assessment"):
+                    assessment = await self.assess_article_async(article)
+            if assessment is not None:
+                analysis.relevant = assessment["relevant"]
+                analysis.urgency_score = assessment["urgency_score"]
+                article["category_hints"] = assessment["categories"]
+
+        if analysis.relevant is None:
+            async with stages["relevance"]:
+                with analysis.timed("relevance"):
+                    analysis.relevant = await self.is_relevant_article_async(
+                        article["title"], article.get("description", "")
+                    )
+
+        if analysis.relevant:
+            print(f"\nAnalyzing article: {article['title']}")
+
+            # Chroma and Postgres clients are synchronous, run them in worker threads
+            async with stages["categories"]:
+                matching_categories, subscribers = await asyncio.to_thread(
+                    self.find_matching_categories, article, analysis
+                )
+            self.print_matching_categories(matching_categories)
+
+            async with stages["charities"]:
+                similar_charities = await asyncio.to_thread(
+                    self.find_similar_charities, article, CHARITY_RESULTS, analysis
+                )
+
+            if similar_charities and subscribers:
+                async with stages["portfolio"]:
+                    with analysis.timed("portfolio"):
+                        await asyncio.to_thread(
+                            self.update_user_portfolios,
+                            subscribers,
+                            matching_categories[0]["category"],
+                            similar_charities,
+                            article,
+                            analysis.urgency_score,
+                        )
+                    with analysis.timed("recommendations"):
+                        await asyncio.to_thread(
+                            self.store_recommendations,
+                            subscribers,
+                            similar_charities,
+                            article,
+                            matching_categories[0]["similarity"],
+                        )
+            else:
+                print(f"No similar charities found for {article['title']}")
+            analysis.report()
+        else:
+            print(f"Skipping article based on GPT response: {article['title']}")
+
+        self.processed_articles.add(article["link"])
+
+    async def run_async(self, rss_urls, interval=300, max_in_flight=None, stage_limits=None):
+        """Pipelined run mode: articles overlap across stages with bounded concurrency.
+
+        max_in_flight caps how many articles are in the pipeline at once, and
+        stage_limits caps concurrency per stage (see DEFAULT_STAGE_LIMITS).
+        """
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv("MATCHER_MAX_IN_FLIGHT", "16"))
+        limits = {**DEFAULT_STAGE_LIMITS, **(stage_limits or {})}
+        stages = {name: asyncio.Semaphore(limit) for name, limit in limits.items()}
+        in_flight = asyncio.Semaphore(max_in_flight)
+
+        async def process(analysis):
+            async with in_flight:
+                try:
+                    await self.process_article_async(analysis, stages)
+                except Exception as e:
+                    print(f"Error processing article {analysis.link}: {e}")
+
+        try:
+            while True:
+                try:
+                    print(f"\nChecking for new articles at {datetime.now()}")
+                    articles = await self.get_rss_feeds_async(rss_urls)
+                    print(f"Processing {len(articles)} new articles, up to {max_in_flight} at a time")
+
+                    started = time.perf_counter()
+                    if self.assessment_mode == "fused":
+                        relevance = {}
+                    else:
+                        relevance = await self.classify_relevance_batch_async(articles, stages["relevance"])
+                    analyses = await asyncio.to_thread(
+                        self.analyze_articles,
+                        [article for article in articles if relevance.get(article["link"], True)],
+                    )
+                    for article in articles:
+                        if article["link"] not in analyses:
+                            analyses[article["link"]] = ArticleAnalysis(self, article)
+                        analyses[article["link"]].relevant = relevance.get(article["link"])
+                    await asyncio.gather(*(process(analysis) for analysis in analyses.values()))
+                    # Only now can the next cycle skip these feeds on a 304
+                    self.feed_fetcher.commit_validators()
+                    print(f"Processed {len(articles)} articles in {time.perf_counter() - started:.1f}s")
+                    self.llm.report()
+                    self.relevance_agent.report()
+                    self.portfolio_agent.report()
+
+                    await asyncio.sleep(interval)
+
+                except Exception as e:
+                    print(f"Error occurred: {str(e)}")
+                    await asyncio.sleep(60)  # Wait a minute before retrying
+        finally:
+            await self.feed_fetcher.aclose()
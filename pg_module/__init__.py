@@ -1,3 +1,3 @@
-from .crud import get_charities_for_category, get_users_for_category, get_names_of_charities, get_addresses_of_charities, put_user_preferences, get_user_preferences, create_user_preferences, get_charity, get_all_users
-from .models import CharityCategory, UserCategory, CharityAddress, Charity, UserPreferences, Counter
+from .crud import get_charities_for_category, get_users_for_category, get_names_of_charities, get_addresses_of_charities, put_user_preferences, get_user_preferences, create_user_preferences, get_charity, get_all_users, get_recommendations_for_user, add_recommendations, trim_recommendations, get_chain_user, get_chain_users, get_donation_history, get_checkpoint, set_checkpoint, add_chain_events, delete_chain_events_from, get_chain_events_for_users, replace_chain_users, get_split_candidates
+from .models import CharityCategory, UserCategory, CharityAddress, Charity, UserPreferences, Counter, Recommendation, ChainCheckpoint, ChainUser, ChainEvent
 from .database import get_db, SessionLocal
\ No newline at end of file
@@ -1,6 +1,9 @@
+from datetime import datetime
+
+from sqlalchemy import insert, delete, select, func, or_
 from sqlalchemy.orm import Session
 from typing import Optional, List
-from .models import UserCategory, CharityCategory, Charity, UserPreferences, CharityAddress, Counter
+from .models import UserCategory, CharityCategory, Charity, UserPreferences, CharityAddress, Counter, Recommendation, ChainCheckpoint, ChainUser, ChainEvent
 
 def get_users_for_category(db: Session, category: str) -> Optional[List[UserCategory]]:
     return db.query(UserCategory).filter(UserCategory.category == category).all()
@@ -34,4 +37,98 @@ def get_addresses_of_charities(db: Session, names: list[str]) -> Optional[List[C
 
 def get_all_users(db: Session) -> List[Counter]:
     """Get all users from the Counter table (users are identified by their userid)"""
-    return db.query(Counter).all()
\ No newline at end of file
+    return db.query(Counter).all()
+
+def get_recommendations_for_user(db: Session, userId: str, limit: int = 50, before_id: Optional[int] = None) -> List[Recommendation]:
+    """Newest recommendations first; pass the last id seen as before_id for the next page"""
+    query = db.query(Recommendation).filter(Recommendation.userid == userId)
+    if before_id is not None:
+        query = query.filter(Recommendation.id < before_id)
+    return query.order_by(Recommendation.id.desc()).limit(limit).all()
+
+def add_recommendations(db: Session, rows: list[dict]) -> None:
+    """Bulk insert recommendation rows (userid, charityname, created_at, payload)"""
+    if rows:
+        db.execute(insert(Recommendation), rows)
+        db.commit()
+
+def trim_recommendations(db: Session, userIds: list[str], keep: int) -> int:
+    """Delete all but the newest `keep` recommendations of each given user"""
+    ranked = (
+        select(
+            Recommendation.id,
+            func.row_number().over(partition_by=Recommendation.userid, order_by=Recommendation.id.desc()).label("rank"),
+        )
+        .where(Recommendation.userid.in_(userIds))
+        .subquery()
+    )
+    result = db.execute(delete(Recommendation).where(Recommendation.id.in_(select(ranked.c.id).where(ranked.c.rank > keep))))
+    db.commit()
+    return result.rowcount
+
+def get_chain_user(db: Session, userId: str) -> Optional[ChainUser]:
+    """Indexed on-chain state of one user (see web3_utils/event_indexer.py)"""
+    return db.query(ChainUser).filter(ChainUser.userid == userId.lower()).first()
+
+def get_donation_history(db: Session, userId: str, limit: int = 50, before_id: Optional[int] = None) -> List[ChainEvent]:
+    """Donated / Withdrawn / SplitAmongCharities events of a user, newest first"""
+    query = db.query(ChainEvent).filter(
+        ChainEvent.userid == userId.lower(),
+        ChainEvent.event.in_(["Donated", "Withdrawn", "SplitAmongCharities"]),
+    )
+    if before_id is not None:
+        query = query.filter(ChainEvent.id < before_id)
+    return query.order_by(ChainEvent.id.desc()).limit(limit).all()
+
+def get_chain_users(db: Session, userIds: list[str]) -> List[ChainUser]:
+    return db.query(ChainUser).filter(ChainUser.userid.in_([userId.lower() for userId in userIds])).all()
+
+def get_checkpoint(db: Session, name: str) -> Optional[ChainCheckpoint]:
+    return db.query(ChainCheckpoint).filter(ChainCheckpoint.name == name).first()
+
+def set_checkpoint(db: Session, name: str, block_number: int, block_hash: str) -> None:
+    """Stage the checkpoint; committed together with the events it covers"""
+    checkpoint = get_checkpoint(db, name)
+    if checkpoint is None:
+        checkpoint = ChainCheckpoint(name=name)
+        db.add(checkpoint)
+    checkpoint.block_number = block_number
+    checkpoint.block_hash = block_hash
+    checkpoint.updated_at = datetime.utcnow()
+
+def add_chain_events(db: Session, rows: list[dict]) -> None:
+    if rows:
+        db.execute(insert(ChainEvent), rows)
+
+def delete_chain_events_from(db: Session, block_number: int) -> list[str]:
+    """Drop events at or after block_number (a reorg); returns the users they touched"""
+    userIds = [row[0] for row in db.query(ChainEvent.userid).filter(ChainEvent.block_number >= block_number).distinct()]
+    db.execute(delete(ChainEvent).where(ChainEvent.block_number >= block_number))
+    return userIds
+
+def get_chain_events_for_users(db: Session, userIds: list[str]) -> List[ChainEvent]:
+    """Full event history of the given users, in chain order"""
+    return (
+        db.query(ChainEvent)
+        .filter(ChainEvent.userid.in_(userIds))
+        .order_by(ChainEvent.block_number, ChainEvent.log_index)
+        .all()
+    )
+
+def replace_chain_users(db: Session, userIds: list[str], rows: list[dict]) -> None:
+    """Replace the indexed state of userIds with rows (users without a row are dropped)"""
+    if userIds:
+        db.execute(delete(ChainUser).where(ChainUser.userid.in_(userIds)))
+    if rows:
+        db.execute(insert(ChainUser), rows)
+
+def get_split_candidates(db: Session, min_balance: int, funded_before_block: int, limit: int) -> List[ChainUser]:
+    """Users with at least min_balance wei, or a balance waiting since before funded_before_block; largest first"""
+    return (
+        db.query(ChainUser)
+        .filter(ChainUser.balance > 0)
+        .filter(or_(ChainUser.balance >= min_balance, ChainUser.funded_block <= funded_before_block))
+        .order_by(ChainUser.balance.desc())
+        .limit(limit)
+        .all()
+    )
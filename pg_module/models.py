@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, ForeignKey, String, Boolean, Integer
+from sqlalchemy import Column, Text, ForeignKey, String, Boolean, Integer, DateTime, Index, BigInteger, Numeric, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.mysql import VARCHAR
 
@@ -43,4 +43,61 @@ class CharityAddress(Base):
     
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
-    address = Column(String(100), nullable=False)
\ No newline at end of file
+    address = Column(String(100), nullable=False)
+
+class Recommendation(Base):
+    __tablename__ = 'recommendation'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    userid = Column(VARCHAR(255), nullable=False)
+    charityname = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON document served by /ai/recommendations
+
+    __table_args__ = (
+        Index('ix_recommendation_userid_id', 'userid', 'id'),
+        Index('ix_recommendation_created_at', 'created_at'),
+    )
+
+class ChainCheckpoint(Base):
+    __tablename__ = 'chaincheckpoint'
+
+    name = Column(String(100), primary_key=True)
+    block_number = Column(BigInteger, nullable=False)
+    block_hash = Column(String(66), nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class ChainUser(Base):
+    __tablename__ = 'chainuser'
+
+    userid = Column(VARCHAR(255), primary_key=True)  # lowercased address
+    topics = Column(Text, nullable=False)  # JSON list of topic names
+    charities = Column(Text, nullable=False)  # JSON list of charity addresses
+    percentages = Column(Text, nullable=False)  # JSON list of ints
+    balance = Column(Numeric(78, 0), nullable=False)  # wei
+    last_block = Column(BigInteger, nullable=False)
+    funded_block = Column(BigInteger)  # block of the first donation not yet paid out; null when balance is 0
+
+    __table_args__ = (
+        Index('ix_chainuser_balance', 'balance'),
+        Index('ix_chainuser_funded_block', 'funded_block'),
+    )
+
+class ChainEvent(Base):
+    __tablename__ = 'chainevent'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    userid = Column(VARCHAR(255), nullable=False)
+    event = Column(String(50), nullable=False)
+    amount = Column(Numeric(78, 0))  # wei, for Donated / Withdrawn / SplitAmongCharities
+    payload = Column(Text, nullable=False)  # JSON of the decoded event arguments
+    block_number = Column(BigInteger, nullable=False)
+    block_hash = Column(String(66), nullable=False)
+    tx_hash = Column(String(66), nullable=False)
+    log_index = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('tx_hash', 'log_index', name='uq_chainevent_log'),
+        Index('ix_chainevent_userid_block', 'userid', 'block_number', 'log_index'),
+        Index('ix_chainevent_block', 'block_number'),
+    )
@@ -0,0 +1,22 @@
+import os
+
+from pg_module.database import engine
+from web3_utils.event_indexer import EventIndexer
+from web3_utils.interact_with_contract import w3, contract
+
+def main():
+    indexer = EventIndexer(
+        w3,
+        contract,
+        engine,
+        start_block=int(os.getenv("INDEXER_START_BLOCK", "0")),
+        confirmations=int(os.getenv("INDEXER_CONFIRMATIONS", "12")),
+        chunk_size=int(os.getenv("INDEXER_CHUNK_SIZE", "2000")),
+        reorg_depth=int(os.getenv("INDEXER_REORG_DEPTH", "64")),
+        poll_interval=float(os.getenv("INDEXER_POLL_INTERVAL", "5")),
+    )
+    print("Starting Donater event indexer...")
+    indexer.run_forever()
+
+if __name__ == "__main__":
+    main()
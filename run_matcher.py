@@ -1,3 +1,6 @@
+import asyncio
+import os
+
 from news_charity_matcher import NewsCharityMatcher
 from pg_module import get_db
 
@@ -16,7 +19,11 @@ def main():
     with next(get_db()) as db:
         matcher = NewsCharityMatcher(db)
         print("Starting News Charity Matcher...")
-        matcher.run(RSS_FEEDS)
+        # MATCHER_MODE=async overlaps articles across pipeline stages
+        if os.getenv("MATCHER_MODE", "sync") == "async":
+            asyncio.run(matcher.run_async(RSS_FEEDS))
+        else:
+            matcher.run(RSS_FEEDS)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,40 @@
+import os
+
+from eth_account import Account
+
+from pg_module.database import engine
+from web3_utils.split_scheduler import SplitScheduler
+from web3_utils.tx_submitter import TxSubmitter
+from web3_utils.interact_with_contract import w3, contract, supports_batches
+
+def main():
+    if not supports_batches():
+        raise SystemExit("The deployed Donater has no splitAmongCharitiesBatch; redeploy it (contracts/scripts/deploy.js) first")
+
+    # The scheduler sends with its own key: the matcher hands out nonces for
+    # PRIVATE_KEY in its own process, and sharing it would make them collide.
+    if not os.getenv("SPLIT_PRIVATE_KEY"):
+        raise SystemExit("Please set SPLIT_PRIVATE_KEY to the split scheduler's own key")
+    account = Account.from_key(os.getenv("SPLIT_PRIVATE_KEY"))
+    if os.getenv("PRIVATE_KEY") and account.address == Account.from_key(os.getenv("PRIVATE_KEY")).address:
+        raise SystemExit("SPLIT_PRIVATE_KEY must not be the owner's PRIVATE_KEY")
+    if not contract.functions.splitters(account.address).call():
+        raise SystemExit(f"{account.address} is not an authorized splitter; the owner has to call set_splitter for it")
+
+    scheduler = SplitScheduler(
+        w3,
+        contract,
+        engine,
+        TxSubmitter(w3, account, bump_after=float(os.getenv("TX_BUMP_AFTER", "45")), abandon_after=float(os.getenv("TX_ABANDON_AFTER", "90"))),
+        min_balance=int(float(os.getenv("SPLIT_MIN_BALANCE", "0.1")) * 10**18),  # AVAX
+        max_age_blocks=int(os.getenv("SPLIT_MAX_AGE_BLOCKS", "43200")),  # about a day of 2s blocks
+        max_users_per_cycle=int(os.getenv("SPLIT_MAX_USERS_PER_CYCLE", "200")),
+        fee_percentile=int(os.getenv("SPLIT_FEE_PERCENTILE", "30")),
+        max_base_fee=int(float(os.getenv("SPLIT_MAX_BASE_FEE_GWEI", "0")) * 10**9),
+        interval=float(os.getenv("SPLIT_INTERVAL", "600")),
+    )
+    print(f"Starting donation split scheduler as {account.address}...")
+    scheduler.run_forever()
+
+if __name__ == "__main__":
+    main()
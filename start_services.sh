@@ -14,22 +14,22 @@ echo "🌐 Starting API services..."
 
 # Main API (port 8000)
 echo "Starting Main API on port 8000..."
-cd api && python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --reload &
+python3 -m uvicorn api.main:app --host 0.0.0.0 --port 8000 --reload &
 API_PID=$!
 
 # Contract Wrapper API (port 8001)
 echo "Starting Contract API on port 8001..."
-cd ../contract_wrapper_api && python3 -m uvicorn main:app --host 0.0.0.0 --port 8001 --reload &
+cd contract_wrapper_api && python3 -m uvicorn main:app --host 0.0.0.0 --port 8001 --reload &
 CONTRACT_PID=$!
 
 # RSS Feed (port 8002)
 echo "Starting RSS Feed on port 8002..."
-cd ../rss_feed && python3 -m uvicorn rss_script:app --host 0.0.0.0 --port 8002 --reload &
+cd rss_feed && python3 -m uvicorn rss_script:app --host 0.0.0.0 --port 8002 --reload &
 RSS_PID=$!
 
 # News Matcher
 echo "Starting News Matcher..."
-cd .. && python3 run_matcher.py &
+python3 run_matcher.py &
 MATCHER_PID=$!
 
 echo "✅ All services started!"
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+# Only needed to build the (unconnected) database engine matcher_utils imports
+for name, value in [("PG_USER", "user"), ("PG_PASSWORD", "password"), ("PG_HOST", "localhost"), ("PG_PORT", "5432"), ("PG_DATABASE_NAME", "postgres")]:
+    os.environ.setdefault(name, value)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from matcher_utils.dedup import NearDuplicateIndex
+
+def test_dedup():
+    """Near-duplicate detection, including articles too short to shingle"""
+    print("🧪 Testing near-duplicate index...")
+    index = NearDuplicateIndex()
+
+    cases = [
+        # (link, title, description, expected original)
+        ("https://a.com/1", "Floods displace thousands in Pakistan", "Aid agencies warn of disease outbreaks", None),
+        ("https://b.com/2", "Floods displace thousands in Pakistan", "Aid agencies warn of disease outbreaks", "https://a.com/1"),
+        ("https://a.com/1?utm_source=rss", "Anything", "", "https://a.com/1"),
+        ("https://c.com/3", "Earthquake", "", None),
+        ("https://c.com/4", "Wildfire", "", None),
+        ("https://d.com/5", "", "", None),
+        ("https://d.com/6", " ", "<p></p>", None),
+    ]
+    failures = []
+    for link, title, description, expected in cases:
+        original = index.check(link, title, description)
+        ok = original == expected
+        print(f"{'✅' if ok else '❌'} {link} ({title or 'no title'!r}): duplicate of {original}")
+        if not ok:
+            failures.append(link)
+    assert not failures, f"Unexpected dedup results: {failures}"
+
+if __name__ == "__main__":
+    try:
+        test_dedup()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (module, directory it is imported from, budget in ms)
+TARGETS = [
+    ("api.main", ROOT, float(os.getenv("IMPORT_BUDGET_API_MS", "1500"))),
+    ("news_charity_matcher", ROOT, float(os.getenv("IMPORT_BUDGET_MATCHER_MS", "1500"))),
+]
+
+# Clients that should only be loaded once they are used
+HEAVY_MODULES = ["openai", "chromadb", "web3", "eth_account", "bs4"]
+
+def import_time_ms(module, cwd, runs=3):
+    """Best of `runs` cumulative import times from `python -X importtime`, and the heavy modules it loaded"""
+    env = dict(os.environ)
+    # Only needed to build the (unconnected) database engine URL
+    for name, value in [("PG_USER", "user"), ("PG_PASSWORD", "password"), ("PG_HOST", "localhost"), ("PG_PORT", "5432"), ("PG_DATABASE_NAME", "postgres")]:
+        env.setdefault(name, value)
+
+    best = None
+    loaded = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import json, sys, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        match = re.search(rf"^import time:\s+\d+ \|\s+(\d+) \| {re.escape(module)}$", result.stderr, re.MULTILINE)
+        elapsed = int(match.group(1)) / 1000
+        best = elapsed if best is None else min(best, elapsed)
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return best, loaded
+
+def test_import_time():
+    """Cold-start import budget for the API and the matcher"""
+    print("🧪 Testing import times...")
+    failures = []
+    for module, cwd, budget in TARGETS:
+        elapsed, loaded = import_time_ms(module, cwd)
+        ok = elapsed <= budget and not loaded
+        print(f"{'✅' if ok else '❌'} {module}: {elapsed:.0f} ms (budget {budget:.0f} ms)")
+        if loaded:
+            print(f"   loaded at import time: {', '.join(loaded)}")
+        if not ok:
+            failures.append(module)
+    assert not failures, f"Import budget exceeded: {failures}"
+
+if __name__ == "__main__":
+    try:
+        test_import_time()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
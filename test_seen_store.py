@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import time
+
+# Only needed to build the (unconnected) database engine matcher_utils imports
+for name, value in [("PG_USER", "user"), ("PG_PASSWORD", "password"), ("PG_HOST", "localhost"), ("PG_PORT", "5432"), ("PG_DATABASE_NAME", "postgres")]:
+    os.environ.setdefault(name, value)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from matcher_utils.seen_store import SeenStore
+
+def test_seen_store():
+    """Added and imported links are seen as soon as the call returns"""
+    print("🧪 Testing seen store...")
+    with tempfile.TemporaryDirectory() as directory:
+        store = SeenStore(path=os.path.join(directory, "seen.sqlite3"))
+        try:
+            # Let the compactor build its Bloom filter first
+            deadline = time.time() + 10
+            while store.bloom is None and time.time() < deadline:
+                time.sleep(0.01)
+            assert store.bloom is not None, "Bloom filter was never built"
+
+            store.add("https://example.com/added")
+            store.import_links(["https://example.com/a/1", "https://example.com/a/2"])
+
+            checks = [
+                ("https://example.com/added", True),
+                ("https://example.com/a/1", True),
+                ("https://example.com/a/2", True),
+                ("https://example.com/never", False),
+            ]
+            failures = []
+            for link, expected in checks:
+                seen = link in store
+                ok = seen == expected
+                print(f"{'✅' if ok else '❌'} {link}: {'seen' if seen else 'unseen'}")
+                if not ok:
+                    failures.append(link)
+            print(f"✅ {len(store)} links stored")
+            assert not failures, f"Unexpected seen-store lookups: {failures}"
+        finally:
+            store.close()
+
+if __name__ == "__main__":
+    try:
+        test_seen_store()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
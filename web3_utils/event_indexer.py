@@ -0,0 +1,183 @@
+import json
+import time
+
+from sqlalchemy.orm import sessionmaker
+from web3 import Web3
+
+from pg_module.crud import (
+    add_chain_events,
+    delete_chain_events_from,
+    get_chain_events_for_users,
+    get_chain_users,
+    get_checkpoint,
+    replace_chain_users,
+    set_checkpoint,
+)
+from pg_module.models import ChainCheckpoint, ChainEvent, ChainUser
+from web3_utils.interact_with_contract import decode_topic
+
+EVENTS = ("Enrolled", "TopicsUpdated", "CharitiesUpdated", "Donated", "Withdrawn", "SplitAmongCharities")
+
+
+def empty_state(userid):
+    return {"userid": userid, "topics": [], "charities": [], "percentages": [], "balance": 0, "last_block": 0, "funded_block": None}
+
+
+def state_from_row(row):
+    return {
+        "userid": row.userid,
+        "topics": json.loads(row.topics),
+        "charities": json.loads(row.charities),
+        "percentages": json.loads(row.percentages),
+        "balance": int(row.balance),
+        "last_block": row.last_block,
+        "funded_block": row.funded_block,
+    }
+
+
+def apply_event(state, event, payload, amount, block_number):
+    # Mirrors what the contract does to the user's storage for each event
+    if event == "Enrolled":
+        state.update(topics=payload["topics"], charities=payload["charities"], percentages=payload["percentages"], balance=0, funded_block=None)
+    elif event == "TopicsUpdated":
+        state["topics"] = payload["topics"]
+    elif event == "CharitiesUpdated":
+        state.update(charities=payload["charities"], percentages=payload["percentages"])
+    elif event == "Donated":
+        if not state["balance"]:
+            state["funded_block"] = block_number
+        state["balance"] += int(amount)
+    elif event in ("Withdrawn", "SplitAmongCharities"):
+        state.update(balance=0, funded_block=None)
+    state["last_block"] = block_number
+
+
+def state_row(state):
+    return {
+        "userid": state["userid"],
+        "topics": json.dumps(state["topics"]),
+        "charities": json.dumps(state["charities"]),
+        "percentages": json.dumps(state["percentages"]),
+        "balance": state["balance"],
+        "last_block": state["last_block"],
+        "funded_block": state["funded_block"],
+    }
+
+
+class EventIndexer:
+    # Follows the Donater contract's events into Postgres: every user event goes
+    # to chainevent and each user's current state (topics, charities, balance) to
+    # chainuser, so portfolio reads and donation history don't need the RPC.
+    # Only blocks `confirmations` deep are indexed. If the hash of the last
+    # indexed block changes (a reorg), the last reorg_depth blocks are dropped,
+    # the affected users are rebuilt from their remaining events and indexing
+    # resumes from there.
+
+    def __init__(self, w3, contract, engine, name="donater", start_block=0, confirmations=12,
+                 chunk_size=2000, reorg_depth=64, poll_interval=5.0):
+        self.w3 = w3
+        self.contract = contract
+        self.name = name
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk_size = chunk_size
+        self.reorg_depth = reorg_depth
+        self.poll_interval = poll_interval
+        self.events = {}  # topic0 -> contract event
+        for event_name in EVENTS:
+            # TopicsUpdated is only emitted from contract version 2
+            if hasattr(contract.events, event_name):
+                event = getattr(contract.events, event_name)
+                self.events[event.topic] = event
+
+        for model in (ChainCheckpoint, ChainEvent, ChainUser):
+            model.__table__.create(engine, checkfirst=True)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def block_hash(self, block_number):
+        return Web3.to_hex(self.w3.eth.get_block(block_number)["hash"])
+
+    def event_row(self, log):
+        event = self.events[Web3.to_hex(log["topics"][0])].process_log(log)
+        args = dict(event["args"])
+        payload = {}
+        if "_topics" in args:
+            payload["topics"] = [decode_topic(topic) for topic in args["_topics"]]
+        if "_charities" in args:
+            payload["charities"] = list(args["_charities"])
+            payload["percentages"] = list(args["_charityPercents"])
+        if "_amount" in args:
+            payload["amount"] = args["_amount"]
+        return {
+            "userid": args["_user"].lower(),
+            "event": event["event"],
+            "amount": args.get("_amount"),
+            "payload": json.dumps(payload),
+            "block_number": event["blockNumber"],
+            "block_hash": Web3.to_hex(event["blockHash"]),
+            "tx_hash": Web3.to_hex(event["transactionHash"]),
+            "log_index": event["logIndex"],
+        }
+
+    def apply(self, db, rows):
+        # Fold a block range's events into the state already indexed for those users
+        userids = list(dict.fromkeys(row["userid"] for row in rows))
+        states = {user.userid: state_from_row(user) for user in get_chain_users(db, userids)}
+        for row in rows:
+            state = states.setdefault(row["userid"], empty_state(row["userid"]))
+            apply_event(state, row["event"], json.loads(row["payload"]), row["amount"], row["block_number"])
+        replace_chain_users(db, userids, [state_row(state) for state in states.values()])
+
+    def rewind(self, db, checkpoint):
+        # Drop the possibly reorged blocks and rebuild their users from older events
+        from_block = max(self.start_block, checkpoint.block_number - self.reorg_depth + 1)
+        userids = delete_chain_events_from(db, from_block)
+        states = {}
+        for event in get_chain_events_for_users(db, userids):
+            state = states.setdefault(event.userid, empty_state(event.userid))
+            apply_event(state, event.event, json.loads(event.payload), event.amount, event.block_number)
+        replace_chain_users(db, userids, [state_row(state) for state in states.values()])
+        print(f"Reorg below block {checkpoint.block_number}: re-indexing from block {from_block} ({len(userids)} users rebuilt)")
+        return from_block
+
+    def step(self) -> int:
+        # Index the next chunk of confirmed blocks; returns how many blocks were indexed
+        head = self.w3.eth.block_number - self.confirmations
+        with self.Session() as db:
+            checkpoint = get_checkpoint(db, self.name)
+            if checkpoint is None:
+                from_block = self.start_block
+            elif self.block_hash(checkpoint.block_number) != checkpoint.block_hash:
+                from_block = self.rewind(db, checkpoint)
+            else:
+                from_block = checkpoint.block_number + 1
+            if from_block > head:
+                db.commit()
+                return 0
+
+            to_block = min(head, from_block + self.chunk_size - 1)
+            logs = self.w3.eth.get_logs({
+                "address": self.contract.address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [list(self.events)],
+            })
+            rows = [self.event_row(log) for log in logs]
+            add_chain_events(db, rows)
+            self.apply(db, rows)
+            # Events, user state and checkpoint are committed together
+            set_checkpoint(db, self.name, to_block, self.block_hash(to_block))
+            db.commit()
+        print(f"Indexed blocks {from_block}-{to_block}: {len(rows)} events")
+        return to_block - from_block + 1
+
+    def run_forever(self):
+        while True:
+            try:
+                indexed = self.step()
+            except Exception as e:
+                print(f"Error indexing events: {e}")
+                indexed = 0
+            # Catch up without sleeping, then poll for new blocks
+            if not indexed:
+                time.sleep(self.poll_interval)
@@ -1,12 +1,9 @@
 from dataclasses import dataclass
-from web3 import Web3
+from functools import lru_cache
 import json
 import os
-from eth_account import Account
 import dotenv
-import requests
 dotenv.load_dotenv()
-from web3.middleware import SignAndSendRawMiddlewareBuilder
 
 @dataclass
 class User:
@@ -15,23 +12,39 @@ class User:
     percentages: list[int]
     balance: float
 
-if os.getenv('PRIVATE_KEY') is None:
-    print("Please set the PRIVATE_KEY environment variable")
-    exit(1)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-w3 = Web3(Web3.HTTPProvider(os.getenv('INFURA_URL')))
+# The deployed Donater (address and layout version), written by contracts/scripts/deploy.js
+DEPLOYMENT_FILE = os.getenv('DEPLOYMENT_FILE', os.path.join(ROOT, 'contracts', 'deployed-contract.json'))
 
-CONTRACT_ADDRESS = "0xa338A6819C7f19B0cD55401df54bE54BbE34CC25"
+# ABI per layout version. Version 1 is the original contract (string topics,
+# no batch functions, TopicsUpdated or relay); version 2 adds them.
+ABI_FILES = {1: 'contract_wrapper_api/abi_v1.json', 2: 'contract_wrapper_api/abi.json'}
 
 ETHERSCAN_API_KEY = os.getenv('ETHERSCAN_API_KEY')
 
+@lru_cache(maxsize=None)
+def get_deployment() -> dict:
+    with open(DEPLOYMENT_FILE, 'r') as f:
+        deployment = json.load(f)
+    deployment.setdefault('version', 1)
+    return deployment
+
+def get_contract_version() -> int:
+    return get_deployment()['version']
+
+def supports_batches() -> bool:
+    # setCharitiesBatch / splitAmongCharitiesBatch only exist from version 2
+    return get_contract_version() >= 2
+
 def fetch_abi_from_etherscan(contract_address, api_key):
-    # For Avalanche Fuji, we'll use the local ABI file instead
+    # For Avalanche Fuji, we'll use the local ABI file of the deployed version instead
+    abi_file = ABI_FILES[get_contract_version()]
     try:
-        with open('contract_wrapper_api/abi.json', 'r') as f:
+        with open(os.path.join(ROOT, abi_file), 'r') as f:
             return f.read()
     except FileNotFoundError:
-        print("ABI file not found. Please ensure abi.json exists in contract_wrapper_api/")
+        print(f"ABI file not found. Please ensure {abi_file} exists")
         return "[]"
 
 def get_balance_of_user(contract, user_address):
@@ -39,32 +52,118 @@ def get_balance_of_user(contract, user_address):
     balance = contract.functions.getBalance(user_address).call()
     return balance / 10**18
 
-account = Account.from_key(os.getenv('PRIVATE_KEY'))
+# The provider, account, submitter and contract are built on first use, so
+# importing this module is cheap and doesn't need PRIVATE_KEY or the RPC.
+# `from web3_utils.interact_with_contract import w3, contract` still works
+# through the module __getattr__ below.
+
+@lru_cache(maxsize=None)
+def get_w3():
+    from web3 import Web3
+    return Web3(Web3.HTTPProvider(os.getenv('INFURA_URL')))
+
+@lru_cache(maxsize=None)
+def get_account():
+    from eth_account import Account
+    if os.getenv('PRIVATE_KEY') is None:
+        raise RuntimeError("Please set the PRIVATE_KEY environment variable")
+    return Account.from_key(os.getenv('PRIVATE_KEY'))
+
+@lru_cache(maxsize=None)
+def get_submitter():
+    # Owner transactions go out back-to-back with locally assigned nonces
+    from web3_utils.tx_submitter import TxSubmitter
+    return TxSubmitter(get_w3(), get_account(), bump_after=float(os.getenv('TX_BUMP_AFTER', '45')),
+                       abandon_after=float(os.getenv('TX_ABANDON_AFTER', '90')))
+
+@lru_cache(maxsize=None)
+def get_contract():
+    address = get_deployment()['address']
+    return get_w3().eth.contract(address=address, abi=json.loads(fetch_abi_from_etherscan(address, ETHERSCAN_API_KEY)))
+
+_LAZY = {'w3': get_w3, 'account': get_account, 'submitter': get_submitter, 'contract': get_contract}
+
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+RECEIPT_TIMEOUT = 120
+
+def submit(function, value: int = 0, wait: bool = True, submitter=None):
+    # Returns the receipt, or with wait=False a future that resolves to it.
+    # Sent by the owner's submitter unless another account's is given.
+    future = (submitter or get_submitter()).submit(function, value)
+    return future.result(timeout=RECEIPT_TIMEOUT) if wait else future
+
+def encode_topic(topic: str):
+    # Topics are stored on-chain as bytes32 ids: the UTF-8 name, zero-padded
+    # (the same encoding as ethers.encodeBytes32String). Version 1 stores the names.
+    if get_contract_version() < 2:
+        return topic
+    encoded = topic.encode('utf-8')
+    assert len(encoded) <= 31, f"topic {topic!r} is longer than 31 bytes"
+    return encoded.ljust(32, b'\0')
+
+def decode_topic(topic_id) -> str:
+    if isinstance(topic_id, str):
+        return topic_id
+    return bytes(topic_id).rstrip(b'\0').decode('utf-8')
 
-# Add middleware to sign transactions with the account's private key
-w3.middleware_onion.inject(SignAndSendRawMiddlewareBuilder.build(account), layer=0)
+def user_from_topics(topics) -> User:
+    # getUserTopics returns (topic ids, charities, percentages, balance in wei)
+    return User([decode_topic(topic) for topic in topics[0]], topics[1], list(topics[2]), topics[3] / 10**18)
 
-def enroll_user(contract, topics: list[str], charities: list[str], charityPercents: list[int]):
+def user_from_row(row) -> User:
+    # Same shape as get_user(), from a chainuser row kept by web3_utils/event_indexer.py
+    return User(json.loads(row.topics), json.loads(row.charities), json.loads(row.percentages), int(row.balance) / 10**18)
+
+def enroll_user(contract, topics: list[str], charities: list[str], charityPercents: list[int], wait: bool = True):
     assert len(topics) == 3, "topics should have 3 elements"
     assert len(charities) == len(charityPercents), "charities and charityPercents should have the same length"
     assert sum(charityPercents) == 100, "charityPercents should sum to 100"
 
     # call .enroll(topics, charities, charityPercents) method in the contract
-    tx_hash = contract.functions.enroll(topics, charities, charityPercents).transact({'from': account.address})
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
+    return submit(contract.functions.enroll([encode_topic(topic) for topic in topics], charities, charityPercents), wait=wait)
 
 def get_topics(contract, address) -> list[str]:
     # This method fetches the topics of an address
 
     topics = contract.functions.getTopics(address).call()
-    return topics
+    return [decode_topic(topic) for topic in topics]
 
 def get_user(contract, address) -> User:
     # This method fetches the topics of an address
 
     topics = contract.functions.getUserTopics(address).call()
-    return User(topics[0], topics[1], topics[2], topics[3] / 10**18)
+    return user_from_topics(topics)
+
+def get_users(contract, addresses: list[str], chunk_size: int = None) -> dict[str, User]:
+    # Fetches many users with one JSON-RPC batch of getUserTopics calls per chunk
+    # instead of one eth_call round trip per user. Users that can't be read are left out.
+    chunk_size = chunk_size or int(os.getenv('USER_READ_BATCH_SIZE', '100'))
+    users = {}
+    for start in range(0, len(addresses), chunk_size):
+        chunk = addresses[start:start + chunk_size]
+        try:
+            with contract.w3.batch_requests() as batch:
+                for address in chunk:
+                    batch.add(contract.functions.getUserTopics(address))
+                responses = batch.execute()
+        except Exception as e:
+            print(f"Batched read of {len(chunk)} users failed ({e}), reading them one by one")
+            responses = []
+            for address in chunk:
+                try:
+                    responses.append(contract.functions.getUserTopics(address).call())
+                except Exception as e:
+                    print(f"Error reading user {address}: {e}")
+                    responses.append(None)
+
+        for address, topics in zip(chunk, responses):
+            if topics is not None:
+                users[address] = user_from_topics(topics)
+    return users
 
 def get_owner(contract) -> str:
     # This method fetches the owner of the contract
@@ -72,41 +171,93 @@ def get_owner(contract) -> str:
     owner = contract.functions.owner().call()
     return owner
 
-def set_topics(contract, address: str, topics: list[str]):
+def set_topics(contract, address: str, topics: list[str], wait: bool = True):
     # Changes the topics of a user
-    tx_hash = contract.functions.setTopics(address, topics).transact({'from': account.address})
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
+    return submit(contract.functions.setTopics(address, [encode_topic(topic) for topic in topics]), wait=wait)
 
-def set_charities(contract, address: str, addresses: list[str], percentages: list[int]):
+def set_charities(contract, address: str, addresses: list[str], percentages: list[int], wait: bool = True):
     # Changes the charities of a user
-    tx_hash = contract.functions.setCharities(address, addresses, percentages).transact({'from': account.address})
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
+    return submit(contract.functions.setCharities(address, addresses, percentages), wait=wait)
 
-def donate(contract, amount: int):
+def donate(contract, amount: int, wait: bool = True):
     # Donates to the contract
     assert amount > 0, "Amount should be greater than 0"
-    assert amount < w3.eth.get_balance(account.address), "Insufficient balance"
-    tx_hash = contract.functions.donate().transact({'from': account.address, 'value': amount})
+    assert amount < get_w3().eth.get_balance(get_account().address), "Insufficient balance"
     # Value is in wei
+    return submit(contract.functions.donate(), value=amount, wait=wait)
 
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt
-
-def split_among_charities(contract, address: str):
+def split_among_charities(contract, address: str, wait: bool = False):
     # Splits the balance among the charities
     # We EXPECT a crash if this is not called by the contract owner
-    contract.functions.splitAmongCharities(address).transact({'from': account.address})
+    return submit(contract.functions.splitAmongCharities(address), wait=wait)
 
 
 
-def withdraw(contract):
-    # Withdraws the balance of the contract
-    tx_hash = contract.functions.withdraw().transact({'from': account.address})
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+BATCH_GAS_LIMIT = int(os.getenv('BATCH_GAS_LIMIT', '6000000'))
+BATCH_MAX_USERS = int(os.getenv('BATCH_MAX_USERS', '100'))
+BATCH_SPLIT_DEPTH = int(os.getenv('BATCH_SPLIT_DEPTH', '3'))
+
+def gas_bounded_chunks(build, items: list, max_gas: int = BATCH_GAS_LIMIT, max_items: int = BATCH_MAX_USERS,
+                       max_depth: int = BATCH_SPLIT_DEPTH, sender: str = None) -> list[list]:
+    # Splits items into chunks whose batch call, build(chunk), estimates under max_gas.
+    # Chunks that are too big are halved until they fit. A chunk that reverts raises
+    # at once (halving would only find the bad item after ~2N estimates); other
+    # estimate errors halve it at most max_depth times before giving up.
+    from web3.exceptions import ContractLogicError
+
+    pending = [(items[i:i + max_items], 0) for i in range(0, len(items), max_items)]
+    chunks = []
+    while pending:
+        chunk, depth = pending.pop(0)
+        if len(chunk) > 1:
+            try:
+                fits = build(chunk).estimate_gas({'from': sender or get_account().address}) <= max_gas
+            except ContractLogicError:
+                raise
+            except Exception:
+                if depth >= max_depth:
+                    raise
+                fits = False
+            if not fits:
+                half = len(chunk) // 2
+                pending[0:0] = [(chunk[:half], depth + 1), (chunk[half:], depth + 1)]
+                continue
+        chunks.append(chunk)
+    return chunks
 
-    return receipt
-    
+def set_charities_batch(contract, updates: list[tuple[str, list[str], list[int]]], wait: bool = True):
+    # Changes the charities of many users: updates are (user, charity addresses, percentages).
+    # Sends one setCharitiesBatch transaction per gas-bounded chunk.
+    def build(chunk):
+        return contract.functions.setCharitiesBatch(
+            [user for user, _, _ in chunk],
+            [charities for _, charities, _ in chunk],
+            [percentages for _, _, percentages in chunk],
+        )
 
-contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=json.loads(fetch_abi_from_etherscan(CONTRACT_ADDRESS, ETHERSCAN_API_KEY)))
\ No newline at end of file
+    for user, charities, percentages in updates:
+        assert len(charities) == len(percentages), f"charities and percentages should have the same length for {user}"
+    futures = [submit(build(chunk), wait=False) for chunk in gas_bounded_chunks(build, updates)]
+    return [future.result(timeout=RECEIPT_TIMEOUT) for future in futures] if wait else futures
+
+def split_among_charities_batch(contract, users: list[str], wait: bool = True, submitter=None):
+    # Splits the balances of many users, one splitAmongCharitiesBatch transaction per gas-bounded chunk.
+    # Sent by the owner, or by an authorized splitter's submitter (see set_splitter).
+    def build(chunk):
+        return contract.functions.splitAmongCharitiesBatch(chunk)
+
+    sender = submitter.account.address if submitter else None
+    futures = [submit(build(chunk), wait=False, submitter=submitter) for chunk in gas_bounded_chunks(build, users, sender=sender)]
+    return [future.result(timeout=RECEIPT_TIMEOUT) for future in futures] if wait else futures
+
+def set_splitter(contract, address: str, allowed: bool = True, wait: bool = True):
+    # Lets another account (the split scheduler's) call splitAmongCharitiesBatch
+    return submit(contract.functions.setSplitter(address, allowed), wait=wait)
+
+def set_relayer(contract, address: str, allowed: bool = True, wait: bool = True):
+    # Lets another account (the contract wrapper's relay) settle donation intents with donateBatch
+    return submit(contract.functions.setRelayer(address, allowed), wait=wait)
+
+def withdraw(contract, wait: bool = True):
+    # Withdraws the balance of the contract
+    return submit(contract.functions.withdraw(), wait=wait)
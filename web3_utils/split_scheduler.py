@@ -0,0 +1,153 @@
+import time
+
+from sqlalchemy.orm import sessionmaker
+from web3 import Web3
+from web3.logs import DISCARD
+
+from pg_module.crud import get_all_users, get_checkpoint, get_split_candidates
+from web3_utils.interact_with_contract import get_users, split_among_charities_batch
+
+# Balances are read as AVAX floats; differences below this many wei are rounding
+DUST = 10**9
+
+
+class SplitScheduler:
+    # Pays out user balances in batches on a schedule instead of one split per
+    # send_money decision. Each cycle picks users whose indexed balance is at
+    # least min_balance, or has been waiting max_age_blocks, re-checks their
+    # balances on chain and, only while the base fee is in a low-fee window,
+    # splits up to max_users_per_cycle of them with splitAmongCharitiesBatch.
+    # The gas paid and the AVAX distributed are totalled for report().
+    # Transactions go through `submitter`, which should hold a splitter key of
+    # its own: sharing the owner's key with the matcher would reuse nonces.
+
+    def __init__(self, w3, contract, engine, submitter, min_balance, max_age_blocks, max_users_per_cycle=200,
+                 fee_percentile=30, fee_history_blocks=120, max_base_fee=0, interval=600.0, indexer_name="donater",
+                 log_chunk_size=2000):
+        self.w3 = w3
+        self.contract = contract
+        self.submitter = submitter
+        self.min_balance = min_balance  # wei
+        self.max_age_blocks = max_age_blocks
+        self.max_users_per_cycle = max_users_per_cycle
+        self.fee_percentile = fee_percentile
+        self.fee_history_blocks = fee_history_blocks
+        self.max_base_fee = max_base_fee  # wei, 0 for no cap
+        self.interval = interval
+        self.indexer_name = indexer_name
+        self.log_chunk_size = log_chunk_size
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.totals = {"cycles": 0, "deferred": 0, "users": 0, "transactions": 0, "gas": 0, "fees": 0, "distributed": 0}
+
+    def low_fee_window(self):
+        # Open when the next block's base fee is among the cheapest fee_percentile%
+        # of recent blocks (and under max_base_fee, if set)
+        history = self.w3.eth.fee_history(self.fee_history_blocks, "latest")
+        base_fees = history["baseFeePerGas"]
+        current = base_fees[-1]  # the last entry is the next block's base fee
+        ranked = sorted(base_fees)
+        threshold = ranked[min(len(ranked) - 1, len(ranked) * self.fee_percentile // 100)]
+        if self.max_base_fee and current > self.max_base_fee:
+            return False, current, threshold
+        return current <= threshold, current, threshold
+
+    def candidates(self) -> list[str]:
+        # Users due a payout, largest balances first. Uses the event indexer's
+        # tables when it has run; otherwise reads every known user from the chain.
+        with self.Session() as db:
+            if get_checkpoint(db, self.indexer_name) is not None:
+                head = self.w3.eth.block_number
+                rows = get_split_candidates(db, self.min_balance, head - self.max_age_blocks, self.max_users_per_cycle)
+                addresses = [Web3.to_checksum_address(row.userid) for row in rows]
+                # The index lags the chain; skip users already paid out since
+                users = get_users(self.contract, addresses)
+                return [address for address in addresses if address in users and users[address].balance > 0]
+            user_ids = [user.userid for user in get_all_users(db)]
+
+        # Not every user id in the database is a wallet address
+        addresses = [Web3.to_checksum_address(user_id) for user_id in user_ids if Web3.is_address(user_id)]
+        users = get_users(self.contract, addresses)
+        funded = {address: user for address, user in users.items() if user.balance > 0}
+        if not funded:
+            return []
+        recent = self.recent_donations(self.w3.eth.block_number)
+        due = []
+        for address, user in funded.items():
+            balance = round(user.balance * 10**18)
+            # More than was donated within max_age_blocks: some of it has waited longer
+            aged = balance - recent.get(address, 0) > DUST
+            if balance >= self.min_balance or aged:
+                due.append(address)
+        due.sort(key=lambda address: users[address].balance, reverse=True)
+        return due[:self.max_users_per_cycle]
+
+    def recent_donations(self, head) -> dict[str, int]:
+        # Wei donated by each user within the last max_age_blocks since their last
+        # payout, from the contract's logs (the index's funded_block, without the index)
+        events = {}
+        for event in (self.contract.events.Donated, self.contract.events.SplitAmongCharities, self.contract.events.Withdrawn):
+            events[event.topic] = event
+        donated = {}
+        start = max(0, head - self.max_age_blocks + 1)
+        for from_block in range(start, head + 1, self.log_chunk_size):
+            logs = self.w3.eth.get_logs({
+                "address": self.contract.address,
+                "fromBlock": from_block,
+                "toBlock": min(head, from_block + self.log_chunk_size - 1),
+                "topics": [list(events)],
+            })
+            for log in logs:
+                event = events[Web3.to_hex(log["topics"][0])].process_log(log)
+                user = event["args"]["_user"]
+                if event["event"] == "Donated":
+                    donated[user] = donated.get(user, 0) + event["args"]["_amount"]
+                else:
+                    donated[user] = 0
+        return donated
+
+    def split(self, users):
+        receipts = split_among_charities_batch(self.contract, users, submitter=self.submitter)
+        event = self.contract.events.SplitAmongCharities()
+        totals = self.totals
+        for receipt in receipts:
+            if receipt["status"] != 1:
+                print(f"Split transaction {Web3.to_hex(receipt['transactionHash'])} reverted")
+                continue
+            totals["transactions"] += 1
+            totals["gas"] += receipt["gasUsed"]
+            totals["fees"] += receipt["gasUsed"] * receipt["effectiveGasPrice"]
+            for log in event.process_receipt(receipt, errors=DISCARD):
+                totals["users"] += 1
+                totals["distributed"] += log["args"]["_amount"]
+
+    def step(self):
+        self.totals["cycles"] += 1
+        users = self.candidates()
+        if not users:
+            return
+        is_open, base_fee, threshold = self.low_fee_window()
+        if not is_open:
+            self.totals["deferred"] += 1
+            print(f"Deferring splits for {len(users)} user(s): base fee {base_fee / 1e9:.2f} gwei, window opens at {threshold / 1e9:.2f} gwei")
+            return
+        print(f"Splitting balances of {len(users)} user(s) at base fee {base_fee / 1e9:.2f} gwei")
+        self.split(users)
+        self.report()
+
+    def report(self):
+        totals = self.totals
+        distributed = totals["distributed"] / 10**18
+        gas_per_avax = f"{totals['gas'] / distributed:.0f} gas per AVAX" if distributed else "nothing distributed"
+        print(
+            f"Split scheduler: {totals['users']} payouts in {totals['transactions']} transactions, "
+            f"{distributed:.4f} AVAX distributed for {totals['gas']} gas ({totals['fees'] / 10**18:.6f} AVAX in fees, {gas_per_avax}), "
+            f"{totals['deferred']} of {totals['cycles']} cycles deferred for fees"
+        )
+
+    def run_forever(self):
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                print(f"Error scheduling splits: {e}")
+            time.sleep(self.interval)
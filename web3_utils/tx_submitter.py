@@ -0,0 +1,180 @@
+import math
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from web3.exceptions import TransactionNotFound
+
+
+@dataclass
+class PendingTransaction:
+    nonce: int
+    tx: dict
+    future: Future
+    hashes: list = field(default_factory=list)
+    sent_at: float = 0.0
+    bumps: int = 0
+    missing_polls: int = 0  # polls since the nonce was mined without a receipt for our hashes
+
+
+class TxSubmitter:
+    # Sends transactions for one account without waiting for each to be mined.
+    # Nonces are assigned locally, so many transactions can go out back-to-back;
+    # a background thread watches the account's mined nonce, resolves each
+    # submission's future with its receipt and re-sends transactions that sit
+    # unmined for bump_after seconds with higher fees under the same nonce.
+    # A transaction still unmined abandon_after seconds past its last bump is
+    # given up: its nonce is filled with a 0-value self-transfer so later
+    # nonces aren't stuck behind a gap, and its future fails.
+
+    def __init__(self, w3, account, bump_after=45.0, bump_percent=15, max_bumps=5, poll_interval=2.0,
+                 receipt_polls=5, abandon_after=90.0):
+        assert bump_percent > 10, "nodes only accept replacements that raise fees by more than 10%"
+        self.w3 = w3
+        self.account = account
+        self.bump_after = bump_after
+        self.bump_percent = bump_percent
+        self.max_bumps = max_bumps
+        self.poll_interval = poll_interval
+        self.receipt_polls = receipt_polls
+        self.abandon_after = abandon_after
+        self.lock = threading.Lock()
+        self.nonce = None
+        self.pending = {}  # nonce -> PendingTransaction
+        self.tracker = None
+        self.stopped = threading.Event()
+
+    def fees(self):
+        base_fee = self.w3.eth.get_block('latest')['baseFeePerGas']
+        tip = self.w3.eth.max_priority_fee
+        return {'maxPriorityFeePerGas': tip, 'maxFeePerGas': 2 * base_fee + tip}
+
+    def submit(self, contract_function, value: int = 0) -> Future:
+        # Build, sign and send a contract call; the future resolves to its receipt.
+        # Gas estimation failures (e.g. a revert) raise here, before a nonce is used.
+        future = Future()
+        tx = contract_function.build_transaction({'from': self.account.address, 'value': value, **self.fees()})
+
+        with self.lock:
+            if self.nonce is None:
+                self.nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            # Sending under the lock keeps nonces gapless: a failed send doesn't consume one
+            pending = PendingTransaction(self.nonce, {**tx, 'nonce': self.nonce}, future)
+            try:
+                self.send(pending)
+            except Exception:
+                # Whether it was "nonce too low", "replacement underpriced" or "already
+                # known", the local counter can't be trusted; re-read the pending nonce
+                self.nonce = None
+                raise
+            self.pending[pending.nonce] = pending
+            self.nonce += 1
+            self.start_tracker()
+        return future
+
+    def send(self, pending):
+        signed = self.account.sign_transaction(pending.tx)
+        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+        pending.hashes.append(tx_hash)
+        pending.sent_at = time.time()
+        return tx_hash
+
+    def start_tracker(self):
+        if self.tracker is None or not self.tracker.is_alive():
+            self.tracker = threading.Thread(target=self.track_forever, name='tx-tracker', daemon=True)
+            self.tracker.start()
+
+    def track_forever(self):
+        while not self.stopped.is_set():
+            try:
+                self.track()
+            except Exception as e:
+                print(f"Error tracking transactions: {e}")
+            with self.lock:
+                if not self.pending:
+                    self.tracker = None
+                    return
+            self.stopped.wait(self.poll_interval)
+
+    def track(self):
+        mined_nonce = self.w3.eth.get_transaction_count(self.account.address, 'latest')
+        with self.lock:
+            pending = sorted(self.pending.values(), key=lambda p: p.nonce)
+
+        for tx in pending:
+            if tx.nonce < mined_nonce:
+                self.settle(tx)
+            elif time.time() - tx.sent_at > self.bump_after:
+                self.bump(tx)
+
+    def settle(self, tx):
+        # The nonce is used up; one of our hashes (original or replacement) should have a receipt
+        for tx_hash in reversed(tx.hashes):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            self.finish(tx)
+            tx.future.set_result(receipt)
+            return
+        # A load-balanced or lagging node can report the nonce before the receipt
+        tx.missing_polls += 1
+        if tx.missing_polls < self.receipt_polls:
+            return
+        self.finish(tx)
+        tx.future.set_exception(RuntimeError(f"Nonce {tx.nonce} was used by a transaction not sent by this submitter"))
+
+    def bumped_fees(self, tx):
+        current = self.fees()
+        factor = 1 + self.bump_percent / 100
+        fees = {key: max(math.ceil(tx.tx[key] * factor), current[key]) for key in ('maxPriorityFeePerGas', 'maxFeePerGas')}
+        fees['maxFeePerGas'] = max(fees['maxFeePerGas'], fees['maxPriorityFeePerGas'])
+        return fees
+
+    def bump(self, tx):
+        if tx.bumps >= self.max_bumps:
+            if time.time() - tx.sent_at > self.abandon_after:
+                self.abandon(tx)
+            return
+        tx.tx.update(self.bumped_fees(tx))
+        try:
+            with self.lock:
+                tx_hash = self.send(tx)
+            tx.bumps += 1
+            print(f"Re-sent nonce {tx.nonce} with higher fees: {tx_hash.hex()}")
+        except Exception as e:
+            # Usually the original was mined in the meantime; the next poll settles it
+            print(f"Could not replace nonce {tx.nonce}: {e}")
+
+    def abandon(self, tx):
+        # Out of bumps (e.g. the replacement was evicted): take the nonce with a
+        # 0-value self-transfer, priced to replace whatever is still out there
+        filler = PendingTransaction(tx.nonce, {
+            'from': self.account.address, 'to': self.account.address, 'value': 0, 'gas': 21000,
+            'nonce': tx.nonce, 'chainId': tx.tx['chainId'], **self.bumped_fees(tx),
+        }, tx.future)
+        try:
+            with self.lock:
+                tx_hash = self.send(filler)
+            print(f"Gave up on nonce {tx.nonce} after {tx.bumps} bumps, filled it with a self-transfer: {tx_hash.hex()}")
+        except Exception as e:
+            print(f"Could not fill nonce {tx.nonce}: {e}")
+            if self.w3.eth.get_transaction_count(self.account.address, 'latest') > tx.nonce:
+                return  # mined after all; the next poll settles it with its receipt
+        with self.lock:
+            self.pending.pop(tx.nonce, None)
+            # If the filler is dropped too, the next submit reuses the nonce
+            self.nonce = None
+        tx.future.set_exception(RuntimeError(f"Nonce {tx.nonce} was not mined after {tx.bumps} fee bumps and was filled with a self-transfer"))
+
+    def finish(self, tx):
+        with self.lock:
+            self.pending.pop(tx.nonce, None)
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def close(self):
+        self.stopped.set()